@@ -0,0 +1,87 @@
+"""Per-call cost of encrypted (nested JWE) ID tokens compared to signed ones.
+
+Runs ``authenticate_user`` in-process against a ``FakeIdP`` with warm
+discovery and JWKS caches and reports the median time per call for:
+
+    signed        A plain RS256 JWS.
+    jwe-cold      A nested JWE seen for the first time (RSA unwrap per call,
+                  as with the unwrap cache disabled).
+    jwe-cached    The same nested JWE presented again (unwrap cache hit).
+
+Example:
+    python benchmarks/jwe_overhead.py --iterations 2000 --encryption A128CBC-HS256
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any
+from typing import Callable
+
+from jose import jwk
+
+from fastapi_oidc import get_auth
+from fastapi_oidc.testing import FakeIdP
+from fastapi_oidc.testing import _pooled_private_key
+
+
+def median_us(call: Callable[[], Any], iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--algorithm", default="RSA-OAEP")
+    parser.add_argument("--encryption", default="A256GCM")
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args()
+
+    rp_key = _pooled_private_key("RS256", 99)
+    rp_public = jwk.construct(rp_key, args.algorithm).public_key().to_dict()
+
+    with FakeIdP() as idp:
+        authenticate_user = get_auth(**idp.auth_config(), decryption_keys=[rp_key])
+        signed = idp.mint()
+        encrypted = idp.encrypt(
+            signed, rp_public, algorithm=args.algorithm, encryption=args.encryption
+        )
+        fresh = [
+            idp.encrypt(
+                signed, rp_public, algorithm=args.algorithm, encryption=args.encryption
+            )
+            for _ in range(args.iterations)
+        ]
+        authenticate_user(signed)
+        authenticate_user(encrypted)
+
+        # Every fresh token has its own encrypted key, so each one misses the
+        # unwrap cache
+        tokens = iter(fresh)
+        results = {
+            "signed": median_us(lambda: authenticate_user(signed), args.iterations),
+            "jwe-cold": median_us(
+                lambda: authenticate_user(next(tokens)), args.iterations
+            ),
+            "jwe-cached": median_us(
+                lambda: authenticate_user(encrypted), args.iterations
+            ),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.algorithm} + {args.encryption}, {args.iterations} iterations")
+    for name, micros in results.items():
+        overhead = micros - results["signed"]
+        print(f"  {name:<11} {micros:9.1f} us/call  (+{overhead:.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
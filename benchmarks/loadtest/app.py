@@ -0,0 +1,36 @@
+"""Sample FastAPI application under load test.
+
+Mirrors ``examples/okta/main.py`` but reads its configuration from the
+environment variables set by ``run.py`` so it points at the local mock IdP.
+"""
+
+import os
+
+from fastapi import Depends
+from fastapi import FastAPI
+
+from fastapi_oidc import IDToken
+from fastapi_oidc import get_auth
+
+BASE_URI = os.getenv("LOADTEST_IDP_URL", "http://127.0.0.1:9000")
+CLIENT_ID = os.getenv("LOADTEST_CLIENT_ID", "loadtest-client")
+CACHE_TTL = int(os.getenv("LOADTEST_CACHE_TTL", "3600"))
+
+authenticate_user = get_auth(
+    client_id=CLIENT_ID,
+    base_authorization_server_uri=BASE_URI,
+    issuer=BASE_URI,
+    signature_cache_ttl=CACHE_TTL,
+)
+
+app = FastAPI()
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.get("/protected")
+def protected(id_token: IDToken = Depends(authenticate_user)):
+    return {"sub": id_token.sub}
@@ -0,0 +1,200 @@
+"""Minimal offline OIDC identity provider for load testing.
+
+Serves a discovery document and a JWKS, mints signed ID tokens on demand and
+counts every request it answers, so the load-test runner can report how much IdP
+traffic a FastAPI app generates. Latency and failures can be injected at start
+up or changed while running.
+
+Endpoints:
+    GET  /.well-known/openid-configuration  Discovery document.
+    GET  /keys                              JWKS with the current and previous key.
+    GET  /token?sub=...&ttl=...&count=...   Mint ID tokens signed by the current key.
+    GET  /_stats                            Request counters as JSON.
+    POST /_rotate                           Generate a new signing key.
+    POST /_faults?latency_ms=...&failure_rate=...  Change fault injection.
+
+Run ``python mock_idp.py --help`` for options.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk
+from jose import jwt
+
+IDP_PATHS = ("/.well-known/openid-configuration", "/keys")
+
+
+class SigningKey:
+    def __init__(self) -> None:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.kid = uuid.uuid4().hex[:16]
+        self.private_pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode("UTF-8")
+        # Parse the key once; jose re-parses PEM strings on every encode.
+        self.signer = jwk.construct(self.private_pem, "RS256")
+        public_pem = key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        self.public_jwk = {
+            **jwk.construct(public_pem, "RS256").to_dict(),
+            "kid": self.kid,
+            "use": "sig",
+        }
+
+
+class MockIdP:
+    def __init__(
+        self,
+        *,
+        base_url: str,
+        client_id: str,
+        latency_ms: float = 0.0,
+        failure_rate: float = 0.0,
+    ):
+        self.base_url = base_url
+        self.client_id = client_id
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.counts: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        self.keys = [SigningKey()]
+
+    def discovery(self) -> dict[str, Any]:
+        return {
+            "issuer": self.base_url,
+            "jwks_uri": f"{self.base_url}/keys",
+            "id_token_signing_alg_values_supported": ["RS256"],
+        }
+
+    def jwks(self) -> dict[str, Any]:
+        # Publish the previous key as well so tokens minted just before a
+        # rotation keep verifying, as real IdPs do.
+        return {"keys": [k.public_jwk for k in self.keys[-2:]]}
+
+    def rotate(self) -> str:
+        key = SigningKey()
+        with self.lock:
+            self.keys.append(key)
+        return key.kid
+
+    def mint(self, sub: str, ttl: int) -> str:
+        key = self.keys[-1]
+        now = int(time.time())
+        claims = {
+            "iss": self.base_url,
+            "aud": self.client_id,
+            "sub": sub,
+            "iat": now,
+            "exp": now + ttl,
+            "email": f"{sub}@loadtest.invalid",
+        }
+        return jwt.encode(
+            claims, key.signer, algorithm="RS256", headers={"kid": key.kid}
+        )
+
+
+def make_handler(idp: MockIdP) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _send(self, status: int, body: Any) -> None:
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            with idp.lock:
+                idp.counts[url.path] += 1
+
+            if url.path in IDP_PATHS:
+                if idp.latency_ms:
+                    time.sleep(idp.latency_ms / 1000)
+                if random.random() < idp.failure_rate:  # nosec B311
+                    with idp.lock:
+                        idp.counts["failures"] += 1
+                    self._send(503, {"error": "injected failure"})
+                elif url.path == "/keys":
+                    self._send(200, idp.jwks())
+                else:
+                    self._send(200, idp.discovery())
+            elif url.path == "/token":
+                sub = query.get("sub", ["loadtest-user"])[0]
+                ttl = int(query.get("ttl", ["3600"])[0])
+                count = int(query.get("count", ["1"])[0])
+                self._send(
+                    200,
+                    {"id_tokens": [idp.mint(f"{sub}-{i}", ttl) for i in range(count)]},
+                )
+            elif url.path == "/_stats":
+                with idp.lock:
+                    self._send(200, dict(idp.counts))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/_rotate":
+                self._send(200, {"kid": idp.rotate()})
+            elif url.path == "/_faults":
+                idp.latency_ms = float(query.get("latency_ms", [idp.latency_ms])[0])
+                idp.failure_rate = float(
+                    query.get("failure_rate", [idp.failure_rate])[0]
+                )
+                self._send(
+                    200,
+                    {"latency_ms": idp.latency_ms, "failure_rate": idp.failure_rate},
+                )
+            else:
+                self._send(404, {"error": "not found"})
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--client-id", default="loadtest-client")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    idp = MockIdP(
+        base_url=f"http://{args.host}:{args.port}",
+        client_id=args.client_id,
+        latency_ms=args.latency_ms,
+        failure_rate=args.failure_rate,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(idp))
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
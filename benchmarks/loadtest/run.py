@@ -0,0 +1,258 @@
+"""End-to-end load test for a FastAPI app protected by ``get_auth``.
+
+Starts the mock IdP (``mock_idp.py``) and the sample app (``app.py``, served by
+uvicorn) as local subprocesses, drives the app with a concurrent HTTP load
+generator and reports throughput, latency percentiles, response status counts
+and the number of requests the IdP received. Everything binds to 127.0.0.1, so
+the harness runs offline.
+
+Scenarios:
+    steady    Warm the caches first, then measure.
+    cold      Start measuring against cold discovery and JWKS caches.
+    ttl       Use a short cache TTL so the caches roll over during the run.
+    rotation  Rotate the IdP signing key halfway through the run and switch
+              clients to tokens signed with the new key.
+
+Example:
+    python benchmarks/loadtest/run.py --scenario rotation --duration 20 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess  # nosec B404
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+HERE = Path(__file__).parent
+REPO_ROOT = HERE.parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    rank = max(
+        0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1)
+    )
+    return sorted_values[rank]
+
+
+def mint_tokens(idp_url: str, count: int) -> list[str]:
+    response = httpx.get(
+        f"{idp_url}/token", params={"sub": "user", "count": count}, timeout=60.0
+    )
+    return response.json()["id_tokens"]
+
+
+async def drive(
+    app_url: str,
+    *,
+    tokens: list[str],
+    concurrency: int,
+    duration: float,
+    rotate_at: float | None,
+    idp_url: str,
+) -> tuple[list[float], Counter[int]]:
+    latencies: list[float] = []
+    statuses: Counter[int] = Counter()
+    current = {"tokens": tokens}
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async with httpx.AsyncClient(
+        base_url=app_url, limits=limits, timeout=60.0
+    ) as client:
+
+        async def worker(n: int) -> None:
+            i = n
+            while time.perf_counter() < deadline:
+                pool = current["tokens"]
+                headers = {"Authorization": f"Bearer {pool[i % len(pool)]}"}
+                i += concurrency
+                t0 = time.perf_counter()
+                try:
+                    response = await client.get("/protected", headers=headers)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError:
+                    statuses[0] += 1
+                latencies.append(time.perf_counter() - t0)
+
+        async def rotator() -> None:
+            if rotate_at is None:
+                return
+            await asyncio.sleep(rotate_at)
+            async with httpx.AsyncClient() as idp:
+                await idp.post(f"{idp_url}/_rotate")
+            current["tokens"] = await asyncio.to_thread(
+                mint_tokens, idp_url, len(tokens)
+            )
+
+        await asyncio.gather(rotator(), *(worker(n) for n in range(concurrency)))
+
+    return latencies, statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario", choices=["steady", "cold", "ttl", "rotation"], default="steady"
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    parser.add_argument(
+        "--concurrency", type=int, default=64, help="In-flight requests"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="uvicorn worker processes"
+    )
+    parser.add_argument(
+        "--tokens", type=int, default=100, help="Distinct tokens to send"
+    )
+    parser.add_argument(
+        "--cache-ttl", type=int, default=None, help="signature_cache_ttl for the app"
+    )
+    parser.add_argument("--idp-latency-ms", type=float, default=0.0)
+    parser.add_argument("--idp-failure-rate", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    cache_ttl = args.cache_ttl or (2 if args.scenario == "ttl" else 3600)
+    idp_port, app_port = free_port(), free_port()
+    idp_url = f"http://127.0.0.1:{idp_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(REPO_ROOT), str(HERE)]),
+        "LOADTEST_IDP_URL": idp_url,
+        "LOADTEST_CACHE_TTL": str(cache_ttl),
+    }
+
+    processes = [
+        subprocess.Popen(  # nosec B603
+            [
+                sys.executable,
+                str(HERE / "mock_idp.py"),
+                "--port",
+                str(idp_port),
+                "--latency-ms",
+                str(args.idp_latency_ms),
+                "--failure-rate",
+                str(args.idp_failure_rate),
+            ],
+            env=env,
+        ),
+        subprocess.Popen(  # nosec B603
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "app:app",
+                "--port",
+                str(app_port),
+                "--workers",
+                str(args.workers),
+                "--log-level",
+                "warning",
+                "--no-access-log",
+            ],
+            env=env,
+            cwd=HERE,
+        ),
+    ]
+    try:
+        wait_until_up(f"{idp_url}/_stats")
+        wait_until_up(f"{app_url}/health")
+        tokens = mint_tokens(idp_url, args.tokens)
+        if args.scenario != "cold":
+            for token in tokens[: args.workers * 4]:
+                httpx.get(
+                    f"{app_url}/protected", headers={"Authorization": f"Bearer {token}"}
+                )
+        idp_before = httpx.get(f"{idp_url}/_stats").json()
+
+        started = time.perf_counter()
+        latencies, statuses = asyncio.run(
+            drive(
+                app_url,
+                tokens=tokens,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                rotate_at=args.duration / 2 if args.scenario == "rotation" else None,
+                idp_url=idp_url,
+            )
+        )
+        elapsed = time.perf_counter() - started
+        idp_after = httpx.get(f"{idp_url}/_stats").json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    latencies.sort()
+    report: dict[str, Any] = {
+        "scenario": args.scenario,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "cache_ttl": cache_ttl,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            name: round(percentile(latencies, pct) * 1000, 2)
+            for name, pct in (("p50", 50), ("p99", 99), ("p999", 99.9))
+        },
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "idp_requests": {
+            path: idp_after.get(path, 0) - idp_before.get(path, 0)
+            for path in ("/.well-known/openid-configuration", "/keys", "failures")
+        },
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    rows = {
+        "scenario": f"{args.scenario} (workers={args.workers}, "
+        f"concurrency={args.concurrency}, cache_ttl={cache_ttl}s)",
+        "requests": f"{report['requests']} in {elapsed:.1f}s "
+        f"-> {report['throughput_rps']} req/s",
+        "latency": "  ".join(f"{k}={v}ms" for k, v in report["latency_ms"].items()),
+        "statuses": "  ".join(f"{k}={v}" for k, v in report["statuses"].items()),
+        "idp requests": "  ".join(
+            f"{k}={v}" for k, v in report["idp_requests"].items()
+        ),
+    }
+    for label, value in rows.items():
+        print(f"{label:<15}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Resident memory of the library's per-issuer state and token caches.
+
+Measures, with ``tracemalloc``, the Python heap retained by:
+
+    get_auth (cold)     A configured ``authenticate_user`` before its first call.
+    get_auth (warm)     The same after one call: discovery document, JWKS,
+                        built keys and caches included.
+    discovery document  A parsed discovery document.
+    JWKS                A parsed single-key JWKS.
+    built keys          The key object ``KeyIndex`` builds for that JWKS.
+
+at each issuer count, and per entry at each token count:
+
+    IDToken             A validated ``IDToken`` model, as an application
+                        caching verified tokens would keep.
+    rejected token      An entry of the ``rejected_token_cache_size`` cache.
+
+Every value is the total retained divided by the count, in bytes.
+
+Example:
+    python benchmarks/memory_footprint.py --issuers 1 10 100 1000 \\
+        --tokens 10000 100000 1000000 --algorithm ES256
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import time
+import tracemalloc
+from typing import Any
+from typing import Callable
+from unittest import mock
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from fastapi_oidc import get_auth
+from fastapi_oidc.cache import StripedCache
+from fastapi_oidc.testing import FakeIdP
+from fastapi_oidc.token import KeyIndex
+from fastapi_oidc.types import IDToken
+
+
+def retained(build: Callable[[], Any]) -> tuple[Any, int]:
+    """Return what ``build`` returns and the heap bytes it still holds."""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    return value, tracemalloc.get_traced_memory()[0] - before
+
+
+def per_issuer(count: int, algorithm: str) -> dict[str, float]:
+    idps = {
+        f"https://idp-{n}.example.test": FakeIdP(
+            issuer=f"https://idp-{n}.example.test", algorithms=[algorithm]
+        )
+        for n in range(count)
+    }
+    tokens = {issuer: idp.mint() for issuer, idp in idps.items()}
+
+    def send(adapter: HTTPAdapter, request: Any, **kwargs: Any) -> Any:
+        # One dispatcher for all providers instead of `count` nested patches
+        parts = urlsplit(request.url)
+        return idps[f"{parts.scheme}://{parts.netloc}"]._respond(request)
+
+    results: dict[str, float] = {}
+    with mock.patch.object(HTTPAdapter, "send", send):
+        auths, size = retained(
+            lambda: [get_auth(**idp.auth_config()) for idp in idps.values()]
+        )
+        results["get_auth (cold)"] = size / count
+
+        def warm() -> None:
+            for authenticate_user, (issuer, token) in zip(auths, tokens.items()):
+                authenticate_user(token)
+
+        _, size = retained(warm)
+        results["get_auth (warm)"] = (size + results["get_auth (cold)"] * count) / count
+
+    documents = [json.dumps(idp.discovery_document()) for idp in idps.values()]
+    jwks = [json.dumps(idp.jwks()) for idp in idps.values()]
+    _, size = retained(lambda: [json.loads(document) for document in documents])
+    results["discovery document"] = size / count
+    parsed, size = retained(lambda: [json.loads(keys) for keys in jwks])
+    results["JWKS"] = size / count
+    indexes = [KeyIndex(keys) for keys in parsed]
+    _, size = retained(lambda: [index.key(0, algorithm) for index in indexes])
+    results["built keys"] = size / count
+    return results
+
+
+def per_token(count: int) -> dict[str, float]:
+    now = int(time.time())
+    claims = {
+        "iss": "https://idp.example.test",
+        "sub": "00u1a2b3c4d5e6f7g8h9",
+        "aud": "test-client",
+        "iat": now,
+        "exp": now + 3600,
+        "email": "someone@example.test",
+    }
+    results: dict[str, float] = {}
+
+    tokens, size = retained(
+        lambda: [
+            IDToken.model_validate({**claims, "sub": f"user-{n}"}) for n in range(count)
+        ]
+    )
+    results["IDToken"] = size / count
+    del tokens
+
+    def rejected() -> StripedCache[bytes, str]:
+        cache: StripedCache[bytes, str] = StripedCache(maxsize=count, ttl=60)
+        for n in range(count):
+            digest = hashlib.sha256(b"token-%d" % n).digest()
+            cache.set(digest, "Signature verification failed.")
+        return cache
+
+    cache, size = retained(rejected)
+    results["rejected token"] = size / count
+    del cache
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--issuers", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--algorithm", default="RS256")
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    issuers = {count: per_issuer(count, args.algorithm) for count in args.issuers}
+    tokens = {count: per_token(count) for count in args.tokens}
+    tracemalloc.stop()
+
+    if args.json:
+        print(json.dumps({"per_issuer": issuers, "per_token": tokens}, indent=2))
+        return
+    print(f"Bytes per issuer ({args.algorithm})")
+    for count, results in issuers.items():
+        row = ", ".join(f"{name} {size:,.0f}" for name, size in results.items())
+        print(f"  {count:>7} issuers: {row}")
+    print("Bytes per cached token")
+    for count, results in tokens.items():
+        row = ", ".join(f"{name} {size:,.0f}" for name, size in results.items())
+        print(f"  {count:>7} tokens:  {row}")
+
+
+if __name__ == "__main__":
+    main()
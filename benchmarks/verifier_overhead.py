@@ -0,0 +1,86 @@
+"""Per-call cost of token verification outside the signature check.
+
+Verifies one RS256 token from a ``FakeIdP`` repeatedly, with warm key plans and
+discovery caches, and reports the median time per call for:
+
+    crypto             The RSA signature check alone.
+    verifier.verify    Signature and claims of an already parsed token.
+    verifier.decode    Parsing, verification and the token model.
+    authenticate_user  The full ``get_auth`` dependency, discovery included.
+
+The overhead column is the difference to ``crypto``: everything that is not
+cryptography.
+
+Example:
+    python benchmarks/verifier_overhead.py --iterations 5000 --algorithm ES256
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any
+from typing import Callable
+
+from fastapi_oidc import Verifier
+from fastapi_oidc import get_auth
+from fastapi_oidc.testing import FakeIdP
+from fastapi_oidc.token import ParsedToken
+
+
+def median_us(call: Callable[[], Any], iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--algorithm", default="RS256")
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args()
+
+    with FakeIdP(algorithms=[args.algorithm]) as idp:
+        token = idp.mint()
+        jwks = idp.jwks()
+        document = idp.discovery_document()
+        verifier = Verifier.create(issuer=idp.issuer, audience=idp.client_id)
+        authenticate_user = get_auth(**idp.auth_config())
+
+        parsed = ParsedToken(token)
+        key = verifier.key_index(jwks).key(0, args.algorithm)
+        assert key is not None
+        verifier.decode(token, jwks, document)
+        authenticate_user(token)
+
+        results = {
+            "crypto": median_us(
+                lambda: key.verify(parsed.signing_input, parsed.signature),
+                args.iterations,
+            ),
+            "verifier.verify": median_us(
+                lambda: verifier.verify(parsed, jwks, document), args.iterations
+            ),
+            "verifier.decode": median_us(
+                lambda: verifier.decode(token, jwks, document), args.iterations
+            ),
+            "authenticate_user": median_us(
+                lambda: authenticate_user(token), args.iterations
+            ),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.algorithm}, {args.iterations} iterations")
+    for name, micros in results.items():
+        overhead = micros - results["crypto"]
+        print(f"  {name:<18} {micros:9.1f} us/call  (+{overhead:.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,7 @@ Example:
 from fastapi_oidc.auth import get_auth
 from fastapi_oidc.types import IDToken
 from fastapi_oidc.types import OktaIDToken
+from fastapi_oidc.verifier import Verifier
 
-__all__ = ["get_auth", "IDToken", "OktaIDToken"]
+__all__ = ["get_auth", "IDToken", "OktaIDToken", "Verifier"]
 __version__ = "0.1.0"
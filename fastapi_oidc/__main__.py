@@ -0,0 +1,3 @@
+from fastapi_oidc.cli import main
+
+raise SystemExit(main())
@@ -15,32 +15,70 @@ Usage
         return f"Hello {name}"
 """
 
+import functools
+import hashlib
+import time
+import weakref
 from collections.abc import Iterable
+from collections.abc import Sequence
+from typing import Any
 from typing import Callable
+from typing import NoReturn
 from typing import Optional
 from typing import Type
 
+import requests
 from fastapi import Depends
 from fastapi import HTTPException
+from fastapi.security import APIKeyHeader
 from fastapi.security import OpenIdConnect
-from jose import ExpiredSignatureError
 from jose import JWTError
-from jose import jwt
-from jose.exceptions import JWTClaimsError
 
 from fastapi_oidc import discovery
+from fastapi_oidc.cache import StripedCache
+from fastapi_oidc.diagnostics import CacheDiagnostics
+from fastapi_oidc.diagnostics import WatchedSource
+from fastapi_oidc.events import AuthEventEmitter
+from fastapi_oidc.exceptions import IdentityProviderUnavailableError
 from fastapi_oidc.exceptions import TokenSpecificationError
+from fastapi_oidc.logout import RevocationIndex
+from fastapi_oidc.registry import Provider
+from fastapi_oidc.registry import ProviderRegistry
+from fastapi_oidc.rules import ClaimRule
+from fastapi_oidc.static import StaticKeys
+from fastapi_oidc.tracing import AuthTrace
+from fastapi_oidc.tracing import AuthTracer
 from fastapi_oidc.types import IDToken
+from fastapi_oidc.verifier import KeyPlan
+from fastapi_oidc.verifier import Verifier
 
 
 def get_auth(
     *,
     client_id: str,
     audience: Optional[str] = None,
-    base_authorization_server_uri: str,
+    base_authorization_server_uri: Optional[str] = None,
     issuer: str | Iterable[str],
     signature_cache_ttl: int,
     token_type: Type[IDToken] = IDToken,
+    stale_if_error: int = 0,
+    rejected_token_cache_size: int = 0,
+    rejected_token_cache_ttl: int = 30,
+    discovery_mirrors: Sequence[str] = (),
+    jwks_mirrors: Sequence[str] = (),
+    hedge_delay: Optional[float] = None,
+    shared_cache_path: Optional[str] = None,
+    tracer: Optional[AuthTracer] = None,
+    event_emitter: Optional[AuthEventEmitter] = None,
+    decryption_keys: Sequence[Any] = (),
+    claim_rules: Sequence[ClaimRule] = (),
+    provider_registry: Optional[ProviderRegistry] = None,
+    revocation_index: Optional[RevocationIndex] = None,
+    x5c_trust_anchors: Sequence[str | bytes] = (),
+    jwks_uri: Optional[str] = None,
+    static_keys: Optional[StaticKeys] = None,
+    algorithms: Optional[Sequence[str]] = None,
+    diagnostics: Optional[CacheDiagnostics] = None,
 ) -> Callable[[str], IDToken]:
     """Take configurations and return the authenticate_user function.
 
@@ -50,7 +88,8 @@ def get_auth(
     Args:
         client_id: This string is provided when you register with your resource server.
         base_authorization_server_uri: Everything before /.wellknow in your auth server
-            URL. I.E. https://dev-123456.okta.com
+            URL. I.E. https://dev-123456.okta.com. Not needed with jwks_uri or
+            static_keys.
         issuer: The expected value(s) of the token's ``iss`` claim. Pass a single
             string to accept one issuer, or an iterable of strings to accept tokens
             from any of several issuers (useful when the same auth server is reachable
@@ -60,13 +99,75 @@ def get_auth(
         audience: The audience string configured by your auth server. If not set
             defaults to client_id
         token_type: An optional class to be returned by the authenticate_user function.
-
+        stale_if_error: How many seconds past signature_cache_ttl the last known-good
+            discovery document and keys may still be used while the auth server
+            cannot be reached. Defaults to 0 (never use expired keys).
+        rejected_token_cache_size: How many recently rejected tokens to remember so
+            that repeats are refused without verifying them again. Only a SHA-256
+            digest of each token and the rejection reason are kept. Defaults to 0
+            (disabled).
+        rejected_token_cache_ttl: How many seconds a rejected token is remembered.
+        discovery_mirrors: Base URIs of other hosts serving the same discovery
+            document as base_authorization_server_uri, tried in order of observed
+            latency when fetching it.
+        jwks_mirrors: URLs serving the same JWKS as the discovered jwks_uri.
+        hedge_delay: Seconds to wait on one mirror before also asking the next
+            one and using whichever answers first. Defaults to None (only fail
+            over after an error).
+        shared_cache_path: Path of a file (e.g. under /dev/shm) through which the
+            worker processes on one host share the cached discovery document and
+            JWKS, so only one of them fetches per signature_cache_ttl. Defaults to
+            None (cache per process). POSIX only.
+        tracer: A ``fastapi_oidc.tracing.AuthTracer`` that receives the duration,
+            cache hits and key id of each phase of sampled calls. Defaults to
+            None (no tracing).
+        event_emitter: A ``fastapi_oidc.events.AuthEventEmitter`` that records
+            the outcome of each call as an audit event, written off the request
+            path. Defaults to None (no audit events).
+        decryption_keys: The relying party's private keys (JWK dicts, PEM strings
+            or bytes) for providers that encrypt ID tokens. Encrypted (nested
+            JWE) tokens are decrypted and the inner signed token verified as
+            usual. Defaults to () (only signed tokens are accepted).
+        claim_rules: ``fastapi_oidc.rules`` requirements on further claims, e.g.
+            ``[Equals("tid", "my-tenant"), MaxAge("auth_time", 600)]``. They run
+            on the raw claims before token_type is built, and tokens failing any
+            of them are rejected with a 401. Defaults to () (no requirements).
+        provider_registry: A ``fastapi_oidc.registry.ProviderRegistry`` shared
+            by several get_auth instances, so that those for the same
+            base_authorization_server_uri and discovery settings fetch the
+            discovery document and JWKS and build keys once between them.
+            Defaults to None (caches private to this instance).
+        revocation_index: A ``fastapi_oidc.logout.RevocationIndex`` fed by the
+            back-channel logout endpoint. Tokens of sessions or users logged
+            out after the token was issued are rejected with a 401. Defaults to
+            None (logouts are not checked).
+        x5c_trust_anchors: PEM encoded CA certificates. When given, only keys
+            of the JWKS whose ``x5c`` certificate chain leads to one of them are
+            used; chains are validated once per JWKS and again when a
+            certificate expires. Defaults to () (chains are not checked).
+        jwks_uri: URL of the provider's JWKS. When given, the discovery
+            document is not fetched, so verifying the first token costs one
+            fetch instead of two; algorithms is then required. Defaults to None
+            (use the discovered jwks_uri).
+        static_keys: A ``fastapi_oidc.static.StaticKeys`` holding the keys
+            (a JWKS, PEM keys, or a file with either, optionally reloaded when
+            it changes). Nothing is fetched from the provider and the other
+            discovery settings are ignored. Defaults to None.
+        algorithms: Accepted signing algorithms. Defaults to None (those the
+            discovery document or static_keys list).
+        diagnostics: A ``fastapi_oidc.diagnostics.CacheDiagnostics`` whose
+            admin router reports this instance's cached documents, key ids,
+            hit ratio and fetch errors, and can refresh or purge them.
+            Defaults to None.
 
     Returns:
-        func: authenticate_user(auth_header: str) -> IDToken (or token_type)
+        func: authenticate_user(auth_header: str) -> IDToken (or token_type).
+        Its ``discovery_document()`` returns the discovery document it uses,
+        from its cache, for dependencies built on it such as ``get_userinfo``.
 
     Raises:
-        Nothing intentional
+        ValueError: If neither base_authorization_server_uri, jwks_uri nor
+            static_keys is given, or jwks_uri is given without algorithms.
     """
 
     if not issubclass(token_type, IDToken):
@@ -76,11 +177,65 @@ def get_auth(
             f"Received {token_type=}"
         )
 
-    oauth2_scheme = OpenIdConnect(
-        openIdConnectUrl=f"{base_authorization_server_uri}/.well-known/openid-configuration"
+    if all(v is None for v in (base_authorization_server_uri, jwks_uri, static_keys)):
+        raise ValueError(
+            "One of base_authorization_server_uri, jwks_uri or static_keys is required"
+        )
+    if static_keys is not None and provider_registry is not None:
+        raise ValueError("static_keys cannot be shared through a provider_registry")
+
+    oauth2_scheme: OpenIdConnect | APIKeyHeader
+    if base_authorization_server_uri is not None:
+        oauth2_scheme = OpenIdConnect(
+            openIdConnectUrl=f"{base_authorization_server_uri}/.well-known/openid-configuration"
+        )
+    else:
+        # Without a provider to point the OpenAPI docs to, document the header
+        oauth2_scheme = APIKeyHeader(name="Authorization", scheme_name="OpenIdConnect")
+
+    discovery_options: dict[str, Any] = dict(
+        cache_ttl=signature_cache_ttl,
+        stale_if_error=stale_if_error,
+        discovery_mirrors=discovery_mirrors,
+        jwks_mirrors=jwks_mirrors,
+        hedge_delay=hedge_delay,
+        shared_cache_path=shared_cache_path,
+        trust_anchors=tuple(x5c_trust_anchors),
     )
+    if jwks_uri is not None:
+        # Only added when set, so registry lookups still match get_logout_router
+        discovery_options.update(jwks_uri=jwks_uri, algorithms=tuple(algorithms or ()))
+    provider: Optional[Provider] = None
+    key_plan: Optional[KeyPlan] = None
+    discover: Any
+    if static_keys is not None:
+        discover = static_keys
+    elif provider_registry is not None:
+        provider = provider_registry.acquire(
+            base_authorization_server_uri or str(jwks_uri), **discovery_options
+        )
+        discover, key_plan = provider.discover, provider.key_plan
+    else:
+        discover = discovery.configure(**discovery_options)
 
-    discover = discovery.configure(cache_ttl=signature_cache_ttl)
+    rejected_tokens: Optional[StripedCache[bytes, str]] = None
+    if rejected_token_cache_size > 0:
+        rejected_tokens = StripedCache(
+            maxsize=rejected_token_cache_size, ttl=rejected_token_cache_ttl
+        )
+
+    # Mocked discovery namespaces may not count fetches
+    fetch_count = getattr(discover, "fetch_count", None)
+
+    verifier = Verifier.create(
+        issuer=issuer,
+        audience=audience if audience else client_id,
+        token_type=token_type,
+        decryption_keys=decryption_keys,
+        claim_rules=claim_rules,
+        algorithms=algorithms,
+        key_plan=key_plan,
+    )
 
     def authenticate_user(auth_header: str = Depends(oauth2_scheme)) -> IDToken:
         """Validate and parse OIDC ID token against issuer in config.
@@ -96,25 +251,105 @@ def get_auth(
 
         raises:
             HTTPException(status_code=401, detail=f"Unauthorized: {err}")
+            HTTPException(status_code=503): If the auth server cannot be reached.
         """
-        id_token = auth_header.split(" ")[-1]
-        OIDC_discoveries = discover.auth_server(base_url=base_authorization_server_uri)
-        key = discover.public_keys(OIDC_discoveries)
-        algorithms = discover.signing_algos(OIDC_discoveries)
+        trace = tracer.start(fetch_count) if tracer is not None else None
+        if trace is None and event_emitter is None:
+            return verify(auth_header, None)
+        started = time.perf_counter()
+        try:
+            token = verify(auth_header, trace)
+        except Exception as err:
+            if trace is not None:
+                trace.finish(err)
+            if event_emitter is not None:
+                event_emitter.record_failure(
+                    auth_header.rpartition(" ")[2], err, time.perf_counter() - started
+                )
+            raise
+        if trace is not None:
+            trace.finish()
+        if event_emitter is not None:
+            event_emitter.record_success(
+                auth_header.rpartition(" ")[2], token, time.perf_counter() - started
+            )
+        return token
+
+    def verify(auth_header: str, trace: Optional[AuthTrace]) -> IDToken:
+        id_token = auth_header.rpartition(" ")[2]
+
+        if rejected_tokens is not None:
+            digest = hashlib.sha256(id_token.encode()).digest()
+            reason = rejected_tokens.get(digest)
+            if reason is not None:
+                raise HTTPException(status_code=401, detail=f"Unauthorized: {reason}")
 
         try:
-            token = jwt.decode(
-                id_token,
-                key,
-                algorithms,
-                audience=audience if audience else client_id,
-                issuer=issuer,
-                # Disabled at_hash check since we aren't using the access token
-                options={"verify_at_hash": False},
+            token = verifier.parse(id_token)
+        except JWTError as err:
+            reject(id_token, err)
+        if trace is not None:
+            trace.mark("extract")
+
+        try:
+            OIDC_discoveries = discover.auth_server(
+                base_url=base_authorization_server_uri
+            )
+            if trace is not None:
+                trace.mark("discovery")
+            key = discover.public_keys(OIDC_discoveries)
+        except requests.RequestException as err:
+            headers = None
+            if isinstance(err, IdentityProviderUnavailableError):
+                headers = {"Retry-After": str(max(1, round(err.retry_after)))}
+            raise HTTPException(
+                status_code=503,
+                detail="Authorization server unavailable",
+                headers=headers,
+            ) from err
+        if trace is not None:
+            trace.mark("public_keys")
+
+        try:
+            claims = verifier.verify(token, key, OIDC_discoveries)
+        except JWTError as err:
+            reject(id_token, err)
+        if revocation_index is not None and revocation_index.is_revoked(claims):
+            reject(id_token, JWTError("Token revoked by logout"))
+        if trace is not None:
+            trace.mark(
+                "decode", kid=token.header.get("kid"), alg=token.header.get("alg")
             )
-            return token_type.model_validate(token)
 
-        except (ExpiredSignatureError, JWTError, JWTClaimsError) as err:
-            raise HTTPException(status_code=401, detail=f"Unauthorized: {err}")
+        validated = token_type.model_validate(claims)
+        if trace is not None:
+            trace.mark("validate")
+        return validated
+
+    def reject(id_token: str, err: JWTError) -> NoReturn:
+        if rejected_tokens is not None:
+            digest = hashlib.sha256(id_token.encode()).digest()
+            # Bound the stored reason so entries have a fixed maximum size
+            rejected_tokens.set(digest, str(err)[:200])
+        raise HTTPException(status_code=401, detail=f"Unauthorized: {err}")
 
+    authenticate_user.discovery_document = functools.partial(  # type: ignore[attr-defined]
+        discover.auth_server, base_url=base_authorization_server_uri
+    )
+    if provider_registry is not None and provider is not None:
+        weakref.finalize(authenticate_user, provider_registry.release, provider)
+    if diagnostics is not None:
+        # Named after where the keys come from
+        source_name = jwks_uri or base_authorization_server_uri
+        if static_keys is not None:
+            source_name = static_keys.path or "static"
+        source_id = diagnostics.register(
+            WatchedSource(
+                name=str(source_name),
+                audience=audience if audience else client_id,
+                discover=discover,
+                rejected_tokens=rejected_tokens,
+            )
+        )
+        weakref.finalize(authenticate_user, diagnostics.unregister, source_id)
     return authenticate_user
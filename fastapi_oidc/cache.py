@@ -0,0 +1,149 @@
+"""
+Thread-safe caches for the authentication hot path.
+
+FastAPI runs the sync ``authenticate_user`` in a threadpool, so every cache it
+reads is shared by many threads. ``cachetools`` caches are not thread-safe and
+wrapping them in a single lock makes every reader contend on it. ``StripedCache``
+instead keeps its entries in a plain ``dict``, whose single-key reads and writes
+are atomic both under the GIL and in free-threaded builds, so lookups take no
+lock at all. Misses briefly take one of several striped locks chosen by the
+key's hash to register an in-flight load, which makes concurrent loads of the
+same key single-flight (one thread loads, the others wait on its future and
+reuse its value). Loads run without any lock held, so a slow load never holds
+up misses on other keys that share its stripe.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+from typing import Generic
+from typing import Optional
+from typing import TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class StripedCache(Generic[K, V]):
+    """A bounded, optionally expiring cache with lock-free reads.
+
+    When more than ``maxsize`` entries are stored, expired entries and then the
+    oldest inserted ones are evicted (in batches, so eviction cost is amortized
+    over many inserts). Reads do not update recency, which keeps them free of
+    writes and locks.
+
+    Args:
+        maxsize: Maximum number of entries.
+        ttl: Seconds an entry stays valid after it was stored. ``None`` keeps
+            entries until they are evicted for space.
+        stripes: Number of locks that misses are spread over.
+        clock: Monotonic time source, replaceable in tests.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        *,
+        stripes: int = 16,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        self.maxsize = maxsize
+        self.ttl = math.inf if ttl is None else ttl
+        self.clock = clock
+        self._entries: dict[K, tuple[V, float]] = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._loading: dict[K, Future[V]] = {}
+        self._evict_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> Optional[V]:
+        """Return the valid entry for ``key``, or None. Takes no lock."""
+        entry = self._entries.get(key)
+        if entry is not None and self.clock() < entry[1]:
+            return entry[0]
+        return None
+
+    def set(self, key: K, value: V) -> None:
+        """Store ``value`` for ``key``, evicting entries if the cache is full."""
+        # Re-insert so that refreshed entries move to the back of the eviction order
+        self._entries.pop(key, None)
+        self._entries[key] = (value, self.clock() + self.ttl)
+        if len(self._entries) > self.maxsize:
+            self._evict()
+
+    def get_or_load(self, key: K, load: Callable[[], V]) -> V:
+        """Return the entry for ``key``, calling ``load`` once on a miss.
+
+        Concurrent callers missing the same key wait for the first one's
+        ``load`` instead of calling it too; no lock is held while it runs.
+        Exceptions from ``load`` propagate to that caller and those waiting,
+        and nothing is stored.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and self.clock() < entry[1]:
+            return entry[0]
+        lock = self._locks[hash(key) % len(self._locks)]
+        with lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() < entry[1]:
+                return entry[0]
+            future = self._loading.get(key)
+            if future is None:
+                future = self._loading[key] = Future()
+                loading = True
+            else:
+                loading = False
+        if not loading:
+            return future.result()
+
+        try:
+            value = load()
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with lock:
+                self._loading.pop(key, None)
+
+    def pop(self, key: K) -> Optional[V]:
+        """Remove and return the entry for ``key`` if present."""
+        entry = self._entries.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _evict(self) -> None:
+        with self._evict_lock:
+            excess = len(self._entries) - self.maxsize
+            if excess <= 0:
+                return
+            now = self.clock()
+            # list() copies the keys atomically, in insertion order
+            expired: list[K] = []
+            live: list[K] = []
+            for k in list(self._entries):
+                (expired if self._expired(k, now) else live).append(k)
+            for k in expired:
+                self._entries.pop(k, None)
+            excess -= len(expired)
+            if excess > 0:
+                # Evict an extra eighth so that the next inserts do not each
+                # pay for a scan
+                for k in live[: excess + self.maxsize // 8]:
+                    self._entries.pop(k, None)
+
+    def _expired(self, key: K, now: float) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] <= now
@@ -0,0 +1,115 @@
+"""
+Circuit breaker guarding calls to the authorization server.
+
+When the identity provider is down, every cache miss would otherwise block a
+worker for the full request timeout before failing. ``CircuitBreaker`` remembers
+failures and rejects further calls immediately for a backoff window that grows
+exponentially (with jitter) while the failures continue. Once the window has
+passed a single caller is let through to probe the endpoint; a success closes
+the circuit again.
+"""
+
+import random
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import TypeVar
+
+import requests
+
+from fastapi_oidc.exceptions import IdentityProviderUnavailableError
+
+T = TypeVar("T")
+
+#: Exceptions that count as a failed fetch. ``requests`` raises a subclass of
+#: ``ValueError`` when the response body is not valid JSON.
+FETCH_ERRORS = (requests.RequestException, ValueError)
+
+
+class CircuitBreaker:
+    """Fail fast after fetch failures, backing off exponentially with jitter.
+
+    The first ``failure_threshold`` consecutive failures are raised as is. After
+    that every failure opens the circuit for roughly
+    ``backoff * 2 ** (failures - failure_threshold)`` seconds, capped at
+    ``max_backoff``. While open, :meth:`call` raises
+    ``IdentityProviderUnavailableError`` without calling the wrapped function,
+    which acts as a short-lived negative cache of the last failure.
+
+    Args:
+        failure_threshold: Consecutive failures tolerated before opening.
+        backoff: Initial open window in seconds.
+        max_backoff: Upper bound of the open window in seconds.
+        clock: Monotonic time source, replaceable in tests.
+    """
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 1,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.failures = 0
+        self.open_until = 0.0
+        self.last_error: BaseException | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.clock() < self.open_until
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call ``fn`` unless the circuit is open.
+
+        Raises:
+            IdentityProviderUnavailableError: If the circuit is open.
+            Any exception raised by ``fn``.
+        """
+        with self._lock:
+            now = self.clock()
+            if now < self.open_until:
+                raise IdentityProviderUnavailableError(
+                    f"Authorization server unavailable, retrying in "
+                    f"{self.open_until - now:.1f}s. Last error: {self.last_error}",
+                    retry_after=self.open_until - now,
+                ) from self.last_error
+            if self.failures >= self.failure_threshold:
+                # Half-open: claim the probe by keeping the circuit open for
+                # everyone else until this call finishes or its window expires.
+                self.open_until = now + self._window()
+
+        try:
+            result = fn(*args, **kwargs)
+        except FETCH_ERRORS as err:
+            with self._lock:
+                self.failures += 1
+                self.last_error = err
+                if self.failures >= self.failure_threshold:
+                    self.open_until = self.clock() + self._window()
+            raise
+
+        with self._lock:
+            self.failures = 0
+            self.open_until = 0.0
+            self.last_error = None
+        return result
+
+    def reset(self) -> None:
+        """Close the circuit, so the next call goes through."""
+        with self._lock:
+            self.failures = 0
+            self.open_until = 0.0
+
+    def _window(self) -> float:
+        exponent = max(0, self.failures - self.failure_threshold)
+        window = min(self.max_backoff, self.backoff * 2**exponent)
+        # "Equal jitter": keep at least half the window so the circuit stays
+        # open, but spread the probes of many workers over the other half.
+        return window / 2 + random.uniform(0, window / 2)  # nosec B311
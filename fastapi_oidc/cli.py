@@ -0,0 +1,318 @@
+"""
+Command line tools: ``python -m fastapi_oidc``.
+
+``verify`` re-verifies ID tokens in bulk, e.g. tokens from access logs against
+an archived JWKS snapshot. Tokens are read one per line from a file or stdin,
+either as plain tokens (an optional ``Bearer`` prefix is ignored) or as JSON
+objects holding the token in a field. They are verified in chunks across a
+pool of worker processes, at most a few chunks per worker in flight, and one
+JSON result per token is written to stdout in input order, so memory stays
+bounded however large the input is. A throughput summary goes to stderr.
+
+Expiry and not-before are checked against the current time, or with ``--at``
+against another one, e.g. when the tokens were logged.
+
+Usage
+=====
+
+.. code-block:: bash
+
+    # Against a JWKS snapshot
+    python -m fastapi_oidc verify tokens.txt --jwks jwks-2026-01.json \\
+        --issuer https://auth.example.com --audience my-client-id \\
+        --algorithm RS256 --at 2026-01-15T12:00:00Z > results.jsonl
+
+    # Against the provider's current keys, reading JSONL from stdin
+    zcat audit.jsonl.gz | python -m fastapi_oidc verify --field token \\
+        --server https://auth.example.com --audience my-client-id
+
+The exit status is 0 when every token is valid and 1 otherwise.
+"""
+
+import argparse
+import collections
+import datetime
+import itertools
+import json
+import os
+import sys
+import time
+from collections.abc import Iterable
+from collections.abc import Iterator
+from collections.abc import Sequence
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+from typing import Optional
+from typing import TextIO
+
+import requests
+from jose.exceptions import JWTError
+
+from fastapi_oidc import discovery
+from fastapi_oidc.verifier import Verifier
+
+#: A numbered input line: ``(line number, token or None, error or None)``.
+Item = tuple[int, Optional[str], Optional[str]]
+
+# The verifier of each worker process, set by _init_worker
+_worker_verifier: Optional[Verifier] = None
+_worker_keys: Any = None
+_worker_now: Optional[float] = None
+
+
+def read_tokens(lines: Iterable[str], field: str) -> Iterator[Item]:
+    """Yield the token (or why none was found) of each non-blank input line."""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                value = json.loads(line).get(field)
+            except ValueError:
+                yield number, None, "Invalid JSON"
+                continue
+            if not isinstance(value, str):
+                yield number, None, f"No {field} field"
+                continue
+            line = value
+        yield number, line.rpartition(" ")[2], None
+
+
+def verify_token(
+    verifier: Verifier, keys: Any, id_token: str, now: Optional[float] = None
+) -> dict[str, Any]:
+    """Verify one token and describe the outcome as a JSON-able dict.
+
+    ``exp`` and ``nbf`` are checked against Unix time ``now``, the current
+    time unless given.
+    """
+    try:
+        token = verifier.parse(id_token)
+    except JWTError as err:
+        return {"valid": False, "error": str(err)}
+    result: dict[str, Any] = {"kid": token.header.get("kid")}
+    try:
+        claims = verifier.verify(token, keys, now=now)
+    except JWTError as err:
+        return {**result, "valid": False, "error": str(err)}
+    return {**result, "valid": True, "sub": claims.get("sub"), "iss": claims.get("iss")}
+
+
+def _init_worker(verifier: Verifier, keys: Any, now: Optional[float] = None) -> None:
+    global _worker_verifier, _worker_keys, _worker_now
+    _worker_verifier, _worker_keys, _worker_now = verifier, keys, now
+
+
+def _verify_chunk(chunk: Sequence[Item]) -> list[dict[str, Any]]:
+    assert _worker_verifier is not None  # nosec B101 - set by _init_worker
+    results = []
+    for number, id_token, error in chunk:
+        if id_token is None:
+            result: dict[str, Any] = {"valid": False, "error": error}
+        else:
+            result = verify_token(_worker_verifier, _worker_keys, id_token, _worker_now)
+        results.append({"line": number, **result})
+    return results
+
+
+def _chunks(items: Iterable[Item], size: int) -> Iterator[list[Item]]:
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def verify_stream(
+    items: Iterable[Item],
+    verifier: Verifier,
+    keys: Any,
+    *,
+    workers: int = 1,
+    chunk_size: int = 256,
+    max_chunks_in_flight: Optional[int] = None,
+    now: Optional[float] = None,
+) -> Iterator[list[dict[str, Any]]]:
+    """Verify ``items`` in chunks and yield the results of each chunk in order.
+
+    With ``workers`` > 1 chunks are verified in a process pool and at most
+    ``max_chunks_in_flight`` (default: twice the number of workers) are
+    submitted at a time, so the input is read only as fast as it is verified.
+    ``now`` is the Unix time expiry is checked against, as for
+    :func:`verify_token`.
+    """
+    chunks = _chunks(items, chunk_size)
+    if workers <= 1:
+        _init_worker(verifier, keys, now)
+        for chunk in chunks:
+            yield _verify_chunk(chunk)
+        return
+
+    limit = max_chunks_in_flight or 2 * workers
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(verifier, keys, now)
+    ) as pool:
+        in_flight: collections.deque[Future[list[dict[str, Any]]]] = collections.deque()
+        for chunk in chunks:
+            if len(in_flight) >= limit:
+                yield in_flight.popleft().result()
+            in_flight.append(pool.submit(_verify_chunk, chunk))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def _load_keys(args: argparse.Namespace) -> tuple[Any, Optional[dict[str, Any]]]:
+    """Return the JWKS and, when discovered, the discovery document."""
+    if args.jwks:
+        with open(args.jwks) as f:
+            return json.load(f), None
+    discover = discovery.configure(cache_ttl=3600)
+    document = discover.auth_server(base_url=args.server.rstrip("/"))
+    return discover.public_keys(document), document
+
+
+def _algorithms(
+    args: argparse.Namespace, keys: Any, document: Optional[dict[str, Any]]
+) -> list[str]:
+    if args.algorithm:
+        return args.algorithm
+    if document is not None:
+        return list(document["id_token_signing_alg_values_supported"])
+    entries = keys.get("keys", []) if isinstance(keys, dict) else []
+    listed = {key.get("alg") for key in entries if isinstance(key, dict)}
+    return sorted(alg for alg in listed if isinstance(alg, str))
+
+
+def _timestamp(value: str) -> float:
+    """Parse Unix time or an ISO 8601 date and time (UTC unless offset)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        # fromisoformat only accepts a Z suffix from Python 3.11
+        moment = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time: {value!r}")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m fastapi_oidc")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify = commands.add_parser(
+        "verify",
+        help="verify tokens in bulk",
+        description="Verify ID tokens read one per line; write JSONL results.",
+    )
+    verify.add_argument(
+        "input", nargs="?", default="-", help="token file (default: stdin)"
+    )
+    keys = verify.add_mutually_exclusive_group(required=True)
+    keys.add_argument("--jwks", help="JWKS file to verify against")
+    keys.add_argument(
+        "--server",
+        help="base_authorization_server_uri to discover the current keys from",
+    )
+    verify.add_argument(
+        "--issuer",
+        action="append",
+        help="accepted iss (repeatable; default: --server)",
+    )
+    verify.add_argument(
+        "--audience", action="append", required=True, help="accepted aud (repeatable)"
+    )
+    verify.add_argument(
+        "--algorithm",
+        action="append",
+        help="accepted alg (repeatable; default: from discovery or the JWKS)",
+    )
+    verify.add_argument(
+        "--leeway",
+        type=int,
+        default=0,
+        help="seconds of exp/nbf tolerance, e.g. the age of archived tokens",
+    )
+    verify.add_argument(
+        "--at",
+        type=_timestamp,
+        help="check exp/nbf at this Unix time or ISO 8601 UTC time (default: now)",
+    )
+    verify.add_argument(
+        "--field",
+        default="id_token",
+        help="token field of JSON input lines (default: id_token)",
+    )
+    verify.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes (default: CPU count; 1 verifies in-process)",
+    )
+    verify.add_argument(
+        "--chunk-size", type=int, default=256, help="tokens per batch (default: 256)"
+    )
+    return parser
+
+
+def run_verify(args: argparse.Namespace, stdout: TextIO, stderr: TextIO) -> int:
+    try:
+        keys, document = _load_keys(args)
+    except (OSError, ValueError, requests.RequestException) as err:
+        stderr.write(f"error: cannot load keys: {err}\n")
+        return 2
+    issuers = args.issuer or ([args.server.rstrip("/")] if args.server else None)
+    if not issuers:
+        stderr.write("error: --issuer is required with --jwks\n")
+        return 2
+    algorithms = _algorithms(args, keys, document)
+    if not algorithms:
+        stderr.write("error: no algorithms in the JWKS, pass --algorithm\n")
+        return 2
+    verifier = Verifier.create(
+        issuer=issuers,
+        audience=args.audience,
+        algorithms=algorithms,
+        leeway=args.leeway,
+    )
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    started = time.perf_counter()
+    counts: collections.Counter[bool] = collections.Counter()
+    try:
+        for results in verify_stream(
+            read_tokens(source, args.field),
+            verifier,
+            keys,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            now=args.at,
+        ):
+            for result in results:
+                counts[result["valid"]] += 1
+                stdout.write(json.dumps(result) + "\n")
+            stdout.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    elapsed = time.perf_counter() - started
+    total = counts[True] + counts[False]
+    stderr.write(
+        f"verified {total} tokens in {elapsed:.2f}s "
+        f"({total / elapsed if elapsed else 0:.0f}/s): "
+        f"{counts[True]} valid, {counts[False]} invalid\n"
+    )
+    return 1 if counts[False] else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the command line interface and return the exit status."""
+    args = _parser().parse_args(argv)
+    if args.workers < 1 or args.chunk_size < 1:
+        sys.stderr.write("error: --workers and --chunk-size must be at least 1\n")
+        return 2
+    return run_verify(args, sys.stdout, sys.stderr)
@@ -0,0 +1,222 @@
+"""
+Admin router reporting and controlling the caches of ``get_auth`` instances.
+
+During an incident it helps to see what the auth layer holds: which discovery
+document and key ids, when they were fetched and when they expire, how often
+lookups hit the cache and what the last fetch error was. It also helps to push
+a key rotation through without restarting every worker.
+
+Pass one ``CacheDiagnostics`` to the ``get_auth`` calls to watch and mount the
+router ``get_diagnostics_router`` returns for it. It answers:
+
+- ``GET {prefix}``: the cache state of every watched instance.
+- ``POST {prefix}/refresh``: fetch the cached discovery documents and key sets
+  again now, even while fetches fail fast after errors.
+- ``POST {prefix}/purge``: drop cached discovery documents, key sets and/or
+  rejected tokens, so the next request fetches or verifies them afresh.
+
+Both POST endpoints take an optional ``source`` query parameter restricting
+them to one provider. The controls act on the process that handles the
+request; with ``shared_cache_path``, refreshed documents are also written to
+the shared file, which other workers read once their copy expires.
+
+The router exposes no authentication of its own: ``dependencies`` is required
+so that mounting it unprotected is a deliberate choice.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi import Depends, HTTPException
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.diagnostics import CacheDiagnostics
+    from fastapi_oidc.diagnostics import get_diagnostics_router
+
+    diagnostics = CacheDiagnostics()
+    authenticate_user = get_auth(**OIDC_config, diagnostics=diagnostics)
+
+    def require_admin(user=Depends(authenticate_user)):
+        if "oidc-admin" not in getattr(user, "roles", []):
+            raise HTTPException(status_code=403)
+
+    app.include_router(
+        get_diagnostics_router(diagnostics, dependencies=[Depends(require_admin)])
+    )
+"""
+
+import itertools
+import threading
+from collections.abc import Collection
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+from typing import Literal
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi import Query
+from starlette.responses import JSONResponse
+
+from fastapi_oidc.cache import StripedCache
+from fastapi_oidc.circuit import FETCH_ERRORS
+
+#: Caches ``CacheDiagnostics.purge`` can drop.
+CACHES = ("discovery", "jwks", "rejected_tokens")
+
+CacheName = Literal["discovery", "jwks", "rejected_tokens"]
+
+
+@dataclass(frozen=True)
+class WatchedSource:
+    """The caches of one ``get_auth`` instance.
+
+    Attributes:
+        name: The provider's base URI, JWKS URL or key file.
+        audience: The audience the instance accepts.
+        discover: Its discovery namespace or ``StaticKeys``.
+        rejected_tokens: Its rejected token cache, if enabled.
+    """
+
+    name: str
+    audience: str
+    discover: Any
+    rejected_tokens: Optional[StripedCache[bytes, str]] = None
+
+
+class CacheDiagnostics:
+    """Collects the caches of the ``get_auth`` instances given this object.
+
+    Instances are unregistered when their ``authenticate_user`` is garbage
+    collected. Thread-safe.
+    """
+
+    def __init__(self) -> None:
+        self._sources: dict[int, WatchedSource] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def register(self, source: WatchedSource) -> int:
+        """Watch ``source``; returns the id to pass to :meth:`unregister`."""
+        with self._lock:
+            source_id = next(self._ids)
+            self._sources[source_id] = source
+        return source_id
+
+    def unregister(self, source_id: int) -> None:
+        with self._lock:
+            self._sources.pop(source_id, None)
+
+    def _matching(self, name: Optional[str]) -> list[WatchedSource]:
+        with self._lock:
+            sources = list(self._sources.values())
+        return [s for s in sources if name is None or s.name == name]
+
+    def state(self) -> list[dict[str, Any]]:
+        """Return a JSON serializable snapshot of every watched instance."""
+        report = []
+        for source in self._matching(None):
+            entry: dict[str, Any] = {"source": source.name, "audience": source.audience}
+            state = getattr(source.discover, "state", None)
+            if state is not None:
+                entry.update(state())
+            if source.rejected_tokens is not None:
+                entry["rejected_tokens"] = {
+                    "size": len(source.rejected_tokens),
+                    "maxsize": source.rejected_tokens.maxsize,
+                }
+            report.append(entry)
+        return report
+
+    def refresh(self, name: Optional[str] = None) -> dict[str, Any]:
+        """Fetch the documents of the matching instances again now.
+
+        Instances sharing a provider through a ``ProviderRegistry`` are
+        refreshed once.
+
+        Returns:
+            ``{"refreshed": [urls], "errors": [{"source", "error"}]}``
+        """
+        refreshed: list[str] = []
+        errors: list[dict[str, str]] = []
+        seen: set[int] = set()
+        for source in self._matching(name):
+            if id(source.discover) in seen or not hasattr(source.discover, "refresh"):
+                continue
+            seen.add(id(source.discover))
+            try:
+                refreshed.extend(source.discover.refresh())
+            except (*FETCH_ERRORS, OSError) as err:
+                errors.append({"source": source.name, "error": str(err)})
+        return {"refreshed": refreshed, "errors": errors}
+
+    def purge(
+        self, name: Optional[str] = None, caches: Collection[str] = CACHES
+    ) -> dict[str, Any]:
+        """Drop the given caches of the matching instances.
+
+        Returns:
+            ``{"purged": [urls], "rejected_tokens": number of entries dropped}``
+        """
+        unknown = set(caches) - set(CACHES)
+        if unknown:
+            raise ValueError(f"Unknown caches: {sorted(unknown)}")
+        documents = [cache for cache in caches if cache != "rejected_tokens"]
+        purged: list[str] = []
+        rejected = 0
+        seen: set[int] = set()
+        for source in self._matching(name):
+            if documents and id(source.discover) not in seen:
+                seen.add(id(source.discover))
+                purge = getattr(source.discover, "purge", None)
+                if purge is not None:
+                    purged.extend(purge(documents))
+            if "rejected_tokens" in caches and source.rejected_tokens is not None:
+                rejected += len(source.rejected_tokens)
+                source.rejected_tokens.clear()
+        return {"purged": purged, "rejected_tokens": rejected}
+
+
+def get_diagnostics_router(
+    diagnostics: CacheDiagnostics,
+    *,
+    dependencies: Sequence[Any],
+    prefix: str = "/oidc-diagnostics",
+) -> APIRouter:
+    """Return a router reporting and controlling the caches in ``diagnostics``.
+
+    Args:
+        diagnostics: The object passed to the ``get_auth`` calls to watch.
+        dependencies: Dependencies run before every endpoint, e.g.
+            ``[Depends(require_admin)]``. Required; pass ``[]`` only if the
+            router is protected otherwise (a private port, a proxy rule).
+        prefix: Path the endpoints are mounted under.
+
+    Returns:
+        A router answering ``GET {prefix}``, ``POST {prefix}/refresh`` (503
+        if a fetch failed) and ``POST {prefix}/purge``.
+    """
+    router = APIRouter(prefix=prefix, dependencies=list(dependencies))
+    headers = {"Cache-Control": "no-store"}
+
+    @router.get("", include_in_schema=False)
+    def cache_state() -> JSONResponse:
+        return JSONResponse({"providers": diagnostics.state()}, headers=headers)
+
+    @router.post("/refresh", include_in_schema=False)
+    def refresh(source: Optional[str] = None) -> JSONResponse:
+        result = diagnostics.refresh(source)
+        status_code = 503 if result["errors"] else 200
+        return JSONResponse(result, status_code=status_code, headers=headers)
+
+    @router.post("/purge", include_in_schema=False)
+    def purge(
+        source: Optional[str] = None,
+        cache: list[CacheName] = Query(default=list(CACHES)),
+    ) -> JSONResponse:
+        return JSONResponse(diagnostics.purge(source, cache), headers=headers)
+
+    return router
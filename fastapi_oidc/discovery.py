@@ -1,32 +1,321 @@
+import json
+import logging
+import threading
+import time
+from collections.abc import Collection
+from collections.abc import Sequence
 from typing import Any
+from typing import Callable
+from typing import Optional
 
 import requests
-from cachetools import TTLCache
-from cachetools import cached
 
+from fastapi_oidc.cache import StripedCache
+from fastapi_oidc.circuit import FETCH_ERRORS
+from fastapi_oidc.circuit import CircuitBreaker
+from fastapi_oidc.exceptions import DocumentTooLargeError
+from fastapi_oidc.mirrors import MirrorSet
+from fastapi_oidc.mirrors import validate_discovery_document
+from fastapi_oidc.mirrors import validate_jwks
+from fastapi_oidc.shared_cache import SharedDocumentCache
+from fastapi_oidc.x5c import TrustStore
+from fastapi_oidc.x5c import trusted_keys
 
-def configure(*_, cache_ttl: int):
+logger = logging.getLogger(__name__)
+
+#: Largest discovery document or JWKS accepted, in bytes.
+MAX_DOCUMENT_SIZE = 1024 * 1024
+
+#: URLs (discovery document plus JWKS, and any that replaced them) whose
+#: documents, stale copies and circuit breakers are kept per configuration.
+MAX_URLS = 8
+
+
+def _make_room(mapping: dict[str, Any], url: str) -> None:
+    # Insertion ordered, so the first key is the URL stored longest ago
+    if url not in mapping and len(mapping) >= MAX_URLS:
+        mapping.pop(next(iter(mapping), url), None)
+
+
+def read_json(response: requests.Response, max_size: int) -> Any:
+    """Read the JSON body of a ``stream=True`` response, up to ``max_size`` bytes.
+
+    A ``Content-Length`` above the limit is refused before reading anything,
+    and reading stops as soon as the body exceeds it, so an oversized or
+    endless response never has to fit in memory.
+
+    Raises:
+        DocumentTooLargeError: If the body is larger than ``max_size``.
+        requests.exceptions.InvalidJSONError: If the body is not JSON.
+    """
+    too_large = DocumentTooLargeError(
+        f"{response.url} returned more than {max_size} bytes"
+    )
+    length = response.headers.get("Content-Length", "")
+    if length.isdigit() and int(length) > max_size:
+        raise too_large
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        body += chunk
+        if len(body) > max_size:
+            raise too_large
+    try:
+        return json.loads(body)
+    except ValueError as err:
+        raise requests.exceptions.InvalidJSONError(
+            f"{response.url} did not return JSON: {err}"
+        ) from err
+
+
+def configure(
+    *_,
+    cache_ttl: int,
+    stale_if_error: int = 0,
+    failure_backoff: float = 1.0,
+    max_failure_backoff: float = 60.0,
+    fetch_timeout: float = 15,
+    discovery_mirrors: Sequence[str] = (),
+    jwks_mirrors: Sequence[str] = (),
+    hedge_delay: Optional[float] = None,
+    shared_cache_path: Optional[str] = None,
+    trust_anchors: Sequence[str | bytes] = (),
+    jwks_uri: Optional[str] = None,
+    algorithms: Sequence[str] = (),
+):
     """Configure OIDC discovery functions with caching.
 
     This factory function creates a set of cached discovery functions
     for retrieving OIDC server configuration, public keys, and signing
-    algorithms. All functions are cached using TTL-based caching.
+    algorithms. All functions are cached using TTL-based caching; the cache is
+    safe for concurrent use and a document that expired is fetched by a single
+    thread while the others wait for its result.
+
+    Fetches go through a per-URL ``CircuitBreaker``: after a failure further
+    fetches of that URL fail immediately with ``IdentityProviderUnavailableError``
+    for ``failure_backoff`` seconds, doubling (with jitter) on each consecutive
+    failure up to ``max_failure_backoff``.
+
+    When mirrors are configured, the discovery document or JWKS is fetched from
+    the primary URL and its mirrors through a ``MirrorSet``: fastest mirror first,
+    failing over on errors or inconsistent responses, and hedging with a second
+    request after ``hedge_delay`` seconds.
+
+    With ``shared_cache_path`` the documents are cached in a
+    ``SharedDocumentCache`` instead of per process, so the worker processes of a
+    pre-fork server on one host share a single fetch per TTL.
+
+    With ``trust_anchors``, ``public_keys`` only returns keys whose ``x5c``
+    certificate chain leads to one of them (see ``fastapi_oidc.x5c``). Chains
+    are validated once per fetched JWKS and again when a certificate expires.
+
+    With ``jwks_uri``, discovery is skipped: ``auth_server`` returns a document
+    naming that JWKS and ``algorithms`` without fetching anything, so the
+    first token costs one fetch instead of two.
+
+    For diagnostics, ``state`` reports the cached documents (fetch times, key
+    ids, last errors) and lookup counts, ``refresh`` fetches every cached
+    document again right away and ``purge`` drops cached documents so the
+    next lookup fetches them.
+
+    Memory is bounded: responses larger than ``MAX_DOCUMENT_SIZE`` bytes are
+    rejected as soon as their size is known, without reading them whole, and
+    documents, stale copies and breakers are kept for at most ``MAX_URLS``
+    URLs.
 
     Args:
         cache_ttl: Time-to-live for cached values in seconds.
+        stale_if_error: Seconds past expiry during which the last successfully
+            fetched discovery document and keys are served if refreshing them
+            fails. 0 disables serving stale values.
+        failure_backoff: Initial seconds to fail fast after a fetch failure.
+        max_failure_backoff: Upper bound on the fail-fast window in seconds.
+        fetch_timeout: Timeout in seconds for each HTTP request.
+        discovery_mirrors: Base URIs of hosts serving the same
+            ``/.well-known/openid-configuration`` as the auth server.
+        jwks_mirrors: URLs serving the same JWKS as the discovered ``jwks_uri``.
+        hedge_delay: Seconds to wait on a mirror before also asking the next one.
+            ``None`` only fails over after errors.
+        shared_cache_path: File used to share cached documents with other
+            processes on this host. ``None`` keeps the cache per process.
+        trust_anchors: PEM encoded CA certificates that the ``x5c`` chains of
+            keys must lead to. Empty accepts keys without checking chains.
+        jwks_uri: URL of the JWKS, to use instead of the discovered one.
+        algorithms: Accepted signing algorithms; required with ``jwks_uri``.
 
     Returns:
-        A functions namespace object with three methods:
+        A functions namespace object with these methods:
         - auth_server: Discover OIDC server configuration
         - public_keys: Retrieve public signing keys
         - signing_algos: Get supported signing algorithms
+        - fetch_count: Number of fetches made by the calling thread
+        - state: Snapshot of the cached documents and counters
+        - refresh: Fetch the cached documents again now
+        - purge: Drop cached documents
+
+    Raises:
+        ValueError: If ``jwks_uri`` is given without ``algorithms``.
 
     Example:
         >>> discover = configure(cache_ttl=3600)
         >>> config = discover.auth_server(base_url="https://auth.example.com")
     """
 
-    @cached(TTLCache(1, cache_ttl), key=lambda d: d["jwks_uri"])
+    breakers: dict[str, CircuitBreaker] = {}
+    last_good: dict[str, tuple[Any, float]] = {}
+    mirror_sets: dict[str, MirrorSet] = {}
+    fetches = threading.local()
+    # URL -> "discovery" or "jwks", for every URL looked up
+    kinds: dict[str, str] = {}
+    # URL -> (message, time) of its last failed fetch
+    errors: dict[str, tuple[str, float]] = {}
+    # Unlocked increments may race, which only skews the reported hit ratio
+    counters = {"lookups": 0, "fetches": 0}
+    trust_store = TrustStore(trust_anchors) if trust_anchors else None
+    # (fetched JWKS, its trusted keys, when to validate its chains again)
+    trusted: Optional[tuple[Any, dict[str, Any], float]] = None
+    direct_document: Optional[dict[str, Any]] = None
+    if jwks_uri is not None:
+        if not algorithms:
+            raise ValueError("algorithms is required with jwks_uri")
+        direct_document = {
+            "jwks_uri": jwks_uri,
+            "id_token_signing_alg_values_supported": list(algorithms),
+        }
+
+    def thread_fetch_count() -> int:
+        """Number of documents this thread has fetched, for cache hit tracing."""
+        return getattr(fetches, "count", 0)
+
+    def note_lookup(url: str, kind: str) -> None:
+        counters["lookups"] += 1
+        if url not in kinds:
+            _make_room(kinds, url)
+            kinds[url] = kind
+
+    def fetch_one(url: str) -> Any:
+        breaker = breakers.get(url)
+        if breaker is None:
+            _make_room(breakers, url)
+            breaker = breakers.setdefault(
+                url,
+                CircuitBreaker(
+                    backoff=failure_backoff, max_backoff=max_failure_backoff
+                ),
+            )
+
+        def fetch() -> Any:
+            r = requests.get(url, timeout=fetch_timeout, stream=True)
+            try:
+                # If the auth server is failing, token verification is impossible
+                r.raise_for_status()
+                return read_json(r, MAX_DOCUMENT_SIZE)
+            finally:
+                r.close()
+
+        return breaker.call(fetch)
+
+    def fetch_json(
+        url: str,
+        mirror_urls: Sequence[str] = (),
+        validate: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        fetches.count = thread_fetch_count() + 1
+        counters["fetches"] += 1
+        try:
+            if mirror_urls:
+                mirrors = mirror_sets.get(url)
+                if mirrors is None:
+                    _make_room(mirror_sets, url)
+                    mirrors = mirror_sets.setdefault(
+                        url, MirrorSet([url, *mirror_urls], hedge_delay=hedge_delay)
+                    )
+                value = mirrors.fetch(fetch_one, validate)
+            else:
+                value = fetch_one(url)
+        except FETCH_ERRORS as err:
+            _make_room(errors, url)
+            errors[url] = (str(err), time.time())
+            raise
+        _make_room(last_good, url)
+        last_good[url] = (value, time.monotonic())
+        return value
+
+    def stale_or_raise(url: str, err: Exception) -> Any:
+        if stale_if_error > 0 and url in last_good:
+            value, fetched_at = last_good[url]
+            age = time.monotonic() - fetched_at
+            if age <= cache_ttl + stale_if_error:
+                logger.warning(
+                    "Serving %.0fs old copy of %s after refresh failed: %s",
+                    age,
+                    url,
+                    err,
+                )
+                return value
+        raise err
+
+    def load_public_keys(OIDC_spec: dict[str, Any]) -> dict[str, Any]:
+        return fetch_json(OIDC_spec["jwks_uri"], jwks_mirrors, validate_jwks)
+
+    def load_auth_server(discovery_url: str) -> dict[str, Any]:
+        previous = last_good.get(discovery_url)
+        return fetch_json(
+            discovery_url,
+            [f"{m}/.well-known/openid-configuration" for m in discovery_mirrors],
+            validate_discovery_document(
+                previous[0].get("issuer") if previous else None
+            ),
+        )
+
+    cached_public_keys: Callable[[dict[str, Any]], dict[str, Any]]
+    cached_auth_server: Callable[[str], dict[str, Any]]
+    if shared_cache_path is None:
+        documents: StripedCache[str, dict[str, Any]] = StripedCache(
+            maxsize=MAX_URLS, ttl=cache_ttl
+        )
+
+        def cached_public_keys(OIDC_spec: dict[str, Any]) -> dict[str, Any]:
+            return documents.get_or_load(
+                OIDC_spec["jwks_uri"], lambda: load_public_keys(OIDC_spec)
+            )
+
+        def cached_auth_server(discovery_url: str) -> dict[str, Any]:
+            return documents.get_or_load(
+                discovery_url, lambda: load_auth_server(discovery_url)
+            )
+
+        def store(url: str, value: Any) -> None:
+            documents.set(url, value)
+
+        def discard(url: str) -> None:
+            documents.pop(url)
+
+    else:
+        shared = SharedDocumentCache(shared_cache_path)
+
+        def shared_lookup(
+            url: str, load: Callable[[], Any], ttl: float = cache_ttl
+        ) -> Any:
+            value, age = shared.lookup(url, ttl, load)
+            _make_room(last_good, url)
+            last_good[url] = (value, time.monotonic() - age)
+            return value
+
+        def cached_public_keys(OIDC_spec: dict[str, Any]) -> dict[str, Any]:
+            return shared_lookup(
+                OIDC_spec["jwks_uri"], lambda: load_public_keys(OIDC_spec)
+            )
+
+        def cached_auth_server(discovery_url: str) -> dict[str, Any]:
+            return shared_lookup(discovery_url, lambda: load_auth_server(discovery_url))
+
+        def store(url: str, value: Any) -> None:
+            # A TTL of 0 replaces the shared entry for the other processes too
+            shared_lookup(url, lambda: value, ttl=0)
+
+        def discard(url: str) -> None:
+            shared.discard(url)
+
     def get_authentication_server_public_keys(
         OIDC_spec: dict[str, Any]
     ) -> dict[str, Any]:
@@ -39,11 +328,26 @@ def configure(*_, cache_ttl: int):
             Dictionary containing the public keys in JWKS format.
 
         Raises:
-            requests.RequestException: If the request to fetch keys fails.
+            requests.RequestException: If the request to fetch keys fails and
+                no stale copy may be served.
         """
-        keys_uri = OIDC_spec["jwks_uri"]
-        r = requests.get(keys_uri, timeout=15)
-        keys = r.json()
+        note_lookup(OIDC_spec["jwks_uri"], "jwks")
+        try:
+            jwks = cached_public_keys(OIDC_spec)
+        except FETCH_ERRORS as err:
+            jwks = stale_or_raise(OIDC_spec["jwks_uri"], err)
+        if trust_store is None:
+            return jwks
+        return trusted_public_keys(jwks, trust_store)
+
+    def trusted_public_keys(jwks: Any, store: TrustStore) -> dict[str, Any]:
+        nonlocal trusted
+        now = time.time()
+        current = trusted
+        if current is not None and current[0] is jwks and now < current[2]:
+            return current[1]
+        keys, recheck_at = trusted_keys(jwks, store, now)
+        trusted = (jwks, keys, recheck_at)
         return keys
 
     def get_signing_algos(OIDC_spec: dict[str, Any]) -> list[str]:
@@ -58,7 +362,6 @@ def configure(*_, cache_ttl: int):
         algos = OIDC_spec["id_token_signing_alg_values_supported"]
         return algos
 
-    @cached(TTLCache(1, cache_ttl))
     def discover_auth_server(*_, base_url: str) -> dict[str, Any]:
         """Discover OIDC server configuration via well-known endpoint.
 
@@ -71,17 +374,108 @@ def configure(*_, cache_ttl: int):
         Raises:
             requests.HTTPError: If the discovery endpoint returns an error.
             requests.RequestException: If the network request fails.
+            IdentityProviderUnavailableError: If recent fetches failed and the
+                endpoint is in its fail-fast window.
         """
+        if direct_document is not None:
+            return direct_document
         discovery_url = f"{base_url}/.well-known/openid-configuration"
-        r = requests.get(discovery_url, timeout=15)
-        # If the auth server is failing, token verification is impossible
-        r.raise_for_status()
-        configuration = r.json()
-        return configuration
+        note_lookup(discovery_url, "discovery")
+        try:
+            return cached_auth_server(discovery_url)
+        except FETCH_ERRORS as err:
+            return stale_or_raise(discovery_url, err)
+
+    def cache_state() -> dict[str, Any]:
+        """Return a JSON serializable snapshot of the cached documents.
+
+        Each document lists its URL, kind, fetch time (seconds since the
+        epoch), age and seconds until it expires (negative while a stale copy
+        is served), the key ids of a JWKS, whether fetches of it currently fail
+        fast, and its last fetch error.
+        """
+        now, wall_clock = time.monotonic(), time.time()
+        documents_state = []
+        for url, kind in list(kinds.items()):
+            entry: dict[str, Any] = {"url": url, "kind": kind}
+            good = last_good.get(url)
+            if good is not None:
+                value, fetched_at = good
+                age = now - fetched_at
+                entry.update(
+                    fetched_at=wall_clock - age, age=age, expires_in=cache_ttl - age
+                )
+                if kind == "jwks" and isinstance(value, dict):
+                    entry["kids"] = [
+                        key.get("kid")
+                        for key in value.get("keys", [])
+                        if isinstance(key, dict)
+                    ]
+            breaker = breakers.get(url)
+            entry["circuit_open"] = breaker is not None and breaker.is_open
+            error = errors.get(url)
+            if error is not None:
+                entry["last_error"] = {"error": error[0], "at": error[1]}
+            documents_state.append(entry)
+        lookups, fetch_total = counters["lookups"], counters["fetches"]
+        return {
+            "cache_ttl": cache_ttl,
+            "stale_if_error": stale_if_error,
+            "lookups": lookups,
+            "fetches": fetch_total,
+            "hit_ratio": max(0, lookups - fetch_total) / lookups if lookups else None,
+            "documents": documents_state,
+        }
+
+    def refresh_documents() -> list[str]:
+        """Fetch every document looked up so far again, replacing cached copies.
+
+        Fetches bypass an open circuit breaker. Discovery documents are
+        fetched before key sets.
+
+        Returns:
+            The refreshed URLs.
+
+        Raises:
+            requests.RequestException: If a fetch fails. Documents refreshed
+                before it keep their new copy, the others their old one.
+        """
+        urls = sorted(kinds, key=lambda url: kinds[url] != "discovery")
+        for url in urls:
+            breaker = breakers.get(url)
+            if breaker is not None:
+                breaker.reset()
+            if kinds[url] == "discovery":
+                store(url, load_auth_server(url))
+            else:
+                store(url, load_public_keys({"jwks_uri": url}))
+        return urls
+
+    def purge_documents(
+        purge_kinds: Collection[str] = ("discovery", "jwks")
+    ) -> list[str]:
+        """Drop the cached documents and stale copies of the given kinds.
+
+        Returns:
+            The purged URLs.
+        """
+        nonlocal trusted
+        urls = [url for url, kind in list(kinds.items()) if kind in purge_kinds]
+        for url in urls:
+            discard(url)
+            last_good.pop(url, None)
+        if "jwks" in purge_kinds:
+            trusted = None
+        return urls
 
     class functions:
+        mirrors = mirror_sets
+        fetch_count = thread_fetch_count
         auth_server = discover_auth_server
         public_keys = get_authentication_server_public_keys
         signing_algos = get_signing_algos
+        state = cache_state
+        refresh = refresh_documents
+        purge = purge_documents
 
     return functions
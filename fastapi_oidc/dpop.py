@@ -0,0 +1,344 @@
+"""
+Verification of DPoP proofs for sender-constrained tokens (RFC 9449).
+
+With DPoP the client signs a short-lived proof JWT for every request with a
+key of its own, and the token it presents is bound to that key by the SHA-256
+JWK thumbprint in its ``cnf.jkt`` claim. A stolen token is useless without
+the key.
+
+``DPoPVerifier`` checks a proof: header (``typ``, ``alg``, public ``jwk``),
+signature, ``htm``/``htu`` against the request, ``iat`` freshness, ``ath``
+against the access token, and that its ``jti`` was not seen before. Two caches
+keep that cheap on the request path:
+
+* The thumbprint and verification key of each proof key are computed once and
+  reused for every later proof signed with it, since a client keeps its key.
+* Seen ``jti`` values go to a ``ReplayCache`` partitioned into time buckets.
+  A ``jti`` only needs remembering while a proof carrying it would still be
+  fresh, so whole expired buckets are dropped at once instead of scanning
+  entries.
+
+``get_dpop_auth`` wraps ``authenticate_user`` into a dependency that also
+requires a valid proof bound to the verified token.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.dpop import get_dpop_auth
+
+    authenticate_user = get_auth(**OIDC_config)
+    authenticate_dpop = get_dpop_auth(authenticate_user)
+
+    @app.get("/orders")
+    def orders(token: IDToken = Depends(authenticate_dpop)):
+        ...
+"""
+
+import base64
+import hashlib
+import json
+import math
+import threading
+import time
+from collections.abc import Iterable
+from collections.abc import Mapping
+from typing import Any
+from typing import Callable
+from typing import Optional
+
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import Request
+from jose.exceptions import JWTError
+
+from fastapi_oidc.cache import StripedCache
+from fastapi_oidc.token import KeyIndex
+from fastapi_oidc.token import ParsedToken
+from fastapi_oidc.types import IDToken
+
+#: Proof signing algorithms accepted by default (asymmetric only).
+DEFAULT_ALGORITHMS = ("ES256", "ES384", "ES512", "RS256", "PS256")
+
+#: JWK members hashed into the thumbprint, per key type (RFC 7638, section 3.2).
+THUMBPRINT_MEMBERS = {
+    "RSA": ("e", "kty", "n"),
+    "EC": ("crv", "kty", "x", "y"),
+    "OKP": ("crv", "kty", "x"),
+}
+
+#: Longest accepted ``jti``; bounds the memory of each replay cache entry.
+MAX_JTI_LENGTH = 256
+
+
+class DPoPProofError(JWTError):
+    """Raised when a DPoP proof is invalid, replayed or not bound to the token."""
+
+
+def jwk_thumbprint(jwk: Mapping[str, Any]) -> str:
+    """Return the base64url SHA-256 JWK thumbprint (RFC 7638) of a public key.
+
+    Raises:
+        DPoPProofError: If the key type is unsupported or members are missing.
+    """
+    members = THUMBPRINT_MEMBERS.get(jwk.get("kty"))  # type: ignore[arg-type]
+    if members is None or not all(isinstance(jwk.get(m), str) for m in members):
+        raise DPoPProofError("Invalid DPoP proof key")
+    canonical = json.dumps(
+        {m: jwk[m] for m in members}, separators=(",", ":"), sort_keys=True
+    )
+    digest = hashlib.sha256(canonical.encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def access_token_hash(access_token: str) -> str:
+    """Return the ``ath`` value of a proof presented with ``access_token``."""
+    digest = hashlib.sha256(access_token.encode("ascii")).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+class ReplayCache:
+    """Remembers proof identifiers for ``window`` seconds, in time buckets.
+
+    Keys are stored in the bucket of the current time. Each bucket spans
+    ``window / buckets`` seconds and is dropped as a whole once all of it is
+    older than ``window``, so expiry costs O(1) per bucket whatever the number
+    of keys. A key is thus remembered for at least ``window`` seconds and at
+    most one bucket longer.
+
+    Args:
+        window: Seconds a key must be remembered.
+        buckets: Number of buckets a window is split into.
+        max_entries: Most keys held at once. When full, :meth:`add` raises
+            instead of forgetting keys early, which would allow replays.
+        clock: Time source, replaceable in tests.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        *,
+        buckets: int = 4,
+        max_entries: int = 1_000_000,
+        clock: Callable[[], float] = time.time,
+    ):
+        if window <= 0 or buckets < 1:
+            raise ValueError("window must be positive and buckets at least 1")
+        self.window = window
+        self.max_entries = max_entries
+        self.clock = clock
+        self._width = window / buckets
+        self._buckets_per_window = buckets
+        # Bucket index -> keys, in increasing index order
+        self._buckets: dict[int, set[str]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: str) -> bool:
+        """Record ``key``; return False if it was already recorded.
+
+        Raises:
+            OverflowError: If ``max_entries`` keys are held.
+        """
+        with self._lock:
+            current = math.floor(self.clock() / self._width)
+            self._expire(current)
+            for keys in self._buckets.values():
+                if key in keys:
+                    return False
+            if self._size >= self.max_entries:
+                raise OverflowError("DPoP replay cache is full")
+            if self._buckets:
+                # A clock stepping back must not insert out of order
+                current = max(current, next(reversed(self._buckets)))
+            self._buckets.setdefault(current, set()).add(key)
+            self._size += 1
+            return True
+
+    def _expire(self, current: int) -> None:
+        oldest_kept = current - self._buckets_per_window
+        while self._buckets:
+            oldest = next(iter(self._buckets))
+            if oldest >= oldest_kept:
+                break
+            self._size -= len(self._buckets.pop(oldest))
+
+
+class DPoPVerifier:
+    """Verifies DPoP proofs, caching proof keys and rejecting replays.
+
+    Args:
+        algorithms: Accepted proof signing algorithms.
+        max_age: Seconds after its ``iat`` that a proof is accepted.
+        leeway: Seconds of clock skew tolerated, in both directions.
+        replay_cache: Cache of seen ``jti`` values. Defaults to a
+            ``ReplayCache`` covering ``max_age + 2 * leeway`` seconds; share
+            one between verifiers serving the same tokens.
+        key_cache_size: Number of proof keys whose thumbprint and
+            verification key are kept.
+    """
+
+    def __init__(
+        self,
+        *,
+        algorithms: Iterable[str] = DEFAULT_ALGORITHMS,
+        max_age: float = 60,
+        leeway: float = 5,
+        replay_cache: Optional[ReplayCache] = None,
+        key_cache_size: int = 1024,
+    ):
+        self.algorithms = frozenset(algorithms)
+        self.max_age = max_age
+        self.leeway = leeway
+        self.replay_cache = replay_cache or ReplayCache(max_age + 2 * leeway)
+        self._keys: StripedCache[tuple[str, ...], tuple[str, KeyIndex]] = StripedCache(
+            maxsize=key_cache_size
+        )
+
+    def verify(
+        self,
+        proof: str,
+        *,
+        method: str,
+        url: str,
+        access_token: Optional[str] = None,
+    ) -> str:
+        """Verify ``proof`` for a request and return its key's thumbprint.
+
+        Args:
+            proof: The ``DPoP`` header value.
+            method: The request method, e.g. ``"GET"``.
+            url: The request URL; query and fragment are ignored.
+            access_token: The token presented with the proof, checked against
+                the proof's ``ath`` claim.
+
+        Raises:
+            DPoPProofError: If the proof is invalid or replayed.
+        """
+        try:
+            token = ParsedToken(proof)
+        except JWTError as err:
+            raise DPoPProofError(f"Invalid DPoP proof: {err}")
+        header = token.header
+        if header.get("typ") != "dpop+jwt":
+            raise DPoPProofError("Invalid DPoP proof type")
+        jwk = header.get("jwk")
+        if not isinstance(jwk, Mapping) or "d" in jwk:
+            raise DPoPProofError("DPoP proof must carry a public jwk")
+
+        thumbprint, index = self._proof_key(jwk)
+        try:
+            index.verify(token, self.algorithms)
+            claims = token.claims
+        except JWTError as err:
+            raise DPoPProofError(f"Invalid DPoP proof: {err}")
+
+        if claims.get("htm") != method:
+            raise DPoPProofError("DPoP proof htm does not match the request")
+        htu = claims.get("htu")
+        if not isinstance(htu, str) or _normalize_url(htu) != _normalize_url(url):
+            raise DPoPProofError("DPoP proof htu does not match the request")
+        iat = claims.get("iat")
+        if not isinstance(iat, (int, float)) or isinstance(iat, bool):
+            raise DPoPProofError("DPoP proof is not fresh")
+        now = time.time()
+        if not now - self.max_age - self.leeway <= iat <= now + self.leeway:
+            raise DPoPProofError("DPoP proof is not fresh")
+        if access_token is not None and claims.get("ath") != access_token_hash(
+            access_token
+        ):
+            raise DPoPProofError("DPoP proof ath does not match the access token")
+
+        jti = claims.get("jti")
+        if not isinstance(jti, str) or not jti or len(jti) > MAX_JTI_LENGTH:
+            raise DPoPProofError("Invalid DPoP proof jti")
+        try:
+            fresh = self.replay_cache.add(f"{thumbprint}:{jti}")
+        except OverflowError as err:
+            raise DPoPProofError(str(err))
+        if not fresh:
+            raise DPoPProofError("DPoP proof replayed")
+        return thumbprint
+
+    def _proof_key(self, jwk: Mapping[str, Any]) -> tuple[str, KeyIndex]:
+        members = THUMBPRINT_MEMBERS.get(jwk.get("kty"))  # type: ignore[arg-type]
+        if members is None:
+            raise DPoPProofError("Invalid DPoP proof key")
+        cache_key = tuple(str(jwk.get(m)) for m in members)
+
+        def load() -> tuple[str, KeyIndex]:
+            public = {m: jwk[m] for m in members if m in jwk}
+            return jwk_thumbprint(public), KeyIndex([public])
+
+        return self._keys.get_or_load(cache_key, load)
+
+
+def _normalize_url(url: str) -> str:
+    base = url.split("#", 1)[0].split("?", 1)[0]
+    scheme, sep, rest = base.partition("://")
+    host, slash, path = rest.partition("/")
+    return f"{scheme.lower()}{sep}{host.lower()}{slash}{path}"
+
+
+def get_dpop_auth(
+    authenticate_user: Callable[..., IDToken],
+    *,
+    verifier: Optional[DPoPVerifier] = None,
+) -> Callable[..., IDToken]:
+    """Return a dependency requiring a DPoP proof bound to the verified token.
+
+    The token must be presented with the ``DPoP`` authorization scheme, carry
+    the thumbprint of the proof key in ``cnf.jkt``, and come with exactly one
+    valid ``DPoP`` header.
+
+    Args:
+        authenticate_user: The function returned by ``get_auth``.
+        verifier: Proof verifier; defaults to a ``DPoPVerifier()``.
+
+    Returns:
+        func: dpop_user(request, id_token) -> IDToken (or token_type)
+
+    Raises (from the dependency):
+        HTTPException(401): If the proof is missing or invalid, or the token is
+            not bound to its key.
+    """
+    dpop = verifier or DPoPVerifier()
+
+    def dpop_user(
+        request: Request, id_token: IDToken = Depends(authenticate_user)
+    ) -> IDToken:
+        scheme, _, access_token = request.headers.get("authorization", "").partition(
+            " "
+        )
+        proofs = request.headers.getlist("dpop")
+        if scheme.lower() != "dpop" or len(proofs) != 1:
+            raise _unauthorized("invalid_dpop_proof", "DPoP proof required")
+        try:
+            thumbprint = dpop.verify(
+                proofs[0],
+                method=request.method,
+                url=str(request.url),
+                access_token=access_token.strip(),
+            )
+        except DPoPProofError as err:
+            raise _unauthorized("invalid_dpop_proof", str(err))
+
+        cnf = getattr(id_token, "cnf", None)
+        if not isinstance(cnf, Mapping) or cnf.get("jkt") != thumbprint:
+            raise _unauthorized("invalid_token", "Token is not bound to the DPoP key")
+        return id_token
+
+    return dpop_user
+
+
+def _unauthorized(error: str, detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=401,
+        detail=f"Unauthorized: {detail}",
+        headers={"WWW-Authenticate": f'DPoP error="{error}"'},
+    )
@@ -0,0 +1,272 @@
+"""
+Asynchronous audit events for authentication outcomes.
+
+``AuthEventEmitter`` records one ``AuthEvent`` per ``authenticate_user`` call
+(subject, issuer, key id, outcome, reason and latency) without doing any I/O on
+the request path: events are sampled, put on a bounded queue without blocking
+and written by a background thread, which also reads the key id and a failed
+token's issuer from the token. When the queue is full events are dropped
+and counted in ``dropped``. Identical failures (same issuer, key id and reason)
+arriving within ``aggregation_window`` seconds are written as a single event
+with a ``count``, so a flood of bad tokens produces a handful of log lines.
+
+Memory is bounded by ``max_queue_size`` queued events (each holding its token
+until written), ``MAX_AGGREGATED`` pending aggregates and ``MAX_FIELD_LENGTH``
+characters per recorded string.
+
+By default events are logged as JSON to the ``fastapi_oidc.audit`` logger.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.events import AuthEventEmitter
+
+    events = AuthEventEmitter(success_sample_rate=0.01)
+    authenticate_user = get_auth(..., event_emitter=events)
+"""
+
+import atexit
+import dataclasses
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Optional
+
+from jose import jwt
+
+audit_logger = logging.getLogger("fastapi_oidc.audit")
+
+_STOP = object()
+
+#: Distinct failures aggregated per window; further ones are written singly.
+MAX_AGGREGATED = 1024
+
+#: Longest issuer, key id or reason recorded; they come from unverified tokens.
+MAX_FIELD_LENGTH = 200
+
+# Weak, so an emitter that is dropped is not kept alive until exit
+_emitters: "weakref.WeakSet[AuthEventEmitter]" = weakref.WeakSet()
+
+
+@dataclass(frozen=True)
+class AuthEvent:
+    """The outcome of one (or, when aggregated, several) authentication attempts.
+
+    Attributes:
+        outcome: ``"success"`` or ``"failure"``.
+        subject: The verified ``sub`` claim; ``None`` for failures.
+        issuer: The ``iss`` claim; unverified for failures.
+        kid: Key id from the token header, if present.
+        reason: Why the token was rejected; ``None`` for successes.
+        latency: Seconds spent in ``authenticate_user`` (the first attempt's
+            for aggregated failures).
+        timestamp: Unix time of the (first) attempt.
+        count: Number of identical attempts this event stands for.
+    """
+
+    outcome: str
+    subject: Optional[str]
+    issuer: Optional[str]
+    kid: Optional[str]
+    reason: Optional[str]
+    latency: float
+    timestamp: float
+    count: int = 1
+
+
+def log_event(event: AuthEvent) -> None:
+    """Default sink: log the event as a JSON object at INFO level."""
+    audit_logger.info(json.dumps(dataclasses.asdict(event)))
+
+
+class AuthEventEmitter:
+    """Samples auth events and writes them from a background thread.
+
+    Args:
+        sink: Called with each ``AuthEvent`` on the writer thread. Defaults to
+            :func:`log_event`. Exceptions it raises are logged and ignored.
+        max_queue_size: Events buffered before new ones are dropped.
+        success_sample_rate: Fraction of successful calls to record, 0 to 1.
+        failure_sample_rate: Fraction of failed calls to record, 0 to 1.
+        aggregation_window: Seconds during which identical failures are merged
+            into one event. 0 writes every failure separately.
+
+    Attributes:
+        dropped (int): Events discarded because the queue was full.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[AuthEvent], None] = log_event,
+        *,
+        max_queue_size: int = 10000,
+        success_sample_rate: float = 1.0,
+        failure_sample_rate: float = 1.0,
+        aggregation_window: float = 10.0,
+    ):
+        for name, rate in (
+            ("success_sample_rate", success_sample_rate),
+            ("failure_sample_rate", failure_sample_rate),
+        ):
+            if not 0.0 <= rate <= 1.0:
+                raise ValueError(f"{name} must be between 0 and 1, got {rate}")
+        self.sink = sink
+        self.success_sample_rate = success_sample_rate
+        self.failure_sample_rate = failure_sample_rate
+        self.aggregation_window = aggregation_window
+        self.dropped = 0
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max_queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid = 0
+        self._writer_lock = threading.Lock()
+        _emitters.add(self)
+
+    def record_success(self, id_token: str, claims: Any, latency: float) -> None:
+        """Record a verified token; ``claims`` is the returned token model."""
+        if self._sampled(self.success_sample_rate):
+            self._put(
+                AuthEvent(
+                    outcome="success",
+                    subject=getattr(claims, "sub", None),
+                    issuer=getattr(claims, "iss", None),
+                    kid=None,
+                    reason=None,
+                    latency=latency,
+                    timestamp=time.time(),
+                ),
+                id_token,
+            )
+
+    def record_failure(self, id_token: str, error: Exception, latency: float) -> None:
+        """Record a rejected token and the exception it was rejected with."""
+        if self._sampled(self.failure_sample_rate):
+            reason = str(getattr(error, "detail", None) or error)
+            self._put(
+                AuthEvent(
+                    outcome="failure",
+                    subject=None,
+                    issuer=None,
+                    kid=None,
+                    reason=reason[:MAX_FIELD_LENGTH],
+                    latency=latency,
+                    timestamp=time.time(),
+                ),
+                id_token,
+            )
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Write the queued and aggregated events and stop the writer thread."""
+        _emitters.discard(self)
+        writer = self._writer
+        if writer is None or not writer.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        writer.join(timeout)
+
+    @staticmethod
+    def _sampled(rate: float) -> bool:
+        return rate >= 1.0 or random.random() < rate  # nosec B311
+
+    def _put(self, event: AuthEvent, id_token: str) -> None:
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+        try:
+            # The token is parsed on the writer thread, off the request path
+            self._queue.put_nowait((event, id_token))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_writer(self) -> None:
+        # Also restarts the writer in processes forked after it was started
+        with self._writer_lock:
+            if self._writer_pid != os.getpid():
+                self._writer = threading.Thread(
+                    target=self._run, name="fastapi-oidc-events", daemon=True
+                )
+                self._writer.start()
+                self._writer_pid = os.getpid()
+
+    def _run(self) -> None:
+        pending: dict[tuple[Any, ...], AuthEvent] = {}
+        flush_at: Optional[float] = None
+        while True:
+            timeout = (
+                None if flush_at is None else max(0.0, flush_at - time.monotonic())
+            )
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                for event in pending.values():
+                    self._write(event)
+                return
+            if item is not None:
+                item = _token_fields(*item)
+                if item.outcome == "failure" and self.aggregation_window > 0:
+                    key = (item.issuer, item.kid, item.reason)
+                    previous = pending.get(key)
+                    if previous is None and len(pending) >= MAX_AGGREGATED:
+                        self._write(item)
+                    elif previous is None:
+                        pending[key] = item
+                        if flush_at is None:
+                            flush_at = time.monotonic() + self.aggregation_window
+                    else:
+                        pending[key] = dataclasses.replace(
+                            previous, count=previous.count + 1
+                        )
+                else:
+                    self._write(item)
+
+            if flush_at is not None and time.monotonic() >= flush_at:
+                for event in pending.values():
+                    self._write(event)
+                pending.clear()
+                flush_at = None
+
+    def _write(self, event: AuthEvent) -> None:
+        try:
+            self.sink(event)
+        except Exception:
+            audit_logger.exception("Auth event sink failed")
+
+
+def _token_fields(event: AuthEvent, id_token: str) -> AuthEvent:
+    """Add the key id, and for failures the issuer, read from ``id_token``."""
+    try:
+        kid = jwt.get_unverified_header(id_token).get("kid")
+    except Exception:  # Malformed tokens are a failure reason themselves
+        kid = None
+    issuer = event.issuer
+    if event.outcome == "failure":
+        try:
+            issuer = jwt.get_unverified_claims(id_token).get("iss")
+        except Exception:
+            issuer = None
+    return dataclasses.replace(
+        event,
+        issuer=issuer[:MAX_FIELD_LENGTH] if isinstance(issuer, str) else None,
+        kid=kid[:MAX_FIELD_LENGTH] if isinstance(kid, str) else None,
+    )
+
+
+@atexit.register
+def _close_emitters() -> None:
+    for emitter in list(_emitters):
+        emitter.close()
@@ -1,3 +1,6 @@
+import requests
+
+
 class TokenSpecificationError(Exception):
     """Raised when an invalid token type is provided to get_auth().
 
@@ -6,3 +9,28 @@ class TokenSpecificationError(Exception):
     """
 
     pass
+
+
+class IdentityProviderUnavailableError(requests.RequestException):
+    """Raised instead of contacting an authorization server that keeps failing.
+
+    Subclasses ``requests.RequestException`` so code that already handles
+    network errors from discovery keeps working.
+
+    Attributes:
+        retry_after (float): Seconds until the server will be contacted again.
+    """
+
+    def __init__(self, message: str, *, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DocumentTooLargeError(requests.RequestException):
+    """Raised when an authorization server returns a document over the size limit.
+
+    Subclasses ``requests.RequestException`` so an oversized response is
+    handled like any other failed fetch.
+    """
+
+    pass
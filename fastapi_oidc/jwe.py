@@ -0,0 +1,243 @@
+"""
+Decryption of encrypted (nested JWE) ID tokens.
+
+Providers configured to encrypt ID tokens sign them first and then encrypt the
+signed JWT to a key of the relying party (OpenID Connect Core, section 10.2).
+``JWEDecrypter`` recovers the inner JWS, which ``authenticate_user`` then
+verifies like any other token.
+
+Decryption keys are parsed once, when the decrypter is created or first used
+with an algorithm, rather than for every token. Unwrapping the content
+encryption key is the expensive step with RSA keys and clients send the same
+token with every request, so unwrapped keys are remembered in a bounded cache
+keyed by a digest of the encrypted key. Only keys whose content then
+decrypted and authenticated successfully are cached, so the cache cannot be
+filled with, or used to probe, forged tokens.
+
+Compressed (``zip``) JWEs are not supported.
+"""
+
+import asyncio
+import base64
+import binascii
+import functools
+import hashlib
+import hmac
+import json
+import os
+import struct
+from collections.abc import Sequence
+from concurrent.futures import Executor
+from typing import Any
+from typing import Optional
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher
+from cryptography.hazmat.primitives.ciphers import algorithms
+from cryptography.hazmat.primitives.ciphers import modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from jose.exceptions import JWTError
+
+from fastapi_oidc.cache import StripedCache
+from fastapi_oidc.token import KeyIndex
+
+#: Key management algorithms accepted by default.
+DEFAULT_KEY_ALGORITHMS = (
+    "RSA-OAEP",
+    "RSA-OAEP-256",
+    "A128KW",
+    "A192KW",
+    "A256KW",
+    "dir",
+)
+
+#: Content encryption algorithms and their content encryption key lengths.
+CONTENT_ALGORITHMS = {
+    "A128GCM": 16,
+    "A192GCM": 24,
+    "A256GCM": 32,
+    "A128CBC-HS256": 32,
+    "A192CBC-HS384": 48,
+    "A256CBC-HS512": 64,
+}
+
+#: Largest accepted JWE, as in jose (CVE-2024-33664).
+MAX_TOKEN_SIZE = 250 * 1024
+
+
+class JWEDecryptionError(JWTError):
+    """Raised when an encrypted token cannot be decrypted."""
+
+
+def is_encrypted(token: str) -> bool:
+    """Return whether ``token`` is a compact JWE (five segments) rather than a JWS."""
+    return token.count(".") == 4
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+class JWEDecrypter:
+    """Decrypts nested JWE ID tokens with keys parsed once.
+
+    Args:
+        keys: The relying party's decryption keys: private JWKs (dicts, with an
+            optional ``kid``), PEM encoded RSA private keys, or ``bytes`` for
+            symmetric key wrapping and direct encryption.
+        algorithms: Accepted key management (``alg``) algorithms.
+        unwrap_cache_size: Number of unwrapped content encryption keys to
+            remember. 0 disables the cache.
+
+    Example:
+        >>> decrypter = JWEDecrypter([open("rp-private-key.pem").read()])
+        >>> signed_token = decrypter.decrypt(encrypted_token)
+    """
+
+    def __init__(
+        self,
+        keys: Sequence[Any],
+        *,
+        algorithms: Sequence[str] = DEFAULT_KEY_ALGORITHMS,
+        unwrap_cache_size: int = 1024,
+    ):
+        if not keys:
+            raise ValueError("JWEDecrypter needs at least one key")
+        self.algorithms = tuple(algorithms)
+        self._keys = list(keys)
+        self._index = KeyIndex(self._keys)
+        self._unwrap_cache_size = unwrap_cache_size
+        self._unwrapped: Optional[StripedCache[bytes, bytes]] = (
+            StripedCache(maxsize=unwrap_cache_size) if unwrap_cache_size > 0 else None
+        )
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Rebuilt from the keys: the parsed keys and the locks of the unwrap
+        # cache cannot be pickled, e.g. for a worker process
+        rebuild = functools.partial(
+            type(self),
+            algorithms=self.algorithms,
+            unwrap_cache_size=self._unwrap_cache_size,
+        )
+        return (rebuild, (self._keys,))
+
+    def decrypt(self, token: str) -> str:
+        """Decrypt a compact JWE and return its plaintext, the inner signed JWT.
+
+        Raises:
+            JWEDecryptionError: If the token is malformed, uses an algorithm that
+                is not accepted, or no key decrypts it.
+        """
+        if len(token) > MAX_TOKEN_SIZE:
+            raise JWEDecryptionError(f"JWE exceeds {MAX_TOKEN_SIZE} bytes")
+        segments = token.split(".")
+        if len(segments) != 5:
+            raise JWEDecryptionError("Not enough segments")
+        try:
+            header = json.loads(_b64decode(segments[0]))
+            encrypted_key, iv, ciphertext, tag = map(_b64decode, segments[1:])
+        except (binascii.Error, ValueError):
+            raise JWEDecryptionError("Invalid JWE encoding")
+        if not isinstance(header, dict):
+            raise JWEDecryptionError("Invalid JWE header")
+
+        alg, enc = header.get("alg"), header.get("enc")
+        if alg not in self.algorithms:
+            raise JWEDecryptionError(f"Key management algorithm {alg} not allowed")
+        if enc not in CONTENT_ALGORITHMS:
+            raise JWEDecryptionError(f"Content encryption {enc} not supported")
+        if "zip" in header:
+            raise JWEDecryptionError("Compressed JWE is not supported")
+
+        aad = segments[0].encode("ascii")
+        for position in self._index.candidates(header.get("kid")):
+            cache_key = hashlib.sha256(
+                b"%d:%s:%s" % (position, alg.encode(), encrypted_key)
+            ).digest()
+            cek = self._cached_cek(cache_key)
+            from_cache = cek is not None
+            if cek is None:
+                cek = self._unwrap(position, alg, enc, encrypted_key)
+            plaintext = _decrypt_content(enc, cek, iv, ciphertext, tag, aad)
+            if plaintext is not None:
+                if not from_cache and self._unwrapped is not None:
+                    self._unwrapped.set(cache_key, cek)
+                try:
+                    return plaintext.decode("utf-8")
+                except UnicodeDecodeError:
+                    raise JWEDecryptionError("JWE plaintext is not a JWT")
+        raise JWEDecryptionError("Decryption failed.")
+
+    async def decrypt_async(
+        self, token: str, executor: Optional[Executor] = None
+    ) -> str:
+        """Like :meth:`decrypt`, run in ``executor`` (default: the loop's).
+
+        For async dependencies and middleware, which would otherwise block the
+        event loop for the duration of an RSA unwrap.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.decrypt, token)
+
+    def _cached_cek(self, cache_key: bytes) -> Optional[bytes]:
+        if self._unwrapped is None:
+            return None
+        return self._unwrapped.get(cache_key)
+
+    def _unwrap(self, position: int, alg: str, enc: str, encrypted_key: bytes) -> bytes:
+        """Return the content encryption key, or a random one if unwrapping fails.
+
+        As RFC 7516 (section 11.5) recommends, an undecryptable encrypted key
+        is not reported differently from a failed content decryption.
+        """
+        length = CONTENT_ALGORITHMS[enc]
+        if alg == "dir":
+            cek = _symmetric_key_bytes(self._keys[position])
+            return cek if not encrypted_key else os.urandom(length)
+        key = self._index.key(position, alg)
+        try:
+            cek = key.unwrap_key(encrypted_key) if key is not None else b""
+        except Exception:
+            cek = b""
+        return cek if len(cek) == length else os.urandom(length)
+
+
+def _symmetric_key_bytes(key: Any) -> bytes:
+    if isinstance(key, dict) and key.get("kty") == "oct":
+        return _b64decode(key.get("k", ""))
+    if isinstance(key, bytes):
+        return key
+    if isinstance(key, str):
+        return key.encode("utf-8")
+    return b""
+
+
+def _decrypt_content(
+    enc: str, cek: bytes, iv: bytes, ciphertext: bytes, tag: bytes, aad: bytes
+) -> Optional[bytes]:
+    """Decrypt and authenticate the content, returning None if it fails."""
+    if len(cek) != CONTENT_ALGORITHMS[enc]:
+        return None
+    if enc.endswith("GCM"):
+        try:
+            return AESGCM(cek).decrypt(iv, ciphertext + tag, aad)
+        except (InvalidTag, ValueError):
+            return None
+
+    # AES_CBC_HMAC_SHA2, RFC 7518 section 5.2
+    half = len(cek) // 2
+    mac_key, encryption_key = cek[:half], cek[half:]
+    digest = {16: hashlib.sha256, 24: hashlib.sha384, 32: hashlib.sha512}[half]
+    mac = hmac.new(
+        mac_key, aad + iv + ciphertext + struct.pack(">Q", len(aad) * 8), digest
+    ).digest()
+    if not hmac.compare_digest(mac[:half], tag):
+        return None
+    try:
+        decryptor = Cipher(algorithms.AES(encryption_key), modes.CBC(iv)).decryptor()
+        padded = decryptor.update(ciphertext) + decryptor.finalize()
+        unpadder = padding.PKCS7(128).unpadder()
+        return unpadder.update(padded) + unpadder.finalize()
+    except ValueError:
+        return None
@@ -0,0 +1,345 @@
+"""
+OpenID Connect Back-Channel Logout 1.0 receiver.
+
+When a user logs out at the provider, ID tokens issued before that keep
+verifying until they expire. With back-channel logout the provider instead
+POSTs a signed logout token naming the session (``sid``) and/or user (``sub``)
+to the relying party, which then refuses their tokens.
+
+``get_logout_router`` returns a router with that endpoint. It verifies logout
+tokens with the provider's discovered keys, as ``get_auth`` does, and records
+the logout in a ``RevocationIndex``. Passing the same index to
+``get_auth(revocation_index=...)`` makes ``authenticate_user`` reject tokens
+of logged out sessions and users that were issued before the logout: two dict
+lookups per request, no call to the provider. Entries expire once every token
+they could match has expired anyway, and listeners registered on the index
+(e.g. by ``get_userinfo``) evict whatever they cached for the session or user.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.logout import RevocationIndex
+    from fastapi_oidc.logout import get_logout_router
+
+    revocations = RevocationIndex(ttl=3600)
+    authenticate_user = get_auth(**OIDC_config, revocation_index=revocations)
+    app.include_router(
+        get_logout_router(
+            client_id=OIDC_config["client_id"],
+            base_authorization_server_uri=OIDC_config["base_authorization_server_uri"],
+            issuer=OIDC_config["issuer"],
+            revocation_index=revocations,
+        )
+    )
+"""
+
+import heapq
+import threading
+import time
+import weakref
+from collections.abc import Iterable
+from collections.abc import Mapping
+from collections.abc import Sequence
+from typing import Any
+from typing import Callable
+from typing import Optional
+from urllib.parse import parse_qs
+
+import requests
+from fastapi import APIRouter
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from jose.exceptions import JWTClaimsError
+from jose.exceptions import JWTError
+from starlette.responses import JSONResponse
+from starlette.responses import Response
+
+from fastapi_oidc import discovery
+from fastapi_oidc.registry import ProviderRegistry
+from fastapi_oidc.verifier import KeyPlan
+from fastapi_oidc.verifier import Verifier
+
+#: Member of the ``events`` claim identifying a logout token.
+BACKCHANNEL_LOGOUT_EVENT = "http://schemas.openid.net/event/backchannel-logout"
+
+#: Largest logout request body accepted, in bytes.
+MAX_LOGOUT_REQUEST_SIZE = 16 * 1024
+
+#: Called with ``(issuer, sid, sub)`` for every recorded logout.
+RevocationListener = Callable[[str, Optional[str], Optional[str]], None]
+
+
+class RevocationIndex:
+    """Logged out sessions and users, looked up per token in O(1).
+
+    A logout revokes the tokens of a session (``sid``) or of all sessions of a
+    user (``sub``) issued at or before the logout. It is remembered for ``ttl``
+    seconds, which should be at least the lifetime of the provider's ID
+    tokens: after that, every token it could match has expired. Expired entries are dropped in
+    expiry order when logouts are recorded, so lookups never scan.
+
+    Args:
+        ttl: Seconds a logout is remembered.
+        max_entries: Most logouts held. When full, those closest to expiry are
+            dropped first.
+        clock: Time source, replaceable in tests.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        *,
+        max_entries: int = 100_000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        # (issuer, "sid" or "sub", value) -> (revoked_at, expires)
+        self._revoked: dict[tuple[str, str, str], tuple[float, float]] = {}
+        self._expiry: list[tuple[float, tuple[str, str, str]]] = []
+        self._listeners: list[RevocationListener] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add_listener(self, listener: RevocationListener) -> None:
+        """Call ``listener(issuer, sid, sub)`` for every logout recorded after now."""
+        self._listeners.append(listener)
+
+    def revoke(
+        self,
+        issuer: str,
+        *,
+        sid: Optional[str] = None,
+        sub: Optional[str] = None,
+        revoked_at: Optional[float] = None,
+    ) -> None:
+        """Record a logout at ``issuer``.
+
+        With ``sid`` only that session is logged out, even if ``sub`` is given
+        too; with ``sub`` alone, all of the user's sessions are.
+
+        Args:
+            revoked_at: Time of the logout; tokens issued later are not
+                revoked. Defaults to now.
+        """
+        if sid is not None:
+            key = (issuer, "sid", sid)
+        elif sub is not None:
+            key = (issuer, "sub", sub)
+        else:
+            raise ValueError("sid or sub is required")
+        now = self.clock()
+        revoked_at = now if revoked_at is None else revoked_at
+        expires = now + self.ttl
+        with self._lock:
+            self._expire(now)
+            previous = self._revoked.get(key)
+            if previous is not None:
+                revoked_at = max(revoked_at, previous[0])
+            self._revoked[key] = (revoked_at, expires)
+            heapq.heappush(self._expiry, (expires, key))
+            while len(self._revoked) > self.max_entries:
+                self._pop_next()
+        for listener in self._listeners:
+            listener(issuer, sid, sub)
+
+    def is_revoked(self, claims: Mapping[str, Any]) -> bool:
+        """Return whether a token with ``claims`` was issued before a logout."""
+        issuer = claims.get("iss")
+        issued_at = claims.get("iat")
+        if not isinstance(issued_at, (int, float)):
+            issued_at = 0
+        now = self.clock()
+        for name in ("sid", "sub"):
+            value = claims.get(name)
+            if not isinstance(value, str):
+                continue
+            entry = self._revoked.get((issuer, name, value))  # type: ignore[arg-type]
+            if entry is not None and issued_at <= entry[0] and now < entry[1]:
+                return True
+        return False
+
+    def _expire(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            self._pop_next()
+
+    def _pop_next(self) -> None:
+        expires, key = heapq.heappop(self._expiry)
+        entry = self._revoked.get(key)
+        # Skip heap entries superseded by a later logout of the same key
+        if entry is not None and entry[1] == expires:
+            del self._revoked[key]
+
+
+class LogoutTokenVerifier:
+    """Verifies logout tokens against the provider's discovered keys.
+
+    Args:
+        client_id: The audience logout tokens are issued to.
+        base_authorization_server_uri: As for ``get_auth``.
+        issuer: Accepted issuer(s) of logout tokens.
+        signature_cache_ttl: How many seconds to cache the discovery document
+            and keys.
+        stale_if_error: As for ``get_auth``.
+        algorithms: Accepted signing algorithms. Defaults to those listed in
+            the discovery document.
+        leeway: Seconds of clock skew tolerated.
+        provider_registry: Share the discovery caches and built keys with the
+            ``get_auth`` instances given the same registry, provider and
+            discovery settings.
+        x5c_trust_anchors: As for ``get_auth``.
+    """
+
+    def __init__(
+        self,
+        *,
+        client_id: str,
+        base_authorization_server_uri: str,
+        issuer: str | Iterable[str],
+        signature_cache_ttl: int = 3600,
+        stale_if_error: int = 0,
+        algorithms: Optional[Iterable[str]] = None,
+        leeway: int = 0,
+        provider_registry: Optional[ProviderRegistry] = None,
+        x5c_trust_anchors: Sequence[str | bytes] = (),
+    ):
+        self.base_authorization_server_uri = base_authorization_server_uri
+        # The same settings get_auth passes, so registry lookups can match it
+        discovery_options: dict[str, Any] = dict(
+            cache_ttl=signature_cache_ttl,
+            stale_if_error=stale_if_error,
+            discovery_mirrors=(),
+            jwks_mirrors=(),
+            hedge_delay=None,
+            shared_cache_path=None,
+            trust_anchors=tuple(x5c_trust_anchors),
+        )
+        key_plan: Optional[KeyPlan] = None
+        if provider_registry is not None:
+            provider = provider_registry.acquire(
+                base_authorization_server_uri, **discovery_options
+            )
+            self.discover, key_plan = provider.discover, provider.key_plan
+            weakref.finalize(self, provider_registry.release, provider)
+        else:
+            self.discover = discovery.configure(**discovery_options)
+        self.verifier = Verifier.create(
+            issuer=issuer,
+            audience=client_id,
+            algorithms=algorithms,
+            leeway=leeway,
+            key_plan=key_plan,
+        )
+
+    def verify(self, logout_token: str) -> dict[str, Any]:
+        """Verify a logout token and return its claims.
+
+        Raises:
+            JWTError: If the token is invalid or not a logout token.
+            requests.RequestException: If the provider's keys cannot be fetched.
+        """
+        token = self.verifier.parse(logout_token)
+        if token.header.get("typ", "logout+jwt").lower() not in ("logout+jwt", "jwt"):
+            raise JWTError("Invalid logout token type")
+        document = self.discover.auth_server(
+            base_url=self.base_authorization_server_uri
+        )
+        keys = self.discover.public_keys(document)
+        claims = self.verifier.verify(token, keys, document)
+        validate_logout_claims(claims)
+        return claims
+
+
+def validate_logout_claims(claims: Mapping[str, Any]) -> None:
+    """Check the claims a logout token must and must not have (section 2.4).
+
+    Raises:
+        JWTClaimsError: If a claim is missing or not allowed.
+    """
+    for name in ("aud", "iat", "exp", "jti"):
+        if name not in claims:
+            raise JWTClaimsError(f"Missing required claim: {name}")
+    events = claims.get("events")
+    if not isinstance(events, Mapping) or not isinstance(
+        events.get(BACKCHANNEL_LOGOUT_EVENT), Mapping
+    ):
+        raise JWTClaimsError("Invalid events claim")
+    if not any(isinstance(claims.get(name), str) for name in ("sid", "sub")):
+        raise JWTClaimsError("Missing required claim: sid or sub")
+    if "nonce" in claims:
+        raise JWTClaimsError("Logout token must not contain nonce")
+
+
+def get_logout_router(
+    *,
+    revocation_index: RevocationIndex,
+    path: str = "/backchannel-logout",
+    verifier: Optional[LogoutTokenVerifier] = None,
+    **verifier_options: Any,
+) -> APIRouter:
+    """Return a router receiving back-channel logout requests at ``path``.
+
+    Register the endpoint's URL as the client's ``backchannel_logout_uri`` at
+    the provider.
+
+    Args:
+        revocation_index: Where logouts are recorded; pass the same index to
+            ``get_auth``.
+        path: Path of the endpoint.
+        verifier: Logout token verifier. Defaults to one built from
+            ``verifier_options``.
+        **verifier_options: Arguments for ``LogoutTokenVerifier``
+            (``client_id``, ``base_authorization_server_uri``, ``issuer``, ...).
+
+    Returns:
+        A router answering 200 to valid logout tokens, 400 to invalid ones and
+        503 when the provider's keys cannot be fetched.
+    """
+    logout = verifier or LogoutTokenVerifier(**verifier_options)
+    router = APIRouter()
+
+    @router.post(path, include_in_schema=False)
+    async def backchannel_logout(request: Request) -> Response:
+        body = await request.body()
+        if len(body) > MAX_LOGOUT_REQUEST_SIZE:
+            return _logout_error("Request too large")
+        try:
+            tokens = parse_qs(body.decode("ascii")).get("logout_token", [])
+        except UnicodeDecodeError:
+            tokens = []
+        if len(tokens) != 1:
+            return _logout_error("Exactly one logout_token is required")
+        try:
+            claims = await run_in_threadpool(logout.verify, tokens[0])
+        except requests.RequestException:
+            return JSONResponse(
+                {"error": "temporarily_unavailable"},
+                status_code=503,
+                headers={"Cache-Control": "no-store"},
+            )
+        except JWTError as err:
+            return _logout_error(str(err))
+        sid, sub = claims.get("sid"), claims.get("sub")
+        revocation_index.revoke(
+            claims["iss"],
+            sid=sid if isinstance(sid, str) else None,
+            sub=sub if isinstance(sub, str) else None,
+            revoked_at=int(claims["iat"]),
+        )
+        return Response(status_code=200, headers={"Cache-Control": "no-store"})
+
+    return router
+
+
+def _logout_error(description: str) -> JSONResponse:
+    return JSONResponse(
+        {"error": "invalid_request", "error_description": description},
+        status_code=400,
+        headers={"Cache-Control": "no-store"},
+    )
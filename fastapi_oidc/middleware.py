@@ -0,0 +1,194 @@
+"""
+ASGI middleware that authenticates every request before it reaches FastAPI.
+
+For APIs where nearly every route is protected, running ``authenticate_user``
+through the ``Depends`` machinery on each route is mostly boilerplate. The
+middleware verifies the ``Authorization`` header once per request with the same
+``authenticate_user`` function returned by ``get_auth`` and stores the resulting
+token on the request scope. Routes that need the claims read them back with the
+``get_id_token`` dependency, which is a plain dictionary lookup.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi import Depends, FastAPI
+
+    from fastapi_oidc import IDToken, get_auth
+    from fastapi_oidc.middleware import OIDCAuthMiddleware, get_id_token
+
+    authenticate_user = get_auth(**OIDC_config)
+
+    app = FastAPI()
+    app.add_middleware(
+        OIDCAuthMiddleware,
+        authenticate_user=authenticate_user,
+        exclude_paths=["/health", "/docs", "/openapi.json"],
+    )
+
+    @app.get("/me")
+    def me(id_token: IDToken = Depends(get_id_token)):
+        return {"sub": id_token.sub}
+"""
+
+from collections.abc import Iterable
+from typing import Any
+from typing import Callable
+
+from fastapi import HTTPException
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from fastapi_oidc.types import IDToken
+
+#: Key under ``scope["state"]`` (i.e. ``request.state``) holding the verified token.
+STATE_KEY = "oidc_id_token"
+
+_END = object()
+
+
+class PathPrefixTrie:
+    """Precompiled set of path prefixes matched segment by segment.
+
+    A prefix matches a path when every ``/``-separated segment of the prefix
+    equals the corresponding leading segment of the path, so ``/health`` matches
+    ``/health`` and ``/health/live`` but not ``/healthz``. Lookups cost one dict
+    access per path segment regardless of how many prefixes are configured.
+
+    Args:
+        prefixes: Path prefixes to match, e.g. ``["/health", "/docs"]``. The
+            prefix ``/`` matches every path.
+
+    Example:
+        >>> public = PathPrefixTrie(["/health", "/static/img"])
+        >>> public.matches("/static/img/logo.png")
+        True
+        >>> public.matches("/static/css/site.css")
+        False
+    """
+
+    __slots__ = ("_root",)
+
+    def __init__(self, prefixes: Iterable[str]):
+        self._root: dict[Any, Any] = {}
+        for prefix in prefixes:
+            node = self._root
+            for segment in prefix.split("/"):
+                if segment:
+                    node = node.setdefault(segment, {})
+            node[_END] = True
+
+    def matches(self, path: str) -> bool:
+        """Return True if ``path`` starts with any of the configured prefixes."""
+        node = self._root
+        if _END in node:
+            return True
+        for segment in path.split("/"):
+            if not segment:
+                continue
+            child = node.get(segment)
+            if child is None:
+                return False
+            if _END in child:
+                return True
+            node = child
+        return False
+
+
+class OIDCAuthMiddleware:
+    """Verify the bearer token of every HTTP request outside the excluded paths.
+
+    Requests without an ``Authorization`` header, or whose token fails
+    verification, are answered with the same 401 response the ``Depends`` flow
+    produces and never reach the application. Verified tokens are stored in
+    ``request.state`` under :data:`STATE_KEY`; use :func:`get_id_token` to read
+    them in route handlers.
+
+    ``authenticate_user`` is synchronous and may block on a discovery or JWKS
+    fetch when its caches are cold, so it is run in the threadpool exactly like
+    FastAPI runs sync dependencies.
+
+    Args:
+        app: The wrapped ASGI application.
+        authenticate_user: The function returned by ``fastapi_oidc.get_auth``.
+        exclude_paths: Path prefixes that are served without authentication.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        authenticate_user: Callable[..., IDToken],
+        exclude_paths: Iterable[str] = (),
+    ):
+        self.app = app
+        self.authenticate_user = authenticate_user
+        self.public_paths = PathPrefixTrie(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.public_paths.matches(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        auth_header = _get_authorization_header(scope)
+        if not auth_header:
+            err = HTTPException(
+                status_code=401,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+            await _error_response(err)(scope, receive, send)
+            return
+
+        try:
+            id_token = await run_in_threadpool(
+                self.authenticate_user, auth_header=auth_header
+            )
+        except HTTPException as err:
+            await _error_response(err)(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})[STATE_KEY] = id_token
+        await self.app(scope, receive, send)
+
+
+def get_id_token(request: Request) -> IDToken:
+    """FastAPI dependency returning the token verified by ``OIDCAuthMiddleware``.
+
+    Args:
+        request (Request): The current request, injected by FastAPI.
+
+    Return:
+        IDToken (types.IDToken): The token instance produced by ``authenticate_user``.
+
+    raises:
+        HTTPException(status_code=401): If the middleware did not authenticate
+            this request, e.g. because the route is under an excluded path.
+    """
+    id_token = request.scope.get("state", {}).get(STATE_KEY)
+    if id_token is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return id_token
+
+
+def _get_authorization_header(scope: Scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            return value.decode("latin-1")
+    return None
+
+
+def _error_response(err: HTTPException) -> JSONResponse:
+    return JSONResponse(
+        {"detail": err.detail}, status_code=err.status_code, headers=err.headers
+    )
@@ -0,0 +1,180 @@
+"""
+Hedged fetching across equivalent discovery or JWKS endpoints.
+
+Some identity providers publish the same document on several regional hosts or
+behind a CDN. ``MirrorSet`` tries those URLs fastest first, based on an
+exponentially weighted moving average of observed latencies. If the first
+request has not answered after ``hedge_delay`` seconds a second mirror is asked
+as well and whichever valid response arrives first wins. Failed or invalid
+responses fail over to the next mirror immediately.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import Sequence
+
+from fastapi_oidc.circuit import FETCH_ERRORS
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=8, thread_name_prefix="fastapi-oidc-fetch"
+            )
+    return _executor
+
+
+class InconsistentResponseError(ValueError):
+    """Raised when a mirror returns a document that fails validation."""
+
+
+class MirrorSet:
+    """Equivalent URLs fetched with failover, hedging and latency tracking.
+
+    Args:
+        urls: Mirrors in order of preference. The order is used until latencies
+            have been observed.
+        hedge_delay: Seconds to wait for a response before also asking the next
+            mirror. ``None`` disables hedging; mirrors are then only tried after
+            the previous one failed.
+        smoothing: Weight of the newest sample in the latency moving average.
+
+    Attributes:
+        latencies (dict[str, float]): Smoothed latency in seconds per URL. Failed
+            requests count as their full duration.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        *,
+        hedge_delay: Optional[float] = None,
+        smoothing: float = 0.3,
+    ):
+        if not urls:
+            raise ValueError("MirrorSet needs at least one URL")
+        self.urls = list(dict.fromkeys(urls))
+        self.hedge_delay = hedge_delay
+        self.smoothing = smoothing
+        self.latencies: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def ranked(self) -> list[str]:
+        """Return the mirrors fastest first; unmeasured mirrors keep their order."""
+        with self._lock:
+            latencies = dict(self.latencies)
+        return sorted(
+            self.urls,
+            key=lambda url: (latencies.get(url, math.inf), self.urls.index(url)),
+        )
+
+    def fetch(
+        self,
+        fetch: Callable[[str], Any],
+        validate: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        """Fetch from the mirrors and return the first valid response.
+
+        Args:
+            fetch: Fetches and decodes one URL, raising on failure.
+            validate: Raises ``InconsistentResponseError`` (or another
+                ``ValueError``) for responses that must not be used.
+
+        Raises:
+            The error of the last mirror tried if none returned a valid response.
+        """
+        remaining = iter(self.ranked())
+        pending: dict[Future, str] = {}
+        last_error: Optional[BaseException] = None
+
+        def submit_next() -> bool:
+            url = next(remaining, None)
+            if url is None:
+                return False
+            pending[_get_executor().submit(self._timed, fetch, url)] = url
+            return True
+
+        submit_next()
+        while pending:
+            done, _ = wait(
+                pending, timeout=self.hedge_delay, return_when=FIRST_COMPLETED
+            )
+            if not done:
+                # Hedge: the current requests are slow, ask another mirror too
+                submit_next()
+                continue
+            for future in done:
+                pending.pop(future)
+                try:
+                    value = future.result()
+                    if validate is not None:
+                        validate(value)
+                    return value
+                except FETCH_ERRORS as err:
+                    last_error = err
+                    submit_next()
+
+        assert last_error is not None  # nosec B101
+        raise last_error
+
+    def _timed(self, fetch: Callable[[str], Any], url: str) -> Any:
+        started = time.monotonic()
+        try:
+            return fetch(url)
+        finally:
+            self._record(url, time.monotonic() - started)
+
+    def _record(self, url: str, seconds: float) -> None:
+        with self._lock:
+            previous = self.latencies.get(url)
+            self.latencies[url] = (
+                seconds
+                if previous is None
+                else previous + self.smoothing * (seconds - previous)
+            )
+
+
+def validate_discovery_document(
+    expected_issuer: Optional[str],
+) -> Callable[[Any], None]:
+    """Return a validator for discovery documents served by mirrors.
+
+    Args:
+        expected_issuer: The ``issuer`` every mirror must report, typically the
+            one from the last accepted document. ``None`` accepts any issuer.
+    """
+
+    def validate(document: Any) -> None:
+        if not isinstance(document, dict) or not isinstance(
+            document.get("jwks_uri"), str
+        ):
+            raise InconsistentResponseError("Discovery document has no jwks_uri")
+        if expected_issuer is not None and document.get("issuer") != expected_issuer:
+            raise InconsistentResponseError(
+                f"Mirror reported issuer {document.get('issuer')!r}, "
+                f"expected {expected_issuer!r}"
+            )
+
+    return validate
+
+
+def validate_jwks(jwks: Any) -> None:
+    """Reject JWKS responses that would leave no usable verification keys."""
+    keys = jwks.get("keys") if isinstance(jwks, dict) else None
+    if not isinstance(keys, list) or not keys:
+        raise InconsistentResponseError("JWKS response contains no keys")
+    if not all(isinstance(key, dict) and "kty" in key for key in keys):
+        raise InconsistentResponseError("JWKS response contains malformed keys")
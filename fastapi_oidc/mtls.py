@@ -0,0 +1,207 @@
+"""
+Checking certificate-bound tokens for mutual TLS clients (RFC 8705).
+
+A certificate-bound token carries the SHA-256 thumbprint of its client's
+certificate in ``cnf["x5t#S256"]``, and is only accepted from a client that
+presented that certificate in the TLS handshake. Where TLS terminates at a
+proxy, the proxy forwards the client certificate in a header; servers talking
+TLS themselves can expose it through the ASGI TLS extension. Only the TLS
+extension is read unless a header is named.
+
+``CertificateBinding`` reads the certificate from either, and keeps the
+thumbprints of recently seen certificates in a bounded cache: a client reuses
+its certificate for every request, so the binding check costs a cache lookup
+and a constant-time comparison instead of a decode and a hash per request.
+
+``get_mtls_auth`` wraps ``authenticate_user`` into a dependency that also
+requires the binding.
+
+Only name a header behind a proxy that sets it and strips it from
+incoming requests; a client that can set it can claim any certificate.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.mtls import CertificateBinding
+    from fastapi_oidc.mtls import get_mtls_auth
+
+    authenticate_user = get_auth(**OIDC_config)
+    authenticate_client = get_mtls_auth(
+        authenticate_user, binding=CertificateBinding(header="X-SSL-Client-Cert")
+    )
+
+    @app.get("/internal")
+    def internal(token: IDToken = Depends(authenticate_client)):
+        ...
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import re
+from collections.abc import Mapping
+from typing import Callable
+from typing import Optional
+from urllib.parse import unquote
+
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import Request
+
+from fastapi_oidc.cache import StripedCache
+from fastapi_oidc.types import IDToken
+
+#: Name of the confirmation claim member holding the certificate thumbprint.
+THUMBPRINT_CLAIM = "x5t#S256"
+
+#: Longest accepted certificate header; bounds the memory of each cache entry.
+MAX_CERTIFICATE_SIZE = 16 * 1024
+
+_PEM_CERTIFICATE = re.compile(
+    r"-----BEGIN CERTIFICATE-----(.+?)-----END CERTIFICATE-----", re.DOTALL
+)
+
+
+class CertificateBindingError(Exception):
+    """Raised when no valid client certificate matches the token's binding."""
+
+
+def certificate_thumbprint(certificate: str) -> str:
+    """Return the base64url SHA-256 thumbprint of a client certificate.
+
+    Accepts the encodings proxies forward certificates in: PEM (also
+    URL-encoded, as nginx's ``$ssl_client_escaped_cert``), an RFC 9440
+    ``Client-Cert`` byte sequence (``:base64:``), or base64 DER. For a chain,
+    the first (leaf) certificate is used.
+
+    Raises:
+        CertificateBindingError: If the value is not a certificate.
+    """
+    value = certificate.strip()
+    if value.startswith(":") and value.endswith(":"):
+        value = value[1:-1]
+    elif "%" in value:
+        value = unquote(value)
+    match = _PEM_CERTIFICATE.search(value)
+    if match is not None:
+        value = match.group(1)
+    try:
+        der = base64.b64decode("".join(value.split()), validate=True)
+    except (binascii.Error, ValueError):
+        raise CertificateBindingError("Invalid client certificate")
+    # A DER certificate is an ASN.1 SEQUENCE
+    if not der.startswith(b"\x30"):
+        raise CertificateBindingError("Invalid client certificate")
+    digest = hashlib.sha256(der).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+class CertificateBinding:
+    """Checks that a token is bound to the client certificate of a request.
+
+    Args:
+        header: Request header holding the client certificate as forwarded by
+            a TLS terminating proxy. Defaults to None (no header is read). Only
+            name one behind a proxy that strips it from incoming requests and
+            sets it itself; otherwise any client can claim any certificate.
+        use_tls_extension: Read the certificate from the ASGI TLS extension
+            (``scope["extensions"]["tls"]["client_cert_chain"]``) when the
+            server provides it. It takes precedence over ``header``.
+        cache_size: Number of certificates whose thumbprint is kept.
+    """
+
+    def __init__(
+        self,
+        *,
+        header: Optional[str] = None,
+        use_tls_extension: bool = True,
+        cache_size: int = 1024,
+    ):
+        self.header = header
+        self.use_tls_extension = use_tls_extension
+        self._thumbprints: StripedCache[str, str] = StripedCache(maxsize=cache_size)
+
+    def client_certificate(self, request: Request) -> Optional[str]:
+        """Return the request's client certificate as received, or None."""
+        if self.use_tls_extension:
+            tls = request.scope.get("extensions", {}).get("tls", {})
+            chain = tls.get("client_cert_chain") if isinstance(tls, Mapping) else None
+            if chain:
+                return next(iter(chain))
+        if self.header is not None:
+            return request.headers.get(self.header) or None
+        return None
+
+    def thumbprint(self, certificate: str) -> str:
+        """Return the thumbprint of ``certificate``, cached.
+
+        Raises:
+            CertificateBindingError: If the value is not a certificate.
+        """
+        if len(certificate) > MAX_CERTIFICATE_SIZE:
+            raise CertificateBindingError("Client certificate too large")
+        return self._thumbprints.get_or_load(
+            certificate, lambda: certificate_thumbprint(certificate)
+        )
+
+    def check(self, id_token: IDToken, request: Request) -> None:
+        """Check that ``id_token`` is bound to the request's client certificate.
+
+        Raises:
+            CertificateBindingError: If the token is not certificate bound, no
+                certificate was presented, or it is not the bound one.
+        """
+        cnf = getattr(id_token, "cnf", None)
+        expected = cnf.get(THUMBPRINT_CLAIM) if isinstance(cnf, Mapping) else None
+        if not isinstance(expected, str):
+            raise CertificateBindingError("Token is not certificate bound")
+        certificate = self.client_certificate(request)
+        if certificate is None:
+            raise CertificateBindingError("Client certificate required")
+        if not hmac.compare_digest(
+            self.thumbprint(certificate).encode("ascii"),
+            expected.encode("utf-8"),
+        ):
+            raise CertificateBindingError(
+                "Token is not bound to the client certificate"
+            )
+
+
+def get_mtls_auth(
+    authenticate_user: Callable[..., IDToken],
+    *,
+    binding: Optional[CertificateBinding] = None,
+) -> Callable[..., IDToken]:
+    """Return a dependency requiring the token to be bound to the client certificate.
+
+    Args:
+        authenticate_user: The function returned by ``get_auth``.
+        binding: Where to read certificates from; defaults to a
+            ``CertificateBinding()``, which only reads the TLS extension.
+
+    Returns:
+        func: mtls_user(request, id_token) -> IDToken (or token_type)
+
+    Raises (from the dependency):
+        HTTPException(401): If the token is not bound to the client certificate.
+    """
+    certificate_binding = binding or CertificateBinding()
+
+    def mtls_user(
+        request: Request, id_token: IDToken = Depends(authenticate_user)
+    ) -> IDToken:
+        try:
+            certificate_binding.check(id_token, request)
+        except CertificateBindingError as err:
+            raise HTTPException(
+                status_code=401,
+                detail=f"Unauthorized: {err}",
+                headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+            )
+        return id_token
+
+    return mtls_user
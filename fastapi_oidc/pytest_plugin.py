@@ -0,0 +1,46 @@
+"""
+Pytest fixtures backed by ``fastapi_oidc.testing.FakeIdP``.
+
+The plugin is registered through the ``pytest11`` entry point, so the fixtures
+are available in any project that has fastapi-oidc installed.
+
+Fixtures:
+    oidc_provider: An installed ``FakeIdP`` signing with RS256.
+    oidc_auth_config: ``get_auth`` keyword arguments trusting ``oidc_provider``.
+    oidc_token: A valid ID token minted by ``oidc_provider``.
+
+Example:
+    >>> def test_me(client, oidc_token):
+    ...     response = client.get("/me", headers={"Authorization": f"Bearer {oidc_token}"})
+    ...     assert response.status_code == 200
+
+Tests that need another provider setup can build their own:
+
+    >>> @pytest.fixture
+    ... def oidc_provider():
+    ...     with FakeIdP(issuer="https://tenant.example.test", algorithms=["ES256"]) as idp:
+    ...         yield idp
+"""
+
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+
+from fastapi_oidc.testing import FakeIdP
+
+
+@pytest.fixture
+def oidc_provider() -> Iterator[FakeIdP]:
+    with FakeIdP() as idp:
+        yield idp
+
+
+@pytest.fixture
+def oidc_auth_config(oidc_provider: FakeIdP) -> dict[str, Any]:
+    return oidc_provider.auth_config()
+
+
+@pytest.fixture
+def oidc_token(oidc_provider: FakeIdP) -> str:
+    return oidc_provider.mint(email="test-subject@example.test")
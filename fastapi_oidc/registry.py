@@ -0,0 +1,110 @@
+"""
+Sharing discovery and keys between ``get_auth`` instances of one provider.
+
+Every ``get_auth`` call configures its own discovery caches, so an app creating
+several instances against the same identity provider (one per audience or
+token type, say) fetches and stores the discovery document and JWKS once per
+instance and builds the verification keys once per instance too.
+
+Passing the same ``ProviderRegistry`` to those ``get_auth`` calls makes them
+share one discovery configuration and one ``KeyPlan`` per provider. Providers
+are keyed by ``base_authorization_server_uri`` together with the discovery
+settings: an instance configured differently (another ``signature_cache_ttl``,
+mirrors, ...) gets a provider of its own, and instances given no registry keep
+private caches as before. Providers are reference counted and dropped when the
+last ``authenticate_user`` using them is garbage collected.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.registry import ProviderRegistry
+
+    providers = ProviderRegistry()
+    authenticate_api = get_auth(
+        **OIDC_config, audience="api", provider_registry=providers
+    )
+    authenticate_admin = get_auth(
+        **OIDC_config, audience="admin", provider_registry=providers
+    )
+"""
+
+import threading
+from collections.abc import Hashable
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+
+from fastapi_oidc import discovery
+from fastapi_oidc.verifier import KeyPlan
+
+
+@dataclass
+class Provider:
+    """Discovery and key state shared by the verifiers of one provider.
+
+    Attributes:
+        base_authorization_server_uri: The provider's base URI.
+        discover: The namespace returned by ``discovery.configure``.
+        key_plan: Keys built from the provider's current JWKS.
+        references: Number of ``acquire`` calls not yet released.
+    """
+
+    base_authorization_server_uri: str
+    discover: Any
+    key_plan: KeyPlan = field(default_factory=KeyPlan)
+    references: int = 0
+    key: Hashable = field(default=None, repr=False)
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ProviderRegistry:
+    """Shares discovery caches and key plans between verifiers of a provider.
+
+    Thread-safe. Providers are created on first :meth:`acquire` and removed
+    when their reference count drops to zero.
+    """
+
+    def __init__(self) -> None:
+        self._providers: dict[Hashable, Provider] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._providers)
+
+    def acquire(self, base_authorization_server_uri: str, **options: Any) -> Provider:
+        """Return the provider for the URI and discovery settings, adding a reference.
+
+        Args:
+            base_authorization_server_uri: The provider's base URI.
+            **options: Keyword arguments for ``discovery.configure``; callers
+                with different settings get different providers.
+        """
+        base_uri = base_authorization_server_uri.rstrip("/")
+        key = (base_uri, tuple(sorted((k, _freeze(v)) for k, v in options.items())))
+        with self._lock:
+            provider = self._providers.get(key)
+            if provider is None:
+                provider = Provider(
+                    base_authorization_server_uri=base_uri,
+                    discover=discovery.configure(**options),
+                    key=key,
+                )
+                self._providers[key] = provider
+            provider.references += 1
+            return provider
+
+    def release(self, provider: Provider) -> None:
+        """Drop a reference, removing the provider when none are left."""
+        with self._lock:
+            provider.references -= 1
+            if provider.references <= 0:
+                if self._providers.get(provider.key) is provider:
+                    del self._providers[provider.key]
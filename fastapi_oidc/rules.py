@@ -0,0 +1,220 @@
+"""
+Declarative requirements on custom claims.
+
+Policies such as "the tenant is ours", "``email_verified`` is true" or "the
+user authenticated in the last ten minutes" can be given to ``get_auth`` as
+claim rules instead of pydantic validators on an ``IDToken`` subclass. Rules
+are compiled once into a flat list of predicates that runs on the raw claims
+right after the registered claims are validated, so tokens failing the policy
+are rejected before the token model is built.
+
+A rule fails when its claim is missing. Rejections name the claim but not the
+expected value, so responses do not reveal the policy.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.rules import Contains, Equals, MaxAge
+
+    authenticate_user = get_auth(
+        ...,
+        claim_rules=[
+            Equals("tid", "my-tenant"),
+            Equals("email_verified", True),
+            Contains("groups", ["admins", "operators"]),
+            MaxAge("auth_time", 600),
+        ],
+    )
+"""
+
+import abc
+import numbers
+import re
+import time
+from collections.abc import Iterable
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Optional
+
+from jose.exceptions import JWTClaimsError
+
+_MISSING = object()
+
+#: A compiled claim rule predicate: ``accepts(value, now) -> bool``.
+Predicate = Callable[[Any, float], bool]
+
+#: A compiled claim rule: ``(claim, accepts(value, now) -> bool)``.
+Check = tuple[str, Predicate]
+
+#: Compiled rules: ``validate(claims, now)``, raising ``JWTClaimsError``.
+Validator = Callable[[Mapping[str, Any], Optional[float]], None]
+
+
+@dataclass(frozen=True)
+class ClaimRule(abc.ABC):
+    """Base class of claim rules; subclasses implement :meth:`compile`.
+
+    Attributes:
+        claim: Name of the claim the rule applies to.
+    """
+
+    claim: str
+
+    @abc.abstractmethod
+    def compile(self) -> Predicate:
+        """Return a predicate accepting the claim values that satisfy the rule.
+
+        It is called with the claim value and the Unix time the token is
+        verified at, which time-based rules use instead of the clock.
+        """
+
+
+@dataclass(frozen=True)
+class Equals(ClaimRule):
+    """The claim equals ``value``. Booleans only equal booleans."""
+
+    value: Any
+
+    def compile(self) -> Predicate:
+        expected = self.value
+        is_bool = isinstance(expected, bool)
+
+        def accepts(value: Any, now: float) -> bool:
+            return value == expected and isinstance(value, bool) == is_bool
+
+        return accepts
+
+
+@dataclass(frozen=True)
+class OneOf(ClaimRule):
+    """The claim is one of ``values``, e.g. an accepted ``azp`` or ``acr``."""
+
+    values: Iterable[Any]
+
+    def compile(self) -> Predicate:
+        accepted = frozenset(self.values)
+
+        def accepts(value: Any, now: float) -> bool:
+            try:
+                return value in accepted
+            except TypeError:  # unhashable claim values such as lists
+                return False
+
+        return accepts
+
+
+@dataclass(frozen=True)
+class Contains(ClaimRule):
+    """The claim is a list including any (or with ``require_all``, all) of ``values``.
+
+    For membership claims such as ``groups`` or ``roles``.
+    """
+
+    values: Iterable[Any]
+    require_all: bool = False
+
+    def compile(self) -> Predicate:
+        required = frozenset(self.values)
+        require_all = self.require_all
+
+        def accepts(value: Any, now: float) -> bool:
+            if not isinstance(value, list):
+                return False
+            try:
+                present = required.intersection(value)
+            except TypeError:
+                return False
+            return present == required if require_all else bool(present)
+
+        return accepts
+
+
+@dataclass(frozen=True)
+class Matches(ClaimRule):
+    """The claim is a string fully matching the regular expression ``pattern``."""
+
+    pattern: str
+
+    def compile(self) -> Predicate:
+        fullmatch = re.compile(self.pattern).fullmatch
+        return lambda value, now: (
+            isinstance(value, str) and fullmatch(value) is not None
+        )
+
+
+@dataclass(frozen=True)
+class InRange(ClaimRule):
+    """The claim is a number between ``minimum`` and ``maximum``, inclusive."""
+
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+    def compile(self) -> Predicate:
+        low = -float("inf") if self.minimum is None else self.minimum
+        high = float("inf") if self.maximum is None else self.maximum
+        return lambda value, now: _is_number(value) and low <= value <= high
+
+
+@dataclass(frozen=True)
+class MaxAge(ClaimRule):
+    """The claim is a timestamp at most ``seconds`` in the past.
+
+    For instance ``MaxAge("auth_time", 600)`` requires the user to have
+    authenticated in the last ten minutes. Timestamps more than ``leeway``
+    seconds in the future are rejected too. The age is measured from the time
+    the token is verified at, e.g. ``Verifier.verify(now=...)``.
+    """
+
+    seconds: float
+    leeway: float = 0
+
+    def compile(self) -> Predicate:
+        max_age, leeway = self.seconds, self.leeway
+
+        def accepts(value: Any, now: float) -> bool:
+            if not _is_number(value):
+                return False
+            age = now - value
+            return -leeway <= age <= max_age + leeway
+
+        return accepts
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def compile_rules(rules: Iterable[ClaimRule]) -> Validator:
+    """Compile ``rules`` into one validator of a claims mapping.
+
+    Raises:
+        TypeError: If an item is not a ``ClaimRule``.
+
+    Returns:
+        func: validate(claims, now=None), raising ``JWTClaimsError`` for the
+        first failing rule. ``now`` is the Unix time to check time-based rules
+        against and defaults to the current time.
+    """
+    checks: list[Check] = []
+    for rule in rules:
+        if not isinstance(rule, ClaimRule):
+            raise TypeError(f"Claim rules must be ClaimRule instances, got {rule!r}")
+        checks.append((rule.claim, rule.compile()))
+    flat = tuple(checks)
+
+    def validate(claims: Mapping[str, Any], now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.time()
+        for claim, accepts in flat:
+            value = claims.get(claim, _MISSING)
+            if value is _MISSING:
+                raise JWTClaimsError(f"Missing required claim: {claim}")
+            if not accepts(value, now):
+                raise JWTClaimsError(f"Invalid {claim} claim")
+
+    return validate
@@ -0,0 +1,276 @@
+"""
+Verified-session cookies that spare repeated signature verification.
+
+Browser clients send the same ID token with every request, and verifying its
+RSA or ECDSA signature each time is the most expensive part of
+``authenticate_user``. ``get_session_auth`` wraps ``authenticate_user``: once a
+token has been fully verified, the response sets a short-lived cookie holding
+its claims, signed with HMAC-SHA256. While the browser sends that cookie along
+with the same token, the claims are taken from the cookie after an HMAC check
+and a JSON decode instead of verifying the token again.
+
+The cookie is only a verification cache, not a credential of its own:
+
+- It is bound to the token it was issued for (by a SHA-256 digest) and is only
+  accepted together with that token, so a request still needs the bearer token
+  and no cross-site request forgery risk is added.
+- It is bound to an audience, so apps sharing a signing key cannot accept each
+  other's cookies.
+- It expires after ``max_age`` seconds and never after the token's ``exp``.
+- Keys rotate: the first key signs, all listed keys verify.
+
+Whenever the cookie is missing, expired, tampered with, signed by an unknown
+key or issued for another token, the token is verified in full and a new
+cookie is set. With a ``RevocationIndex``, cookies of logged out sessions are
+refused too.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.session import SessionCookie
+    from fastapi_oidc.session import get_session_auth
+
+    authenticate_user = get_auth(**OIDC_config)
+    session_user = get_session_auth(
+        authenticate_user,
+        sessions=SessionCookie(
+            {"2026-10": os.environ["SESSION_KEY"]}, audience="my-api"
+        ),
+    )
+
+    @app.get("/me")
+    def me(user: IDToken = Depends(session_user)):
+        return {"sub": user.sub}
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import inspect
+import json
+import time
+from collections.abc import Mapping
+from typing import Any
+from typing import Callable
+from typing import Literal
+from typing import Optional
+from typing import Type
+
+from fastapi import Depends
+from fastapi import Request
+from fastapi import Response
+from fastapi.security import APIKeyHeader
+from pydantic import ValidationError
+
+from fastapi_oidc.logout import RevocationIndex
+from fastapi_oidc.types import IDToken
+
+#: Shortest HMAC key accepted, in bytes.
+MIN_KEY_LENGTH = 32
+
+#: Largest cookie value issued, in bytes; larger claim sets get no cookie.
+MAX_COOKIE_SIZE = 4000
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _token_digest(token: str) -> str:
+    return _b64encode(hashlib.sha256(token.encode()).digest()[:16])
+
+
+class SessionCookie:
+    """Issues and checks HMAC-signed cookies carrying verified claims.
+
+    Args:
+        keys: HMAC keys by key id, of at least ``MIN_KEY_LENGTH`` bytes. The
+            first one signs new cookies; all of them are accepted. To rotate,
+            put the new key first and drop the old one after ``max_age``.
+        audience: What the cookies are valid for, e.g. the API's name. Cookies
+            issued for another audience are refused.
+        max_age: Most seconds a cookie is valid; the token's ``exp`` caps it.
+        cookie_name: Name of the cookie.
+        secure: Only send the cookie over HTTPS.
+        samesite: The cookie's ``SameSite`` attribute.
+        path: The cookie's ``Path`` attribute.
+        clock: Time source, replaceable in tests.
+
+    Raises:
+        ValueError: If there are no keys, a key is too short or a key id
+            contains a dot.
+    """
+
+    def __init__(
+        self,
+        keys: Mapping[str, str | bytes],
+        *,
+        audience: str,
+        max_age: int = 300,
+        cookie_name: str = "oidc_session",
+        secure: bool = True,
+        samesite: Literal["lax", "strict", "none"] = "lax",
+        path: str = "/",
+        clock: Callable[[], float] = time.time,
+    ):
+        self._keys: dict[str, bytes] = {}
+        for kid, key in keys.items():
+            secret = key.encode() if isinstance(key, str) else key
+            if "." in kid:
+                raise ValueError(f"Session key id {kid!r} must not contain a dot")
+            if len(secret) < MIN_KEY_LENGTH:
+                raise ValueError(
+                    f"Session key {kid!r} is shorter than {MIN_KEY_LENGTH} bytes"
+                )
+            self._keys[kid] = secret
+        if not self._keys:
+            raise ValueError("At least one session key is required")
+        self._signing_kid = next(iter(self._keys))
+        self.audience = audience
+        self.max_age = max_age
+        self.cookie_name = cookie_name
+        self.secure = secure
+        self.samesite = samesite
+        self.path = path
+        self.clock = clock
+
+    def _sign(self, kid: str, payload: str) -> str:
+        signed = f"{kid}.{payload}".encode()
+        return _b64encode(hmac.new(self._keys[kid], signed, hashlib.sha256).digest())
+
+    def issue(self, claims: Mapping[str, Any], token: str) -> Optional[tuple[str, int]]:
+        """Return a cookie value for the verified ``claims`` of ``token``.
+
+        Returns:
+            The value and its lifetime in seconds, or None if the token is
+            about to expire or the cookie would exceed ``MAX_COOKIE_SIZE``.
+        """
+        now = int(self.clock())
+        expires = now + self.max_age
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            expires = min(expires, int(exp))
+        if expires <= now:
+            return None
+        body = {
+            "c": claims,
+            "e": expires,
+            "a": self.audience,
+            "t": _token_digest(token),
+        }
+        payload = _b64encode(json.dumps(body, separators=(",", ":")).encode())
+        kid = self._signing_kid
+        value = f"{kid}.{payload}.{self._sign(kid, payload)}"
+        if len(value) > MAX_COOKIE_SIZE:
+            return None
+        return value, expires - now
+
+    def load(self, value: str, token: str) -> Optional[dict[str, Any]]:
+        """Return the claims in cookie ``value`` if it is valid for ``token``.
+
+        Returns:
+            The claims, or None if the cookie is malformed, signed by an
+            unknown key, tampered with, expired, or issued for another token
+            or audience.
+        """
+        kid, _, rest = value.partition(".")
+        payload, _, signature = rest.partition(".")
+        if kid not in self._keys or not payload:
+            return None
+        # As bytes: compare_digest refuses non-ASCII strings
+        expected = self._sign(kid, payload).encode()
+        if not hmac.compare_digest(signature.encode(), expected):
+            return None
+        try:
+            body = json.loads(_b64decode(payload))
+        except (binascii.Error, ValueError):
+            return None
+        if not isinstance(body, dict) or not isinstance(body.get("c"), dict):
+            return None
+        if body.get("a") != self.audience:
+            return None
+        if body.get("t") != _token_digest(token):
+            return None
+        expires = body.get("e")
+        if not isinstance(expires, int) or self.clock() >= expires:
+            return None
+        return body["c"]
+
+
+def _auth_header_dependency(authenticate_user: Callable[..., IDToken]) -> Any:
+    """Return the dependency ``authenticate_user`` reads its header with.
+
+    Reusing it keeps the security scheme in the OpenAPI docs unchanged.
+    """
+    parameter = inspect.signature(authenticate_user).parameters.get("auth_header")
+    if parameter is not None and parameter.default is not inspect.Parameter.empty:
+        return parameter.default
+    return Depends(APIKeyHeader(name="Authorization"))
+
+
+def get_session_auth(
+    authenticate_user: Callable[..., IDToken],
+    *,
+    sessions: SessionCookie,
+    token_type: Type[IDToken] = IDToken,
+    revocation_index: Optional[RevocationIndex] = None,
+) -> Callable[..., IDToken]:
+    """Return a dependency verifying tokens once per session cookie lifetime.
+
+    Args:
+        authenticate_user: The function returned by ``get_auth``.
+        sessions: Issues and checks the cookies.
+        token_type: The ``token_type`` given to ``get_auth``; claims from a
+            cookie are returned as this model.
+        revocation_index: Refuse cookies of sessions and users logged out
+            since the cookie was issued. Pass the index given to ``get_auth``.
+
+    Returns:
+        func: session_user(request, response, auth_header) -> IDToken (or
+        token_type)
+
+    Raises (from the dependency):
+        HTTPException(401): If the token fails full verification.
+    """
+
+    def session_user(
+        request: Request,
+        response: Response,
+        auth_header: str = _auth_header_dependency(authenticate_user),
+    ) -> IDToken:
+        token = auth_header.rpartition(" ")[2]
+        cookie = request.cookies.get(sessions.cookie_name)
+        if cookie is not None:
+            claims = sessions.load(cookie, token)
+            if claims is not None and (
+                revocation_index is None or not revocation_index.is_revoked(claims)
+            ):
+                try:
+                    return token_type.model_validate(claims)
+                except ValidationError:
+                    pass
+
+        id_token = authenticate_user(auth_header)
+        issued = sessions.issue(id_token.model_dump(mode="json"), token)
+        if issued is not None:
+            value, max_age = issued
+            response.set_cookie(
+                sessions.cookie_name,
+                value,
+                max_age=max_age,
+                path=sessions.path,
+                secure=sessions.secure,
+                httponly=True,
+                samesite=sessions.samesite,
+            )
+        return id_token
+
+    return session_user
@@ -0,0 +1,224 @@
+"""
+Same-host cache of discovery documents and JWKS shared between processes.
+
+Pre-fork servers such as gunicorn run several worker processes per host and
+each would otherwise fetch and parse the same discovery document and JWKS. With
+``SharedDocumentCache`` the documents live in a memory-mapped file: a header
+holding a generation counter followed by the JSON serialized entries. Workers
+serve fresh entries from their local copy without taking a lock; once an entry
+has expired they check the generation with a single read from the mapping and
+only re-parse the payload if another process has written a new one. Refreshes
+happen under an exclusive ``flock``, so when an entry expires one process
+fetches it and the others wait for and reuse its result.
+
+A cache created before the server forks (gunicorn ``--preload``) is inherited
+by every worker. As ``flock`` locks belong to the open file, not the process,
+each process reopens the file the first time it locks it.
+
+Only POSIX platforms are supported.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+from typing import Callable
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"FAOIDC01"
+# magic, generation, payload length
+_HEADER = struct.Struct("<8sQQ")
+
+
+class SharedDocumentCache:
+    """A JSON document cache in a memory-mapped file shared by local processes.
+
+    Entries are keyed by URL and expire ``ttl`` seconds after the fetch that
+    stored them, whichever process made it. The file only ever grows and its
+    payload is capped at ``max_bytes``; documents that would exceed the cap are
+    returned to the caller but not shared.
+
+    Args:
+        path: File backing the cache. Every process that should share documents
+            must use the same path; it is created if missing.
+        max_bytes: Maximum size of the serialized payload.
+
+    Example:
+        >>> cache = SharedDocumentCache("/dev/shm/fastapi-oidc-okta")
+        >>> jwks, age = cache.lookup(jwks_uri, 3600, fetch_jwks)
+    """
+
+    def __init__(self, path: str, *, max_bytes: int = 1024 * 1024):
+        if fcntl is None:  # pragma: no cover - Windows
+            raise RuntimeError("SharedDocumentCache requires a POSIX platform")
+        self.path = path
+        self.max_bytes = max_bytes
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._map: mmap.mmap | None = None
+        self._generation = -1
+        self._entries: dict[str, dict[str, Any]] = {}
+        with self._locked(fcntl.LOCK_EX):
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                os.ftruncate(self._fd, _HEADER.size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, 0, 0), 0)
+                size = _HEADER.size
+            if size >= _HEADER.size:
+                self._remap()
+        if self._map is None or self._read_header()[0] != _MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a fastapi-oidc shared cache file")
+
+    @property
+    def generation(self) -> int:
+        """Number of times any process has written new entries."""
+        return self._read_header()[1]
+
+    def lookup(
+        self, key: str, ttl: float, fetch: Callable[[], Any]
+    ) -> tuple[Any, float]:
+        """Return the entry for ``key``, fetching and sharing it if expired.
+
+        Args:
+            key: Cache key, typically the document URL.
+            ttl: Seconds an entry stays fresh after it was fetched.
+            fetch: Called to produce a fresh JSON serializable value.
+
+        Returns:
+            The value and its age in seconds.
+        """
+        # Entries carry the time they were fetched by whichever process, so a
+        # fresh local copy is as good as the shared one and is read without a lock.
+        entry = self._fresh_entry(key, ttl)
+        if entry is not None:
+            return entry["value"], time.time() - entry["fetched_at"]
+
+        with self._lock:
+            self._sync()
+            entry = self._fresh_entry(key, ttl)
+            if entry is not None:
+                return entry["value"], time.time() - entry["fetched_at"]
+
+            with self._locked(fcntl.LOCK_EX):
+                # Another process may have refreshed it while we waited
+                self._sync(locked=True)
+                entry = self._fresh_entry(key, ttl)
+                if entry is not None:
+                    return entry["value"], time.time() - entry["fetched_at"]
+
+                value = fetch()
+                self._entries[key] = {"fetched_at": time.time(), "value": value}
+                self._write()
+                return value, 0.0
+
+    def discard(self, key: str) -> None:
+        """Remove the entry for ``key`` from the shared file.
+
+        Other processes keep serving their local copy until it expires.
+        """
+        with self._lock, self._locked(fcntl.LOCK_EX):
+            self._sync(locked=True)
+            if self._entries.pop(key, None) is not None:
+                self._write()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        os.close(self._fd)
+
+    def _fresh_entry(self, key: str, ttl: float) -> dict[str, Any] | None:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry["fetched_at"] < ttl:
+            return entry
+        return None
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        if self._pid != os.getpid():
+            self._reopen()
+        fcntl.flock(self._fd, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _reopen(self) -> None:
+        """Open the file anew in a forked child so its locks are its own.
+
+        Closing the inherited descriptor leaves the parent's lock in place.
+        """
+        fd = os.open(self.path, os.O_RDWR)
+        os.close(self._fd)
+        self._fd, self._pid = fd, os.getpid()
+        self._remap()
+
+    def _remap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+
+    def _mapped_size(self) -> int:
+        return len(self._map) if self._map is not None else 0
+
+    def _read_header(self) -> tuple[bytes, int, int]:
+        assert self._map is not None  # nosec B101
+        return _HEADER.unpack_from(self._map, 0)
+
+    def _sync(self, locked: bool = False) -> None:
+        """Re-read the entries if another process wrote a new generation."""
+        if self._read_header()[1] == self._generation:
+            return
+        if not locked:
+            with self._locked(fcntl.LOCK_SH):
+                self._sync(locked=True)
+            return
+        _, generation, length = self._read_header()
+        start, end = _HEADER.size, _HEADER.size + length
+        if os.fstat(self._fd).st_size != self._mapped_size():
+            self._remap()
+        assert self._map is not None  # nosec B101
+        entries = json.loads(self._map[start:end]) if length else {}
+        # Keep the objects of unchanged values so caches keyed on them survive
+        # another process refreshing a different entry.
+        for key, entry in entries.items():
+            previous = self._entries.get(key)
+            if previous is not None and previous["value"] == entry["value"]:
+                entry["value"] = previous["value"]
+        self._entries = entries
+        self._generation = generation
+
+    def _write(self) -> None:
+        """Serialize all entries and publish them as the next generation."""
+        payload = json.dumps(self._entries, separators=(",", ":")).encode()
+        if len(payload) > self.max_bytes:
+            logger.warning(
+                "Not sharing %d byte cache payload, above max_bytes=%d",
+                len(payload),
+                self.max_bytes,
+            )
+            return
+        start, size = _HEADER.size, _HEADER.size + len(payload)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        if self._mapped_size() < size:
+            self._remap()
+        assert self._map is not None  # nosec B101
+        generation = self._read_header()[1] + 1
+        self._map[start:size] = payload
+        _HEADER.pack_into(self._map, 0, _MAGIC, generation, len(payload))
+        self._generation = generation
@@ -0,0 +1,249 @@
+"""
+Signing keys given in configuration instead of discovered.
+
+``get_auth`` normally fetches the discovery document and then the JWKS it
+names before it can verify the first token. ``StaticKeys`` holds the keys
+instead: a JWKS dict, PEM encoded public keys, or a file with either. Passed
+as ``get_auth(static_keys=...)`` it replaces discovery entirely, so no request
+is ever made to the provider and verification works offline.
+
+Keys read from a file can be reloaded when the file changes: with
+``reload_interval`` set, the file's modification time and size are checked at
+most that often, on the request path, and the keys are re-read when they
+changed. A file that cannot be parsed is logged and the previous keys are
+kept. Between reloads the same JWKS object is returned, so the keys built for
+it by ``KeyPlan`` are reused.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.static import StaticKeys
+
+    authenticate_user = get_auth(
+        client_id="my-client",
+        issuer="https://idp.example.com",
+        signature_cache_ttl=3600,
+        static_keys=StaticKeys.from_file("/etc/idp/jwks.json", reload_interval=30),
+    )
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections.abc import Collection
+from collections.abc import Iterable
+from collections.abc import Mapping
+from typing import Any
+from typing import Callable
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+#: Largest key file read, in bytes.
+MAX_KEY_FILE_SIZE = 1024 * 1024
+
+_PEM_BLOCK = re.compile(r"-----BEGIN ([A-Z ]+)-----\s.*?-----END \1-----", re.DOTALL)
+
+
+def _parse_keys(data: str) -> Any:
+    """Return the JWKS in ``data``, or the PEM blocks it holds."""
+    if data.lstrip().startswith("{"):
+        return json.loads(data)
+    blocks = [match.group(0) for match in _PEM_BLOCK.finditer(data)]
+    if not blocks:
+        raise ValueError("Key file holds neither a JWKS nor PEM keys")
+    return blocks
+
+
+def _document(
+    keys: Any, algorithms: Optional[Iterable[str]], source: str
+) -> dict[str, Any]:
+    """Return the stand-in discovery document for ``keys``."""
+    if isinstance(keys, Mapping):
+        if not isinstance(keys.get("keys"), list) or not all(
+            isinstance(key, Mapping) and "kty" in key for key in keys["keys"]
+        ):
+            raise ValueError("Static JWKS must have a list of keys")
+        entries = keys["keys"]
+    elif isinstance(keys, (str, bytes)):
+        entries = [keys]
+    else:
+        entries = list(keys)
+    if not entries:
+        raise ValueError("At least one static key is required")
+    if algorithms is not None:
+        supported = sorted(set(algorithms))
+    else:
+        # Only JWKs can name their own algorithm
+        named = [key.get("alg") for key in entries if isinstance(key, Mapping)]
+        if len(named) != len(entries) or not all(isinstance(a, str) for a in named):
+            raise ValueError(
+                "algorithms is required unless every static key has an alg"
+            )
+        supported = sorted({str(a) for a in named})
+    if not supported:
+        raise ValueError("At least one signing algorithm is required")
+    return {"jwks_uri": source, "id_token_signing_alg_values_supported": supported}
+
+
+class StaticKeys:
+    """A discovery stand-in serving keys given in configuration.
+
+    It has the ``auth_server`` and ``public_keys`` functions of the namespace
+    ``discovery.configure`` returns, answering both without network access.
+
+    Args:
+        keys: A JWKS dict, a PEM encoded public key, or a list of PEM keys or
+            JWK dicts.
+        algorithms: Accepted signing algorithms. Required unless every key is
+            a JWK with an ``alg`` member, from which they are then taken.
+
+    Raises:
+        ValueError: If there are no keys or the algorithms cannot be told.
+    """
+
+    def __init__(self, keys: Any, *, algorithms: Optional[Iterable[str]] = None):
+        self.algorithms = None if algorithms is None else tuple(algorithms)
+        self.path: Optional[str] = None
+        self.reload_interval: Optional[float] = None
+        self.clock: Callable[[], float] = time.monotonic
+        self._keys = keys
+        self._document = _document(keys, self.algorithms, "static")
+        self._stat: Optional[tuple[int, int]] = None
+        self._next_check = 0.0
+        self._loaded_at = time.time()
+        self._last_error: Optional[tuple[str, float]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(
+        cls,
+        path: str,
+        *,
+        algorithms: Optional[Iterable[str]] = None,
+        reload_interval: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> "StaticKeys":
+        """Read the keys from a JWKS (JSON) or PEM file.
+
+        Args:
+            path: The key file. PEM files may hold several keys.
+            algorithms: As for ``StaticKeys``.
+            reload_interval: Seconds between checks whether the file changed.
+                Defaults to None (read once).
+            clock: Time source, replaceable in tests.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If it holds no usable keys.
+        """
+        stat, keys = cls._read(path)
+        static = cls(keys, algorithms=algorithms)
+        static.path = path
+        static.reload_interval = reload_interval
+        static.clock = clock
+        static._stat = stat
+        static._document = _document(keys, static.algorithms, path)
+        static._next_check = clock() + (reload_interval or 0)
+        return static
+
+    @staticmethod
+    def _read(path: str) -> tuple[tuple[int, int], Any]:
+        with open(path, encoding="utf-8") as f:
+            st = os.fstat(f.fileno())
+            if st.st_size > MAX_KEY_FILE_SIZE:
+                raise ValueError(f"{path} is larger than {MAX_KEY_FILE_SIZE} bytes")
+            data = f.read()
+        return (st.st_mtime_ns, st.st_size), _parse_keys(data)
+
+    def _reload_if_changed(self) -> None:
+        now = self.clock()
+        if self.path is None or self.reload_interval is None or now < self._next_check:
+            return
+        # One thread checks per interval; the others keep using current keys
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + self.reload_interval
+            try:
+                st = os.stat(self.path)
+                if (st.st_mtime_ns, st.st_size) != self._stat:
+                    self._load(self.path)
+            except (OSError, ValueError) as err:
+                logger.warning(
+                    "Keeping previous keys, reading %s failed: %s", self.path, err
+                )
+        finally:
+            self._lock.release()
+
+    def _load(self, path: str) -> None:
+        try:
+            stat, keys = self._read(path)
+            document = _document(keys, self.algorithms, path)
+        except (OSError, ValueError) as err:
+            self._last_error = (str(err), time.time())
+            raise
+        self._keys, self._document, self._stat = keys, document, stat
+        self._loaded_at = time.time()
+        logger.info("Reloaded signing keys from %s", path)
+
+    def auth_server(self, *_: Any, base_url: Optional[str] = None) -> dict[str, Any]:
+        """Return a stand-in discovery document listing the algorithms."""
+        self._reload_if_changed()
+        return self._document
+
+    def public_keys(self, OIDC_spec: Optional[Mapping[str, Any]] = None) -> Any:
+        """Return the keys, the same object until they are reloaded."""
+        return self._keys
+
+    def signing_algos(self, OIDC_spec: Optional[Mapping[str, Any]] = None) -> list[str]:
+        """Return the accepted signing algorithms."""
+        return list(self._document["id_token_signing_alg_values_supported"])
+
+    def state(self) -> dict[str, Any]:
+        """Return a snapshot shaped like that of ``discovery.configure``."""
+        keys = self._keys
+        if isinstance(keys, Mapping):
+            entries = keys["keys"]
+        elif isinstance(keys, (str, bytes)):
+            entries = [keys]
+        else:
+            entries = list(keys)
+        entry: dict[str, Any] = {
+            "url": self.path or "static",
+            "kind": "jwks",
+            "fetched_at": self._loaded_at,
+            "age": time.time() - self._loaded_at,
+            "kids": [k.get("kid") if isinstance(k, Mapping) else None for k in entries],
+            "algorithms": self.signing_algos(),
+        }
+        if self._last_error is not None:
+            error, at = self._last_error
+            entry["last_error"] = {"error": error, "at": at}
+        return {"reload_interval": self.reload_interval, "documents": [entry]}
+
+    def refresh(self) -> list[str]:
+        """Read the key file again now, whether or not it changed.
+
+        Returns:
+            The path read, or nothing for keys not read from a file.
+
+        Raises:
+            OSError, ValueError: If the file cannot be read; the previous keys
+                stay in use.
+        """
+        if self.path is None:
+            return []
+        with self._lock:
+            self._load(self.path)
+        return [self.path]
+
+    def purge(self, purge_kinds: Collection[str] = ()) -> list[str]:
+        """Do nothing: static keys have no cache to drop."""
+        return []
@@ -0,0 +1,460 @@
+"""
+In-process fake OIDC identity provider for tests.
+
+``FakeIdP`` serves a discovery document and a JWKS to any code that fetches
+them with ``requests`` and mints signed ID tokens for them, so applications
+using ``get_auth`` can be tested end to end without a network, without
+monkeypatching ``fastapi_oidc`` internals and without generating RSA keys in
+every test. Signing keys come from a process-wide pool that is generated once
+and shared by every ``FakeIdP``, which keeps key generation out of per-test time.
+
+The matching pytest fixtures live in ``fastapi_oidc.pytest_plugin``, which is
+registered automatically when fastapi-oidc is installed.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.testing import FakeIdP
+
+    def test_protected_route():
+        with FakeIdP(algorithms=["ES256"]) as idp:
+            authenticate_user = get_auth(**idp.auth_config())
+            token = idp.mint(email="user@example.com")
+
+            assert authenticate_user(f"Bearer {token}").email == "user@example.com"
+"""
+
+import io
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any
+from typing import Optional
+from unittest import mock
+from urllib.parse import urlsplit
+
+import requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwe
+from jose import jwk
+from jose import jwt
+from jose.backends.base import Key
+from requests.adapters import HTTPAdapter
+
+from fastapi_oidc.dpop import access_token_hash
+from fastapi_oidc.dpop import jwk_thumbprint
+from fastapi_oidc.logout import BACKCHANNEL_LOGOUT_EVENT
+
+#: Algorithms ``FakeIdP`` can sign with.
+SUPPORTED_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+_CURVES: dict[str, ec.EllipticCurve] = {
+    "ES256": ec.SECP256R1(),
+    "ES384": ec.SECP384R1(),
+    "ES512": ec.SECP521R1(),
+}
+
+
+def json_response(
+    payload: Any, *, status_code: int = 200, url: str = ""
+) -> requests.Response:
+    """Return a ``requests.Response`` with ``payload`` as its JSON body.
+
+    The body is served from ``raw`` like a real server's, so it can be read
+    with ``stream=True`` as well. Bytes are used as the body unchanged.
+    """
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "application/json"
+    response.headers["Content-Length"] = str(len(body))
+    response.raw = io.BytesIO(body)
+    return response
+
+
+_key_pool: dict[tuple[str, int], str] = {}
+_key_pool_lock = threading.Lock()
+
+
+def _pooled_private_key(algorithm: str, index: int) -> str:
+    """Return the ``index``-th PEM private key for ``algorithm``'s key family.
+
+    Keys are generated on first use and reused for the lifetime of the process.
+    RSA algorithms share one family, each ECDSA curve is its own family.
+    """
+    family = "RSA" if algorithm.startswith("RS") else algorithm
+    with _key_pool_lock:
+        pem = _key_pool.get((family, index))
+        if pem is None:
+            if family == "RSA":
+                private_key: Any = rsa.generate_private_key(
+                    public_exponent=65537, key_size=2048
+                )
+            else:
+                private_key = ec.generate_private_key(_CURVES[family])
+            pem = private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            ).decode("UTF-8")
+            _key_pool[(family, index)] = pem
+    return pem
+
+
+class SigningKey:
+    """A signing key published by a ``FakeIdP``.
+
+    Attributes:
+        kid (str): Key id placed in the JWKS and in minted token headers.
+        algorithm (str): JWS algorithm the key signs with.
+        private_pem (str): PEM encoded private key.
+        public_jwk (dict): Public key as published in the JWKS.
+    """
+
+    def __init__(self, *, kid: str, algorithm: str, private_pem: str):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.private_pem = private_pem
+        # Parse once; jose would otherwise re-parse the PEM for every token.
+        self.signer: Key = jwk.construct(private_pem, algorithm)
+        self.public_jwk: dict[str, Any] = {
+            **self.signer.public_key().to_dict(),
+            "kid": kid,
+            "use": "sig",
+        }
+
+
+class FakeIdP:
+    """An in-process OIDC provider answering discovery and JWKS requests.
+
+    While installed (``with FakeIdP() as idp:`` or ``idp.install()``), HTTP
+    requests made through ``requests`` to URLs under ``issuer`` are answered
+    in-process; requests to other hosts are sent normally. Installed providers
+    can be nested and each answers only for its own issuer.
+
+    Args:
+        issuer: Issuer identifier and base URL of the provider. It is used both
+            as ``base_authorization_server_uri`` and as the ``iss`` claim.
+        client_id: Default ``aud`` of minted tokens.
+        algorithms: Algorithms to publish a signing key for. The first one is
+            the default for :meth:`mint`.
+
+    Attributes:
+        keys (list[SigningKey]): Keys currently published in the JWKS.
+        request_counts (collections.Counter): Number of requests served per path.
+        userinfo (dict[str, dict]): Claims returned by the userinfo endpoint per
+            ``sub``. The endpoint accepts any token minted by this provider as
+            access token and answers for its ``sub``.
+    """
+
+    def __init__(
+        self,
+        *,
+        issuer: str = "https://idp.example.test",
+        client_id: str = "test-client",
+        algorithms: tuple[str, ...] | list[str] = ("RS256",),
+    ):
+        unsupported = set(algorithms) - set(SUPPORTED_ALGORITHMS)
+        if unsupported or not algorithms:
+            raise ValueError(
+                f"algorithms must be a non-empty subset of {SUPPORTED_ALGORITHMS}, "
+                f"received {algorithms!r}"
+            )
+        self.issuer = issuer.rstrip("/")
+        self.client_id = client_id
+        self.algorithms = list(algorithms)
+        self.keys: list[SigningKey] = []
+        self.request_counts: Counter[str] = Counter()
+        self.userinfo: dict[str, dict[str, Any]] = {}
+        self._generation: Counter[str] = Counter()
+        self._patcher: Any = None
+        for algorithm in self.algorithms:
+            self.rotate(algorithm, retire_previous=False)
+
+    @property
+    def discovery_url(self) -> str:
+        return f"{self.issuer}/.well-known/openid-configuration"
+
+    @property
+    def jwks_uri(self) -> str:
+        return f"{self.issuer}/.well-known/jwks.json"
+
+    def discovery_document(self) -> dict[str, Any]:
+        """Return the provider's OpenID configuration document."""
+        return {
+            "issuer": self.issuer,
+            "authorization_endpoint": f"{self.issuer}/authorize",
+            "token_endpoint": f"{self.issuer}/token",
+            "userinfo_endpoint": f"{self.issuer}/userinfo",
+            "jwks_uri": self.jwks_uri,
+            "response_types_supported": ["code", "id_token"],
+            "subject_types_supported": ["public"],
+            "id_token_signing_alg_values_supported": self.algorithms,
+        }
+
+    def jwks(self) -> dict[str, Any]:
+        """Return the provider's published JSON Web Key Set."""
+        return {"keys": [key.public_jwk for key in self.keys]}
+
+    def auth_config(self, **overrides: Any) -> dict[str, Any]:
+        """Return keyword arguments for ``get_auth`` that trust this provider."""
+        return {
+            "client_id": self.client_id,
+            "base_authorization_server_uri": self.issuer,
+            "issuer": self.issuer,
+            "signature_cache_ttl": 3600,
+            **overrides,
+        }
+
+    def rotate(
+        self, algorithm: Optional[str] = None, *, retire_previous: bool = True
+    ) -> SigningKey:
+        """Publish a new signing key, optionally retiring the previous one.
+
+        Args:
+            algorithm: Algorithm of the new key. Defaults to the first configured.
+            retire_previous: Remove the newest existing key of the same algorithm
+                from the JWKS, so tokens it signed stop verifying.
+
+        Returns:
+            The new key, which becomes the default for its algorithm in :meth:`mint`.
+        """
+        algorithm = algorithm or self.algorithms[0]
+        if algorithm not in self.algorithms:
+            raise ValueError(f"{algorithm} is not one of {self.algorithms}")
+        if retire_previous:
+            previous = self._current_key(algorithm)
+            self.keys.remove(previous)
+        index = self._generation[algorithm]
+        self._generation[algorithm] += 1
+        key = SigningKey(
+            kid=f"{algorithm.lower()}-{index}-{uuid.uuid4().hex[:8]}",
+            algorithm=algorithm,
+            private_pem=_pooled_private_key(algorithm, index),
+        )
+        self.keys.append(key)
+        return key
+
+    def mint(
+        self,
+        *,
+        algorithm: Optional[str] = None,
+        key: Optional[SigningKey] = None,
+        expires_in: int = 300,
+        headers: Optional[dict[str, Any]] = None,
+        **claims: Any,
+    ) -> str:
+        """Mint a signed ID token.
+
+        Standard claims (``iss``, ``sub``, ``aud``, ``iat``, ``exp``) are filled
+        in and can be overridden, or removed by passing ``None``.
+
+        Args:
+            algorithm: Sign with the newest key of this algorithm.
+            key: Sign with this specific key instead, e.g. a retired one.
+            expires_in: Seconds from now until ``exp``. Negative values mint
+                expired tokens.
+            headers: Extra JWS header fields.
+            **claims: Claims to add to or override in the payload.
+
+        Returns:
+            The compact serialized token.
+        """
+        key = key or self._current_key(algorithm or self.algorithms[0])
+        now = int(time.time())
+        payload = {
+            "iss": self.issuer,
+            "sub": "test-subject",
+            "aud": self.client_id,
+            "iat": now,
+            "exp": now + expires_in,
+            **claims,
+        }
+        payload = {k: v for k, v in payload.items() if v is not None}
+        return jwt.encode(
+            payload,
+            key.signer,
+            algorithm=key.algorithm,
+            headers={"kid": key.kid, **(headers or {})},
+        )
+
+    def mint_logout_token(self, **claims: Any) -> str:
+        """Mint a back-channel logout token for ``fastapi_oidc.logout``.
+
+        It names the default subject unless ``sub`` (and/or ``sid``) is passed;
+        ``iss``, ``aud``, ``iat``, ``exp``, ``jti`` and ``events`` are filled
+        in. Other arguments are as for :meth:`mint`.
+        """
+        headers = {"typ": "logout+jwt", **claims.pop("headers", {})}
+        claims = {
+            "jti": uuid.uuid4().hex,
+            "events": {BACKCHANNEL_LOGOUT_EVENT: {}},
+            **claims,
+        }
+        return self.mint(headers=headers, **claims)
+
+    def encrypt(
+        self,
+        token: str,
+        public_key: Any,
+        *,
+        algorithm: str = "RSA-OAEP",
+        encryption: str = "A256GCM",
+    ) -> str:
+        """Encrypt a minted token to a relying party key, as a nested JWT.
+
+        Args:
+            token: A token returned by :meth:`mint`.
+            public_key: The relying party's public JWK, PEM, or shared secret.
+            algorithm: JWE key management algorithm.
+            encryption: JWE content encryption algorithm.
+        """
+        kid = public_key.get("kid") if isinstance(public_key, dict) else None
+        return jwe.encrypt(
+            token,
+            public_key,
+            encryption=encryption,
+            algorithm=algorithm,
+            cty="JWT",
+            kid=kid,
+        ).decode("ascii")
+
+    def install(self) -> "FakeIdP":
+        """Start answering requests for ``issuer``."""
+        if self._patcher is None:
+            original_send = HTTPAdapter.send
+            idp = self
+
+            def send(adapter: HTTPAdapter, request: Any, **kwargs: Any) -> Any:
+                if request.url.startswith(idp.issuer + "/"):
+                    return idp._respond(request)
+                return original_send(adapter, request, **kwargs)
+
+            self._patcher = mock.patch.object(HTTPAdapter, "send", send)
+            self._patcher.start()
+        return self
+
+    def uninstall(self) -> None:
+        """Stop answering requests for ``issuer``."""
+        if self._patcher is not None:
+            self._patcher.stop()
+            self._patcher = None
+
+    def __enter__(self) -> "FakeIdP":
+        return self.install()
+
+    def __exit__(self, *_: Any) -> None:
+        self.uninstall()
+
+    def _current_key(self, algorithm: str) -> SigningKey:
+        for key in reversed(self.keys):
+            if key.algorithm == algorithm:
+                return key
+        raise ValueError(f"No published key for {algorithm}")
+
+    def _respond(self, request: Any) -> requests.Response:
+        path = urlsplit(request.url).path
+        self.request_counts[path] += 1
+        if path == urlsplit(self.issuer + "/userinfo").path:
+            return self._respond_userinfo(request)
+        routes = {
+            urlsplit(self.discovery_url).path: self.discovery_document,
+            urlsplit(self.jwks_uri).path: self.jwks,
+        }
+        if path in routes:
+            response = json_response(routes[path](), url=request.url)
+        else:
+            response = json_response(
+                {"error": "not_found"}, status_code=404, url=request.url
+            )
+        response.request = request
+        return response
+
+    def _respond_userinfo(self, request: Any) -> requests.Response:
+        bearer = request.headers.get("Authorization", "").rpartition(" ")[2]
+        try:
+            claims = jwt.decode(
+                bearer,
+                self.jwks(),
+                algorithms=self.algorithms,
+                options={"verify_aud": False},
+            )
+        except Exception:
+            response = json_response(
+                {"error": "invalid_token"}, status_code=401, url=request.url
+            )
+        else:
+            response = json_response(
+                {**self.userinfo.get(claims["sub"], {}), "sub": claims["sub"]},
+                url=request.url,
+            )
+        response.request = request
+        return response
+
+
+class DPoPKey:
+    """A client key creating DPoP proofs, for testing ``fastapi_oidc.dpop``.
+
+    Args:
+        algorithm: Algorithm the proofs are signed with.
+        index: Which pooled key to use; keys with different indexes have
+            different thumbprints.
+
+    Attributes:
+        public_jwk (dict): Public key embedded in the proof headers.
+        thumbprint (str): JWK thumbprint to bind tokens to, as
+            ``idp.mint(cnf={"jkt": key.thumbprint})``.
+    """
+
+    def __init__(self, algorithm: str = "ES256", *, index: int = 1000):
+        self.algorithm = algorithm
+        self.signer: Key = jwk.construct(
+            _pooled_private_key(algorithm, index), algorithm
+        )
+        self.public_jwk: dict[str, Any] = self.signer.public_key().to_dict()
+        self.public_jwk.pop("alg", None)
+        self.thumbprint = jwk_thumbprint(self.public_jwk)
+
+    def proof(
+        self,
+        method: str,
+        url: str,
+        access_token: Optional[str] = None,
+        *,
+        headers: Optional[dict[str, Any]] = None,
+        **claims: Any,
+    ) -> str:
+        """Create a proof for a request, with a fresh ``jti`` and current ``iat``.
+
+        Args:
+            method: The request method.
+            url: The request URL.
+            access_token: Token the proof is presented with, hashed into ``ath``.
+            headers: Extra or overriding JWS header fields.
+            **claims: Claims to add to or override in the payload; ``None``
+                removes a claim.
+        """
+        payload = {
+            "jti": uuid.uuid4().hex,
+            "htm": method,
+            "htu": url,
+            "iat": int(time.time()),
+            "ath": access_token_hash(access_token) if access_token else None,
+            **claims,
+        }
+        payload = {k: v for k, v in payload.items() if v is not None}
+        return jwt.encode(
+            payload,
+            self.signer,
+            algorithm=self.algorithm,
+            headers={"typ": "dpop+jwt", "jwk": self.public_jwk, **(headers or {})},
+        )
@@ -0,0 +1,257 @@
+"""
+Single-pass parsing and verification of compact JWS ID tokens.
+
+``jose.jwt.decode`` splits and base64-decodes a token, JSON-parses its header
+more than once and constructs a key object from the JWKS for every token it
+verifies. ``ParsedToken`` splits and decodes the token once; the key index,
+the signature check and the claims validation all read from it. ``KeyIndex``
+builds each verification key once per JWKS and selects candidates by ``kid``
+and key type instead of trying every key.
+
+Error messages match those of ``jose.jwt.decode``, so ``authenticate_user``
+responses are unchanged.
+"""
+
+import base64
+import binascii
+import json
+import time
+from collections.abc import Collection
+from collections.abc import Iterable
+from collections.abc import Mapping
+from typing import Any
+from typing import Optional
+
+from jose import jwk
+from jose.backends.base import Key
+from jose.exceptions import ExpiredSignatureError
+from jose.exceptions import JWKError
+from jose.exceptions import JWTClaimsError
+from jose.exceptions import JWTError
+
+#: JWK ``kty`` able to verify each family of JWS algorithms.
+_KEY_TYPES = {"RS": "RSA", "PS": "RSA", "ES": "EC", "HS": "oct"}
+
+
+def _b64decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+class ParsedToken:
+    """A compact serialized JWS split and decoded once.
+
+    The header is decoded eagerly since every step needs it; the payload is
+    base64-decoded eagerly but only JSON-parsed on first access to
+    :attr:`claims`, so a token with a bad signature never has its payload parsed
+    unless a caller asks for it.
+
+    Args:
+        token: The compact serialization, ``header.payload.signature``.
+
+    Attributes:
+        header (dict): The JOSE header.
+        signing_input (bytes): ``header.payload`` as signed by the issuer.
+        signature (bytes): The decoded signature.
+
+    Raises:
+        JWTError: If the token is not a well-formed compact JWS.
+    """
+
+    __slots__ = ("header", "signing_input", "signature", "_payload", "_claims")
+
+    def __init__(self, token: str | bytes):
+        raw = token.encode("utf-8") if isinstance(token, str) else token
+        signing_input, dot, crypto_segment = raw.rpartition(b".")
+        header_segment, dot2, claims_segment = signing_input.partition(b".")
+        if not dot or not dot2:
+            raise JWTError("Not enough segments")
+        try:
+            header_data = _b64decode(header_segment)
+        except binascii.Error:
+            # jose reports this as a ValueError from splitting the token
+            raise JWTError("Not enough segments")
+        try:
+            header = json.loads(header_data)
+        except ValueError as err:
+            raise JWTError(f"Invalid header string: {err}")
+        if not isinstance(header, Mapping):
+            raise JWTError("Invalid header string: must be a json object")
+        try:
+            self._payload = _b64decode(claims_segment)
+        except binascii.Error:
+            raise JWTError("Invalid payload padding")
+        try:
+            self.signature = _b64decode(crypto_segment)
+        except binascii.Error:
+            raise JWTError("Invalid crypto padding")
+        self.header: Mapping[str, Any] = header
+        self.signing_input = signing_input
+        self._claims: Optional[dict[str, Any]] = None
+
+    @property
+    def claims(self) -> dict[str, Any]:
+        """The payload claims, parsed on first access.
+
+        Raises:
+            JWTError: If the payload is not a JSON object.
+        """
+        if self._claims is None:
+            try:
+                claims = json.loads(self._payload)
+            except ValueError as err:
+                raise JWTError(f"Invalid payload string: {err}")
+            if not isinstance(claims, dict):
+                raise JWTError("Invalid payload string: must be a json object")
+            self._claims = claims
+        return self._claims
+
+
+class KeyIndex:
+    """Verification keys of one JWKS, indexed by ``kid``.
+
+    Accepts the same key formats as ``jose.jwt.decode``: a JWKS, a single JWK,
+    a PEM string or a list of those. Key objects are constructed lazily, once
+    per key and algorithm, and reused for every token verified against this
+    index, so an index should live as long as the JWKS it was built from.
+
+    Candidate keys for a token are those whose ``kid`` matches the token's plus
+    any keys without a ``kid``; tokens without a ``kid`` are tried against all
+    keys. JWKs whose ``kty`` cannot verify the token's algorithm are skipped.
+    """
+
+    def __init__(self, keys: Any):
+        if isinstance(keys, Key):
+            entries: Iterable[Any] = (keys,)
+        elif isinstance(keys, Mapping):
+            if "keys" in keys:
+                entries = keys["keys"]
+            elif "kty" in keys:
+                entries = (keys,)
+            else:
+                entries = keys.values() or (keys,)
+        elif isinstance(keys, Iterable) and not isinstance(keys, (str, bytes)):
+            entries = keys
+        else:
+            entries = (keys,)
+        self._keys = list(entries)
+        self._by_kid: dict[str, list[int]] = {}
+        self._without_kid: list[int] = []
+        for position, key in enumerate(self._keys):
+            kid = key.get("kid") if isinstance(key, Mapping) else None
+            if isinstance(kid, str):
+                self._by_kid.setdefault(kid, []).append(position)
+            else:
+                self._without_kid.append(position)
+        self._constructed: dict[tuple[int, str], Optional[Key]] = {}
+
+    def candidates(self, kid: Any) -> list[int]:
+        """Return positions of the keys a token with ``kid`` may be signed by."""
+        if isinstance(kid, str):
+            return self._by_kid.get(kid, []) + self._without_kid
+        return list(range(len(self._keys)))
+
+    def key(self, position: int, algorithm: str) -> Optional[Key]:
+        """Return the key at ``position`` for ``algorithm``, or None if unusable."""
+        cache_key = (position, algorithm)
+        try:
+            return self._constructed[cache_key]
+        except KeyError:
+            pass
+        data = self._keys[position]
+        key: Optional[Key] = None
+        if isinstance(data, Key):
+            key = data
+        elif isinstance(data, Mapping) and data.get("kty") != _KEY_TYPES.get(
+            algorithm[:2], data.get("kty")
+        ):
+            # e.g. an EC key in the JWKS of a provider also signing RS256
+            key = None
+        else:
+            try:
+                key = jwk.construct(data, algorithm)
+            except (JWKError, TypeError, ValueError):
+                key = None
+        # Racing threads may both construct a key; either result is valid.
+        self._constructed[cache_key] = key
+        return key
+
+    def verify(self, token: ParsedToken, algorithms: Iterable[str]) -> None:
+        """Check the token's signature against the candidate keys.
+
+        Raises:
+            JWTError: If the algorithm is missing or not allowed, or no
+                candidate key verifies the signature.
+        """
+        algorithm = token.header.get("alg")
+        if not algorithm:
+            raise JWTError("No algorithm was specified in the JWS header.")
+        if algorithm not in algorithms:
+            raise JWTError("The specified alg value is not allowed")
+        for position in self.candidates(token.header.get("kid")):
+            key = self.key(position, algorithm)
+            try:
+                if key is not None and key.verify(token.signing_input, token.signature):
+                    return
+            except Exception:  # nosec B112 - as jose, a failing key is a mismatch
+                continue
+        raise JWTError("Signature verification failed.")
+
+
+def _numeric_date(claims: Mapping[str, Any], name: str, message: str) -> int:
+    try:
+        return int(claims[name])
+    except (TypeError, ValueError):
+        raise JWTClaimsError(message)
+
+
+def validate_claims(
+    claims: Mapping[str, Any],
+    *,
+    audience: str | Collection[str],
+    issuer: str | Collection[str],
+    leeway: int = 0,
+    now: Optional[float] = None,
+) -> None:
+    """Validate registered claims the way ``jose.jwt.decode`` does by default.
+
+    ``aud`` is only checked when present, as in jose, and must contain one of
+    the accepted audiences. ``at_hash`` is not checked. ``exp`` and ``nbf`` are
+    checked against ``now``, the current time unless given.
+
+    Raises:
+        ExpiredSignatureError: If ``exp`` has passed.
+        JWTClaimsError: If any other claim is invalid.
+    """
+    now = int(time.time() if now is None else now)
+    if "iat" in claims:
+        _numeric_date(claims, "iat", "Issued At claim (iat) must be an integer.")
+    if "nbf" in claims:
+        nbf = _numeric_date(claims, "nbf", "Not Before claim (nbf) must be an integer.")
+        if nbf > now + leeway:
+            raise JWTClaimsError("The token is not yet valid (nbf)")
+    if "exp" in claims:
+        exp = _numeric_date(
+            claims, "exp", "Expiration Time claim (exp) must be an integer."
+        )
+        if exp < now - leeway:
+            raise ExpiredSignatureError("Signature has expired.")
+    if "aud" in claims:
+        audiences = claims["aud"]
+        if isinstance(audiences, str):
+            audiences = [audiences]
+        if not isinstance(audiences, list) or not all(
+            isinstance(aud, str) for aud in audiences
+        ):
+            raise JWTClaimsError("Invalid claim format in token")
+        accepted = (audience,) if isinstance(audience, str) else audience
+        if not any(aud in accepted for aud in audiences):
+            raise JWTClaimsError("Invalid audience")
+    issuers = (issuer,) if isinstance(issuer, str) else issuer
+    # Checked first: an unhashable iss cannot be looked up in a set of issuers
+    iss = claims.get("iss")
+    if not isinstance(iss, str) or iss not in issuers:
+        raise JWTClaimsError("Invalid issuer")
+    if "sub" in claims and not isinstance(claims["sub"], str):
+        raise JWTClaimsError("Subject must be a string.")
+    if "jti" in claims and not isinstance(claims["jti"], str):
+        raise JWTClaimsError("JWT ID must be a string.")
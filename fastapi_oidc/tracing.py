@@ -0,0 +1,243 @@
+"""
+Per-phase tracing of ``authenticate_user``.
+
+``authenticate_user`` runs in five phases: ``extract`` (splitting the header
+and checking the rejected-token cache), ``discovery``, ``public_keys``,
+``decode`` (signature and claims verification) and ``validate`` (building the
+token model). Pass an ``AuthTracer`` to ``get_auth(tracer=...)`` to receive the
+duration and attributes of each phase:
+
+- ``cache_hit`` on ``discovery`` and ``public_keys``: whether the document came
+  from the cache (``False`` if it had to be fetched).
+- ``kid`` and ``alg`` on ``decode``: from the token header.
+- ``error`` on the phase that raised, if any.
+
+Sampling is decided once per call. Untraced calls, whether no tracer is
+configured or the call was not sampled, only pay one ``is not None`` check per
+phase.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.tracing import CallbackTracer, OpenTelemetryTracer
+
+    def record(phase, seconds, attributes):
+        metrics.histogram(f"auth.{phase}", seconds)
+
+    authenticate_user = get_auth(..., tracer=CallbackTracer(record, sample_rate=0.1))
+
+    # Or, with ``pip install fastapi-oidc[opentelemetry]``:
+    authenticate_user = get_auth(..., tracer=OpenTelemetryTracer())
+"""
+
+import abc
+import random
+import time
+from typing import Any
+from typing import Callable
+from typing import Optional
+
+#: Phases of ``authenticate_user`` in the order they run.
+PHASES = ("extract", "discovery", "public_keys", "decode", "validate")
+
+#: Phases served from the discovery cache, traced with a ``cache_hit`` attribute.
+CACHED_PHASES = frozenset({"discovery", "public_keys"})
+
+
+class AuthTrace(abc.ABC):
+    """Timing of one traced ``authenticate_user`` call.
+
+    A phase starts when the previous one was marked (or when the trace was
+    created) and ends when :meth:`mark` is called with its name. Subclasses
+    implement :meth:`on_phase` and optionally :meth:`on_finish`.
+
+    Args:
+        fetch_count: Returns how many discovery or JWKS fetches the current
+            thread has made, used to tell cache hits from misses.
+    """
+
+    def __init__(self, fetch_count: Optional[Callable[[], int]] = None):
+        self.started_ns = self._last_ns = time.time_ns()
+        self._fetch_count = fetch_count
+        self._fetches = fetch_count() if fetch_count is not None else 0
+        self._next_phase = 0
+
+    def mark(self, phase: str, **attributes: Any) -> None:
+        """End ``phase`` now and report it with ``attributes``."""
+        now = time.time_ns()
+        if phase in CACHED_PHASES and self._fetch_count is not None:
+            fetches = self._fetch_count()
+            attributes["cache_hit"] = fetches == self._fetches
+            self._fetches = fetches
+        self.on_phase(phase, self._last_ns, now, attributes)
+        self._last_ns = now
+        self._next_phase = PHASES.index(phase) + 1
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """End the trace, reporting the phase in progress as failed on error."""
+        if error is not None and self._next_phase < len(PHASES):
+            self.mark(PHASES[self._next_phase], error=_describe(error))
+        self.on_finish(time.time_ns(), error)
+
+    @abc.abstractmethod
+    def on_phase(
+        self, phase: str, start_ns: int, end_ns: int, attributes: dict[str, Any]
+    ) -> None:
+        """Called with the wall clock start and end of each completed phase."""
+
+    def on_finish(self, end_ns: int, error: Optional[BaseException]) -> None:
+        """Called once when ``authenticate_user`` returns or raises."""
+
+
+class AuthTracer(abc.ABC):
+    """Creates an ``AuthTrace`` for the sampled ``authenticate_user`` calls.
+
+    Subclasses implement :meth:`new_trace`.
+
+    Args:
+        sample_rate: Fraction of calls to trace, between 0 and 1.
+    """
+
+    def __init__(self, *, sample_rate: float = 1.0):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+        self.sample_rate = sample_rate
+
+    def start(
+        self, fetch_count: Optional[Callable[[], int]] = None
+    ) -> Optional[AuthTrace]:
+        """Return a trace for this call, or ``None`` if it is not sampled."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:  # nosec
+            return None
+        return self.new_trace(fetch_count)
+
+    @abc.abstractmethod
+    def new_trace(self, fetch_count: Optional[Callable[[], int]]) -> AuthTrace:
+        """Return a new trace; ``start`` has already decided to sample."""
+
+
+class CallbackTracer(AuthTracer):
+    """Reports phase timings to plain callbacks, e.g. to feed metrics.
+
+    Args:
+        on_phase: Called as ``on_phase(phase, seconds, attributes)`` for each
+            completed phase.
+        on_finish: Called as ``on_finish(seconds, error)`` with the duration of
+            the whole call and the exception it raised, if any.
+        sample_rate: Fraction of calls to trace, between 0 and 1.
+    """
+
+    def __init__(
+        self,
+        on_phase: Callable[[str, float, dict[str, Any]], None],
+        *,
+        on_finish: Optional[Callable[[float, Optional[BaseException]], None]] = None,
+        sample_rate: float = 1.0,
+    ):
+        super().__init__(sample_rate=sample_rate)
+        self.on_phase = on_phase
+        self.on_finish = on_finish
+
+    def new_trace(self, fetch_count: Optional[Callable[[], int]]) -> AuthTrace:
+        return _CallbackTrace(self, fetch_count)
+
+
+class _CallbackTrace(AuthTrace):
+    def __init__(
+        self, tracer: CallbackTracer, fetch_count: Optional[Callable[[], int]]
+    ):
+        super().__init__(fetch_count)
+        self.tracer = tracer
+
+    def on_phase(
+        self, phase: str, start_ns: int, end_ns: int, attributes: dict[str, Any]
+    ) -> None:
+        self.tracer.on_phase(phase, (end_ns - start_ns) / 1e9, attributes)
+
+    def on_finish(self, end_ns: int, error: Optional[BaseException]) -> None:
+        if self.tracer.on_finish is not None:
+            self.tracer.on_finish((end_ns - self.started_ns) / 1e9, error)
+
+
+class OpenTelemetryTracer(AuthTracer):
+    """Records each call as an OpenTelemetry span with one child span per phase.
+
+    Requires the ``opentelemetry-api`` package (``pip install
+    fastapi-oidc[opentelemetry]``). Spans are parented to the span current
+    when ``authenticate_user`` is called, e.g. the request span of an
+    instrumented FastAPI app. Phase attributes are prefixed with
+    ``fastapi_oidc.``.
+
+    Args:
+        tracer: The OpenTelemetry tracer to use. Defaults to
+            ``trace.get_tracer("fastapi_oidc")``.
+        span_name: Name of the span covering the whole call.
+        sample_rate: Fraction of calls to trace, between 0 and 1. This sampling
+            happens before any span is created and in addition to the
+            OpenTelemetry SDK's own sampler.
+    """
+
+    def __init__(
+        self,
+        tracer: Any = None,
+        *,
+        span_name: str = "fastapi_oidc.authenticate_user",
+        sample_rate: float = 1.0,
+    ):
+        super().__init__(sample_rate=sample_rate)
+        try:
+            from opentelemetry import trace
+        except ImportError as err:  # pragma: no cover - depends on environment
+            raise ImportError(
+                "OpenTelemetryTracer requires opentelemetry-api. "
+                "Install it with `pip install fastapi-oidc[opentelemetry]`."
+            ) from err
+        self._trace = trace
+        self.tracer = tracer if tracer is not None else trace.get_tracer("fastapi_oidc")
+        self.span_name = span_name
+
+    def new_trace(self, fetch_count: Optional[Callable[[], int]]) -> AuthTrace:
+        return _OpenTelemetryTrace(self, fetch_count)
+
+
+class _OpenTelemetryTrace(AuthTrace):
+    def __init__(
+        self, tracer: OpenTelemetryTracer, fetch_count: Optional[Callable[[], int]]
+    ):
+        super().__init__(fetch_count)
+        self.tracer = tracer
+        self.span = tracer.tracer.start_span(
+            tracer.span_name, start_time=self.started_ns
+        )
+        self.context = tracer._trace.set_span_in_context(self.span)
+
+    def on_phase(
+        self, phase: str, start_ns: int, end_ns: int, attributes: dict[str, Any]
+    ) -> None:
+        span = self.tracer.tracer.start_span(
+            f"{self.tracer.span_name}.{phase}",
+            context=self.context,
+            start_time=start_ns,
+            attributes={
+                f"fastapi_oidc.{name}": value
+                for name, value in attributes.items()
+                if value is not None
+            },
+        )
+        if "error" in attributes:
+            span.set_status(self.tracer._trace.StatusCode.ERROR, attributes["error"])
+        span.end(end_time=end_ns)
+
+    def on_finish(self, end_ns: int, error: Optional[BaseException]) -> None:
+        if error is not None:
+            self.span.record_exception(error)
+            self.span.set_status(self.tracer._trace.StatusCode.ERROR, _describe(error))
+        self.span.end(end_time=end_ns)
+
+
+def _describe(error: BaseException) -> str:
+    # HTTPException keeps its message in detail and has an empty str()
+    return f"{type(error).__name__}: {getattr(error, 'detail', None) or error}"
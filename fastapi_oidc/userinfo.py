@@ -0,0 +1,301 @@
+"""
+Enrich verified ID tokens with claims from the IdP's userinfo endpoint.
+
+Profile claims that are not in the ID token can be requested from the
+``userinfo_endpoint`` of the discovery document, using the caller's access
+token. The discovery document comes from the cache of the ``get_auth`` instance
+wrapped, so it is not fetched twice. The dependencies built here call the
+endpoint through a pooled HTTP session, cache the response per subject for
+``cache_ttl`` seconds, and make concurrent requests about the same subject
+share one call. The result is the ID token model with the
+userinfo claims merged in; claims of the verified ID token win on conflicts.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import get_auth
+    from fastapi_oidc.userinfo import get_userinfo
+
+    authenticate_user = get_auth(**OIDC_config)
+    userinfo = get_userinfo(authenticate_user, access_token_header="X-Access-Token")
+
+    @app.get("/profile")
+    def profile(user: IDToken = Depends(userinfo)):
+        return {"name": user.name}
+"""
+
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Optional
+from typing import Type
+
+import requests
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from requests.adapters import HTTPAdapter
+
+from fastapi_oidc import discovery
+from fastapi_oidc.cache import StripedCache
+from fastapi_oidc.logout import RevocationIndex
+from fastapi_oidc.types import IDToken
+
+#: Largest userinfo response accepted, in bytes; bounds each cache entry.
+MAX_USERINFO_SIZE = 64 * 1024
+
+
+def _discovery_document(
+    authenticate_user: Callable[..., IDToken],
+    base_authorization_server_uri: Optional[str],
+    signature_cache_ttl: int,
+) -> Callable[[], dict[str, Any]]:
+    """Return how to get the discovery document ``authenticate_user`` uses."""
+    document = getattr(authenticate_user, "discovery_document", None)
+    if document is not None:
+        return document
+    if base_authorization_server_uri is None:
+        raise ValueError(
+            "base_authorization_server_uri is required unless authenticate_user "
+            "comes from get_auth"
+        )
+    discover = discovery.configure(cache_ttl=signature_cache_ttl)
+    return lambda: discover.auth_server(base_url=base_authorization_server_uri)
+
+
+class _UserinfoLookup:
+    """Fetches and caches userinfo responses; shared by both dependency variants."""
+
+    def __init__(
+        self,
+        *,
+        discovery_document: Callable[[], dict[str, Any]],
+        cache_ttl: float,
+        cache_size: int,
+        access_token_header: str,
+        claims_type: Optional[Type[IDToken]],
+        timeout: float,
+        pool_size: int,
+        revocation_index: Optional[RevocationIndex],
+    ):
+        self.discovery_document = discovery_document
+        self.cache: StripedCache[tuple[str, str], dict[str, Any]] = StripedCache(
+            maxsize=cache_size, ttl=cache_ttl, stripes=64
+        )
+        # (iss, sid) -> sub of cached entries, to evict them on session logout
+        self.sessions: StripedCache[tuple[str, str], str] = StripedCache(
+            maxsize=cache_size, ttl=cache_ttl
+        )
+        if revocation_index is not None:
+            revocation_index.add_listener(self.evict)
+        self.access_token_header = access_token_header
+        self.claims_type = claims_type
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount(
+            "https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        )
+        self.session.mount(
+            "http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        )
+
+    def cached(self, id_token: IDToken) -> Optional[IDToken]:
+        userinfo = self.cache.get((id_token.iss, id_token.sub))
+        if userinfo is None:
+            return None
+        self.remember_session(id_token)
+        return self.merge(id_token, userinfo)
+
+    def lookup(self, request: Request, id_token: IDToken) -> IDToken:
+        access_token = request.headers.get(self.access_token_header, "")
+        access_token = access_token.rpartition(" ")[2]
+        if not access_token:
+            raise HTTPException(
+                status_code=401,
+                detail=f"Unauthorized: missing access token in {self.access_token_header}",
+            )
+        userinfo = self.cache.get_or_load(
+            (id_token.iss, id_token.sub), lambda: self.fetch(access_token, id_token)
+        )
+        self.remember_session(id_token)
+        return self.merge(id_token, userinfo)
+
+    def remember_session(self, id_token: IDToken) -> None:
+        sid = getattr(id_token, "sid", None)
+        if isinstance(sid, str) and self.sessions.get((id_token.iss, sid)) is None:
+            self.sessions.set((id_token.iss, sid), id_token.sub)
+
+    def evict(self, issuer: str, sid: Optional[str], sub: Optional[str]) -> None:
+        """Drop the userinfo cached for a logged out session or user."""
+        if sid is not None:
+            sub = self.sessions.pop((issuer, sid)) or sub
+        if sub is not None:
+            self.cache.pop((issuer, sub))
+
+    def fetch(self, access_token: str, id_token: IDToken) -> dict[str, Any]:
+        try:
+            document = self.discovery_document()
+        except requests.RequestException as err:
+            raise HTTPException(
+                status_code=503, detail="Authorization server unavailable"
+            ) from err
+        endpoint = document.get("userinfo_endpoint")
+        if not endpoint:
+            raise HTTPException(
+                status_code=500,
+                detail="Authorization server has no userinfo_endpoint",
+            )
+
+        try:
+            response = self.session.get(
+                endpoint,
+                headers={"Authorization": f"Bearer {access_token}"},
+                timeout=self.timeout,
+                stream=True,
+            )
+        except requests.RequestException as err:
+            raise HTTPException(
+                status_code=503, detail="Userinfo endpoint unavailable"
+            ) from err
+        try:
+            if response.status_code in (401, 403):
+                raise HTTPException(
+                    status_code=401, detail="Unauthorized: userinfo request rejected"
+                )
+            response.raise_for_status()
+            userinfo = discovery.read_json(response, MAX_USERINFO_SIZE)
+        except (requests.RequestException, ValueError) as err:
+            raise HTTPException(
+                status_code=503, detail="Userinfo endpoint unavailable"
+            ) from err
+        finally:
+            response.close()
+
+        # OpenID Connect Core 5.3.2: the sub in the userinfo response MUST match
+        if not isinstance(userinfo, dict) or userinfo.get("sub") != id_token.sub:
+            raise HTTPException(
+                status_code=401,
+                detail="Unauthorized: userinfo subject does not match the ID token",
+            )
+        return userinfo
+
+    def merge(self, id_token: IDToken, userinfo: dict[str, Any]) -> IDToken:
+        claims_type = self.claims_type or type(id_token)
+        return claims_type.model_validate({**userinfo, **id_token.model_dump()})
+
+
+def get_userinfo(
+    authenticate_user: Callable[..., IDToken],
+    *,
+    base_authorization_server_uri: Optional[str] = None,
+    signature_cache_ttl: int = 3600,
+    cache_ttl: float = 300,
+    cache_size: int = 10000,
+    access_token_header: str = "Authorization",
+    claims_type: Optional[Type[IDToken]] = None,
+    timeout: float = 10,
+    pool_size: int = 32,
+    revocation_index: Optional[RevocationIndex] = None,
+) -> Callable[..., IDToken]:
+    """Return a dependency yielding the ID token merged with userinfo claims.
+
+    Args:
+        authenticate_user: The function returned by ``get_auth``.
+        base_authorization_server_uri: Same as for ``get_auth``; only needed
+            when ``authenticate_user`` was not returned by ``get_auth``, whose
+            cached discovery document is used to find the
+            ``userinfo_endpoint`` otherwise.
+        signature_cache_ttl: How many seconds to cache the discovery document
+            fetched for ``base_authorization_server_uri``.
+        cache_ttl: How many seconds to cache each subject's userinfo.
+        cache_size: Maximum number of subjects cached. Each entry holds at most
+            ``MAX_USERINFO_SIZE`` bytes of response.
+        access_token_header: Request header carrying the access token sent to
+            the userinfo endpoint. With the default, the bearer token that
+            ``authenticate_user`` verified is sent, which only works with
+            providers that accept it there; otherwise have clients send their
+            access token in a separate header.
+        claims_type: Model to return. Defaults to the type ``authenticate_user``
+            returns.
+        timeout: Timeout in seconds for userinfo requests.
+        pool_size: Connections kept open to the userinfo endpoint.
+        revocation_index: A ``fastapi_oidc.logout.RevocationIndex``; the
+            userinfo cached for a session or user is dropped when it logs out.
+
+    Returns:
+        func: userinfo(request, id_token) -> IDToken (or claims_type)
+
+    Raises:
+        ValueError: If ``authenticate_user`` was not returned by ``get_auth``
+            and no base_authorization_server_uri is given.
+
+    Raises (from the dependency):
+        HTTPException(401): If the access token is missing or rejected, or the
+            userinfo subject differs from the ID token's.
+        HTTPException(503): If the userinfo endpoint cannot be reached or its
+            response is larger than ``MAX_USERINFO_SIZE``.
+    """
+    lookup = _UserinfoLookup(
+        discovery_document=_discovery_document(
+            authenticate_user, base_authorization_server_uri, signature_cache_ttl
+        ),
+        cache_ttl=cache_ttl,
+        cache_size=cache_size,
+        access_token_header=access_token_header,
+        claims_type=claims_type,
+        timeout=timeout,
+        pool_size=pool_size,
+        revocation_index=revocation_index,
+    )
+
+    def userinfo(
+        request: Request, id_token: IDToken = Depends(authenticate_user)
+    ) -> IDToken:
+        return lookup.lookup(request, id_token)
+
+    return userinfo
+
+
+def get_userinfo_async(
+    authenticate_user: Callable[..., IDToken],
+    *,
+    base_authorization_server_uri: Optional[str] = None,
+    signature_cache_ttl: int = 3600,
+    cache_ttl: float = 300,
+    cache_size: int = 10000,
+    access_token_header: str = "Authorization",
+    claims_type: Optional[Type[IDToken]] = None,
+    timeout: float = 10,
+    pool_size: int = 32,
+    revocation_index: Optional[RevocationIndex] = None,
+) -> Callable[..., Awaitable[IDToken]]:
+    """Like :func:`get_userinfo`, returning an ``async`` dependency.
+
+    Cache hits are answered on the event loop; misses fetch userinfo in the
+    threadpool so the loop is never blocked on the IdP.
+    """
+    lookup = _UserinfoLookup(
+        discovery_document=_discovery_document(
+            authenticate_user, base_authorization_server_uri, signature_cache_ttl
+        ),
+        cache_ttl=cache_ttl,
+        cache_size=cache_size,
+        access_token_header=access_token_header,
+        claims_type=claims_type,
+        timeout=timeout,
+        pool_size=pool_size,
+        revocation_index=revocation_index,
+    )
+
+    async def userinfo(
+        request: Request, id_token: IDToken = Depends(authenticate_user)
+    ) -> IDToken:
+        cached = lookup.cached(id_token)
+        if cached is not None:
+            return cached
+        return await run_in_threadpool(lookup.lookup, request, id_token)
+
+    return userinfo
@@ -0,0 +1,255 @@
+"""
+A reusable, precompiled ID token verifier.
+
+``Verifier`` holds everything about token verification that is fixed once
+``get_auth`` has been called: the accepted issuers and audiences as frozensets,
+the clock leeway, pinned signing algorithms, the token model, the JWE
+decrypter and the compiled claim rules. Its key plan remembers the
+``KeyIndex`` built for the current JWKS and the algorithm set of the current
+discovery document, so verifying a token only does the parsing and
+cryptography the token itself requires.
+
+``get_auth`` builds one for its ``authenticate_user``; construct your own to
+verify tokens outside FastAPI, e.g. in queue workers or command line tools.
+
+Usage
+=====
+
+.. code-block:: python3
+
+    from fastapi_oidc import Verifier
+
+    verifier = Verifier.create(
+        issuer="https://auth.example.com",
+        audience="my-client-id",
+        algorithms=["RS256"],
+    )
+    id_token = verifier.decode(token, jwks)
+"""
+
+from collections.abc import Collection
+from collections.abc import Iterable
+from collections.abc import Mapping
+from collections.abc import Sequence
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Optional
+from typing import Type
+
+from jose.exceptions import JWTError
+
+from fastapi_oidc.jwe import JWEDecrypter
+from fastapi_oidc.jwe import is_encrypted
+from fastapi_oidc.rules import ClaimRule
+from fastapi_oidc.rules import Validator
+from fastapi_oidc.rules import compile_rules
+from fastapi_oidc.token import KeyIndex
+from fastapi_oidc.token import ParsedToken
+from fastapi_oidc.token import validate_claims
+from fastapi_oidc.types import IDToken
+
+
+class KeyPlan:
+    """The key index and algorithms derived from the latest JWKS and discovery.
+
+    Verifiers of the same provider can share one plan (see
+    ``fastapi_oidc.registry``), so its keys are built once for all of them.
+    Each slot holds ``(source, derived)`` and is replaced as a whole, so threads
+    racing on a refresh at worst both build the same value.
+    """
+
+    __slots__ = ("_index", "_algorithms")
+
+    def __init__(self) -> None:
+        self._index: Optional[tuple[Any, KeyIndex]] = None
+        self._algorithms: Optional[tuple[Any, frozenset[str]]] = None
+
+    def index(self, keys: Any) -> KeyIndex:
+        # The discovery cache hands out the same JWKS object until it is
+        # refreshed, so identity is enough to tell whether it changed
+        current = self._index
+        if current is None or current[0] is not keys:
+            current = self._index = (keys, KeyIndex(keys))
+        return current[1]
+
+    def algorithms(self, document: Mapping[str, Any]) -> frozenset[str]:
+        current = self._algorithms
+        if current is None or current[0] is not document:
+            algorithms = frozenset(document["id_token_signing_alg_values_supported"])
+            current = self._algorithms = (document, algorithms)
+        return current[1]
+
+
+@dataclass(frozen=True)
+class Verifier:
+    """Immutable token verification settings with a per-JWKS key plan.
+
+    Use :meth:`create` to build one from the same arguments ``get_auth``
+    takes. Instances are safe to share between threads.
+
+    Attributes:
+        issuers: Accepted values of the ``iss`` claim.
+        audiences: Accepted values of the ``aud`` claim (checked when present).
+        algorithms: Accepted signing algorithms, or ``None`` to accept those the
+            discovery document lists.
+        leeway: Seconds of clock skew tolerated for ``exp`` and ``nbf``.
+        token_type: Model :meth:`decode` returns.
+        decrypter: Decrypts nested JWE tokens, if the provider encrypts them.
+        claim_rules: Requirements on further claims, checked after the
+            registered claims.
+        key_plan: Keys built from the current JWKS; pass a shared one to
+            build them once for several verifiers of a provider.
+    """
+
+    issuers: frozenset[str]
+    audiences: frozenset[str]
+    algorithms: Optional[frozenset[str]] = None
+    leeway: int = 0
+    token_type: Type[IDToken] = IDToken
+    decrypter: Optional[JWEDecrypter] = None
+    claim_rules: tuple[ClaimRule, ...] = ()
+    key_plan: KeyPlan = field(default_factory=KeyPlan, repr=False, compare=False)
+    _check_rules: Optional[Validator] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        if self.claim_rules:
+            object.__setattr__(self, "_check_rules", compile_rules(self.claim_rules))
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Pickle the settings only; the copy compiles its own rules and builds
+        # its own key plan, e.g. in a worker process
+        return (
+            type(self),
+            (
+                self.issuers,
+                self.audiences,
+                self.algorithms,
+                self.leeway,
+                self.token_type,
+                self.decrypter,  # Rebuilt from its keys, see JWEDecrypter
+                self.claim_rules,
+            ),
+        )
+
+    @classmethod
+    def create(
+        cls,
+        *,
+        issuer: str | Iterable[str],
+        audience: str | Iterable[str],
+        algorithms: Optional[Iterable[str]] = None,
+        leeway: int = 0,
+        token_type: Type[IDToken] = IDToken,
+        decryption_keys: Sequence[Any] = (),
+        claim_rules: Iterable[ClaimRule] = (),
+        key_plan: Optional[KeyPlan] = None,
+    ) -> "Verifier":
+        """Normalize the arguments and build a verifier.
+
+        Args:
+            issuer: Accepted issuer, or an iterable of them.
+            audience: Accepted audience, or an iterable of them.
+            algorithms: Accepted signing algorithms. Defaults to None (those
+                listed by the discovery document passed to :meth:`verify`).
+            leeway: Seconds of clock skew tolerated.
+            token_type: Model returned by :meth:`decode`.
+            decryption_keys: Private keys for encrypted tokens, as for
+                ``JWEDecrypter``.
+            claim_rules: Requirements on further claims, see
+                ``fastapi_oidc.rules``.
+            key_plan: A key plan shared with other verifiers. Defaults to a
+                new one.
+        """
+        return cls(
+            issuers=frozenset((issuer,) if isinstance(issuer, str) else issuer),
+            audiences=frozenset((audience,) if isinstance(audience, str) else audience),
+            algorithms=frozenset(algorithms) if algorithms is not None else None,
+            leeway=leeway,
+            token_type=token_type,
+            decrypter=JWEDecrypter(decryption_keys) if decryption_keys else None,
+            claim_rules=tuple(claim_rules),
+            key_plan=key_plan if key_plan is not None else KeyPlan(),
+        )
+
+    def parse(self, id_token: str) -> ParsedToken:
+        """Split and decode a token, decrypting it first if it is a nested JWE.
+
+        Raises:
+            JWTError: If the token is malformed or cannot be decrypted.
+        """
+        if self.decrypter is not None and is_encrypted(id_token):
+            return ParsedToken(self.decrypter.decrypt(id_token))
+        return ParsedToken(id_token)
+
+    def key_index(self, keys: Any) -> KeyIndex:
+        """Return the ``KeyIndex`` for ``keys``, built once per JWKS object."""
+        return self.key_plan.index(keys)
+
+    def allowed_algorithms(
+        self, document: Optional[Mapping[str, Any]] = None
+    ) -> Collection[str]:
+        """Return the pinned algorithms, or those the discovery document lists.
+
+        Raises:
+            JWTError: If no algorithms are pinned and no document is given.
+        """
+        if self.algorithms is not None:
+            return self.algorithms
+        if document is None:
+            raise JWTError("No signing algorithms configured")
+        return self.key_plan.algorithms(document)
+
+    def verify(
+        self,
+        token: ParsedToken,
+        keys: Any,
+        document: Optional[Mapping[str, Any]] = None,
+        *,
+        now: Optional[float] = None,
+    ) -> dict[str, Any]:
+        """Check the signature, registered claims and claim rules.
+
+        Args:
+            token: The parsed token.
+            keys: The issuer's keys, in any format ``KeyIndex`` accepts.
+            document: The discovery document, when algorithms are not pinned.
+            now: Unix time to check ``exp``, ``nbf`` and time-based claim
+                rules against. Defaults to the current time.
+
+        Returns:
+            The token's claims.
+
+        Raises:
+            JWTError: If the signature or a claim is invalid.
+        """
+        self.key_plan.index(keys).verify(token, self.allowed_algorithms(document))
+        # at_hash is not checked since we aren't using the access token
+        validate_claims(
+            token.claims,
+            audience=self.audiences,
+            issuer=self.issuers,
+            leeway=self.leeway,
+            now=now,
+        )
+        if self._check_rules is not None:
+            self._check_rules(token.claims, now)
+        return token.claims
+
+    def decode(
+        self,
+        id_token: str,
+        keys: Any,
+        document: Optional[Mapping[str, Any]] = None,
+    ) -> IDToken:
+        """Parse, verify and validate ``id_token`` into :attr:`token_type`.
+
+        Raises:
+            JWTError: If the token is malformed or invalid.
+            pydantic.ValidationError: If the claims do not fit the token model.
+        """
+        return self.token_type.model_validate(
+            self.verify(self.parse(id_token), keys, document)
+        )
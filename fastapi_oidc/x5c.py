@@ -0,0 +1,205 @@
+"""
+Validation of the ``x5c`` certificate chains of JWKS keys against pinned CAs.
+
+Some providers publish their signing keys with an ``x5c`` certificate chain,
+and deployments may be required to accept only keys certified by their own
+CA. ``TrustStore`` checks each key's chain: the leaf certificate must hold
+the key itself (and match ``x5t``/``x5t#S256`` when given), every certificate
+must be issued by the next one, issuers must be CAs, all must be valid now,
+and the chain must end at or be issued by one of the trust anchors.
+
+``discovery.configure(trust_anchors=...)`` (``get_auth(x5c_trust_anchors=...)``)
+filters every fetched JWKS down to the keys passing these checks. It does so
+once per fetched JWKS and again only when one of the certificates expires or
+becomes valid. The filtered JWKS is a new object only then, so the built keys
+cached for it by ``KeyPlan`` are reused in between and verifying a token stays
+a dict lookup.
+
+Name constraints, path length constraints, key usage and revocation are not
+checked.
+"""
+
+import base64
+import binascii
+import datetime
+import hashlib
+import logging
+import math
+from collections.abc import Iterable
+from collections.abc import Mapping
+from typing import Any
+from typing import Optional
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+logger = logging.getLogger(__name__)
+
+#: Longest ``x5c`` chain accepted.
+MAX_CHAIN_LENGTH = 8
+
+
+class CertificateChainError(ValueError):
+    """Raised when a key's ``x5c`` chain does not validate."""
+
+
+def _b64url_int(value: Any) -> Optional[int]:
+    if not isinstance(value, str):
+        return None
+    try:
+        data = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+    except (binascii.Error, ValueError):
+        return None
+    return int.from_bytes(data, "big")
+
+
+def _holds_key(certificate: x509.Certificate, jwk: Mapping[str, Any]) -> bool:
+    public_key = certificate.public_key()
+    if isinstance(public_key, rsa.RSAPublicKey) and jwk.get("kty") == "RSA":
+        rsa_numbers = public_key.public_numbers()
+        return (_b64url_int(jwk.get("n")), _b64url_int(jwk.get("e"))) == (
+            rsa_numbers.n,
+            rsa_numbers.e,
+        )
+    if isinstance(public_key, ec.EllipticCurvePublicKey) and jwk.get("kty") == "EC":
+        ec_numbers = public_key.public_numbers()
+        return (_b64url_int(jwk.get("x")), _b64url_int(jwk.get("y"))) == (
+            ec_numbers.x,
+            ec_numbers.y,
+        )
+    return False
+
+
+def _thumbprint(der: bytes, algorithm: str) -> str:
+    digest = hashlib.new(algorithm, der).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def _is_ca(certificate: x509.Certificate) -> bool:
+    try:
+        constraints = certificate.extensions.get_extension_for_class(
+            x509.BasicConstraints
+        )
+    except x509.ExtensionNotFound:
+        return False
+    return constraints.value.ca
+
+
+def _issued_by(certificate: x509.Certificate, issuer: x509.Certificate) -> bool:
+    try:
+        certificate.verify_directly_issued_by(issuer)
+    except (ValueError, TypeError, InvalidSignature):
+        return False
+    return True
+
+
+class TrustStore:
+    """Pinned CA certificates that ``x5c`` chains must lead to.
+
+    Args:
+        anchors: PEM encoded CA certificates; each item may hold several.
+    """
+
+    def __init__(self, anchors: Iterable[str | bytes]):
+        self._anchors: dict[x509.Name, list[x509.Certificate]] = {}
+        self._anchor_ders: set[bytes] = set()
+        for pem in anchors:
+            data = pem.encode("ascii") if isinstance(pem, str) else pem
+            for certificate in x509.load_pem_x509_certificates(data):
+                self._anchors.setdefault(certificate.subject, []).append(certificate)
+                self._anchor_ders.add(
+                    certificate.public_bytes(serialization.Encoding.DER)
+                )
+        if not self._anchor_ders:
+            raise ValueError("At least one trust anchor certificate is required")
+
+    def validate(
+        self, jwk: Mapping[str, Any], now: datetime.datetime
+    ) -> tuple[datetime.datetime, datetime.datetime]:
+        """Check the ``x5c`` chain of ``jwk`` at ``now``.
+
+        Returns:
+            The window in which the whole chain is valid, as
+            ``(not_before, not_after)``.
+
+        Raises:
+            CertificateChainError: If the chain is missing or invalid.
+        """
+        encoded = jwk.get("x5c")
+        if not isinstance(encoded, list) or not encoded:
+            raise CertificateChainError("Key has no x5c chain")
+        if len(encoded) > MAX_CHAIN_LENGTH:
+            raise CertificateChainError("x5c chain too long")
+        try:
+            ders = [base64.b64decode(item, validate=True) for item in encoded]
+            chain = [x509.load_der_x509_certificate(der) for der in ders]
+        except (TypeError, ValueError, binascii.Error):
+            raise CertificateChainError("Invalid x5c certificate")
+
+        leaf = chain[0]
+        if not _holds_key(leaf, jwk):
+            raise CertificateChainError("x5c certificate does not hold the key")
+        for member, algorithm in (("x5t", "sha1"), ("x5t#S256", "sha256")):
+            if member in jwk and jwk[member] != _thumbprint(ders[0], algorithm):
+                raise CertificateChainError(f"{member} does not match x5c")
+
+        for certificate, issuer in zip(chain, chain[1:]):
+            if not _is_ca(issuer) or not _issued_by(certificate, issuer):
+                raise CertificateChainError("x5c chain is broken")
+        top = chain[-1]
+        if ders[-1] not in self._anchor_ders:
+            issuers = self._anchors.get(top.issuer, [])
+            anchor = next((ca for ca in issuers if _issued_by(top, ca)), None)
+            if anchor is None:
+                raise CertificateChainError("x5c chain is not issued by a trust anchor")
+            chain.append(anchor)
+
+        not_before = max(c.not_valid_before_utc for c in chain)
+        not_after = min(c.not_valid_after_utc for c in chain)
+        if not not_before <= now <= not_after:
+            raise CertificateChainError("x5c chain is expired or not yet valid")
+        return not_before, not_after
+
+
+def trusted_keys(
+    jwks: Mapping[str, Any], trust_store: TrustStore, now: float
+) -> tuple[dict[str, Any], float]:
+    """Return ``jwks`` without the keys whose ``x5c`` chain does not validate.
+
+    Args:
+        jwks: The fetched JWKS.
+        trust_store: The pinned CAs.
+        now: The current time, in seconds since the epoch.
+
+    Returns:
+        The filtered JWKS and the time at which it must be filtered again
+        because a certificate expires or becomes valid.
+    """
+    moment = datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+    recheck_at = math.inf
+    kept = []
+    for jwk in jwks.get("keys", []):
+        if not isinstance(jwk, Mapping):
+            continue
+        try:
+            _, not_after = trust_store.validate(jwk, moment)
+        except CertificateChainError as err:
+            logger.warning("Ignoring key %s: %s", jwk.get("kid"), err)
+            # A chain that is not valid yet may become so
+            recheck_at = min(recheck_at, _not_yet_valid_until(jwk, moment))
+            continue
+        kept.append(jwk)
+        recheck_at = min(recheck_at, not_after.timestamp())
+    return {**jwks, "keys": kept}, recheck_at
+
+
+def _not_yet_valid_until(jwk: Mapping[str, Any], now: datetime.datetime) -> float:
+    try:
+        leaf = x509.load_der_x509_certificate(base64.b64decode(jwk["x5c"][0]))
+    except (KeyError, IndexError, TypeError, ValueError, binascii.Error):
+        return math.inf
+    not_before = leaf.not_valid_before_utc
+    return not_before.timestamp() if not_before > now else math.inf
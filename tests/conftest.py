@@ -9,6 +9,10 @@ from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 
+# Registered through the pytest11 entry point when the package is installed;
+# listed here too so the suite also runs from a plain checkout.
+pytest_plugins = ["fastapi_oidc.pytest_plugin"]
+
 FIXTURES_DIRECTORY = Path(__file__).parent / "fixtures"
 
 
@@ -1,7 +1,11 @@
 # type: ignore
+from unittest.mock import Mock
+
 import pytest
+from fastapi import HTTPException
 
 from fastapi_oidc import auth
+from fastapi_oidc import verifier
 from fastapi_oidc.exceptions import TokenSpecificationError
 from fastapi_oidc.types import IDToken
 
@@ -69,3 +73,36 @@ def test__authenticate_user_returns_custom_tokens(
     custom_token: CustomToken = authenticate_user(auth_header=f"Bearer {token}")
 
     assert custom_token.custom_field == "OnlySlightlyBent"
+
+
+def test__authenticate_user_remembers_rejected_tokens(
+    monkeypatch, mock_discovery, no_audience_config
+):
+    monkeypatch.setattr(auth.discovery, "configure", mock_discovery)
+    parse = Mock(wraps=verifier.ParsedToken)
+    monkeypatch.setattr(verifier, "ParsedToken", parse)
+
+    authenticate_user = auth.get_auth(
+        **no_audience_config, rejected_token_cache_size=10
+    )
+
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc_info:
+            authenticate_user(auth_header="Bearer not.a.token")
+        assert exc_info.value.status_code == 401
+        assert exc_info.value.detail.startswith("Unauthorized: ")
+
+    assert parse.call_count == 1
+
+
+def test__authenticate_user_does_not_remember_valid_tokens(
+    monkeypatch, mock_discovery, token_without_audience, no_audience_config
+):
+    monkeypatch.setattr(auth.discovery, "configure", mock_discovery)
+
+    authenticate_user = auth.get_auth(
+        **no_audience_config, rejected_token_cache_size=10
+    )
+
+    for _ in range(2):
+        assert authenticate_user(auth_header=f"Bearer {token_without_audience}")
@@ -0,0 +1,146 @@
+"""Tests for the thread-safe striped cache."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from fastapi_oidc import discovery
+from fastapi_oidc.cache import StripedCache
+from fastapi_oidc.testing import json_response
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = StripedCache(maxsize=4, ttl=10, clock=clock)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.get_or_load("a", lambda: 2) == 2
+
+
+def test_oldest_entries_are_evicted_first():
+    cache = StripedCache(maxsize=3)
+    for key in "abc":
+        cache.set(key, key)
+    cache.set("a", "refreshed")
+    cache.set("d", "d")
+
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["refreshed", "c", "d"]
+
+
+def test_expired_entries_are_evicted_before_live_ones():
+    clock = FakeClock()
+    cache = StripedCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("old", 1)
+    clock.now = 5
+    cache.set("live", 2)
+    clock.now = 11
+    cache.set("new", 3)
+
+    assert cache.get("live") == 2
+    assert cache.get("new") == 3
+    assert cache.pop("old") is None
+
+
+def test_failed_loads_store_nothing():
+    cache = StripedCache(maxsize=2)
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("a", Mock(side_effect=RuntimeError))
+    assert len(cache) == 0
+
+
+def test_concurrent_misses_load_once():
+    cache = StripedCache(maxsize=8)
+    started = threading.Event()
+
+    def slow_load():
+        started.wait(1)
+        return "value"
+
+    load = Mock(side_effect=slow_load)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        futures = [pool.submit(cache.get_or_load, "k", load) for _ in range(16)]
+        time.sleep(0.05)
+        started.set()
+        assert {future.result() for future in futures} == {"value"}
+
+    assert load.call_count == 1
+
+
+def test_discovery_fetches_once_under_concurrency():
+    def slow_get(*_, **__):
+        time.sleep(0.05)
+        return json_response({"keys": [{"kty": "RSA"}]})
+
+    with patch("requests.get", side_effect=slow_get) as mock_get:
+        discover = discovery.configure(cache_ttl=60)
+        spec = {"jwks_uri": "https://idp/keys"}
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(lambda _: discover.public_keys(spec), range(64)))
+
+    assert all(result == {"keys": [{"kty": "RSA"}]} for result in results)
+    assert mock_get.call_count == 1
+
+
+def test_maxsize_is_validated():
+    with pytest.raises(ValueError):
+        StripedCache(maxsize=0)
+
+
+def test_slow_loads_do_not_block_other_keys():
+    cache = StripedCache(maxsize=8, stripes=1)
+    release = threading.Event()
+
+    def slow_load():
+        release.wait(5)
+        return "slow"
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        slow = pool.submit(cache.get_or_load, "a", slow_load)
+        while not cache._loading:
+            time.sleep(0.001)
+
+        assert cache.get_or_load("b", lambda: "fast") == "fast"
+        release.set()
+        assert slow.result() == "slow"
+    assert not cache._loading
+
+
+def test_waiters_share_a_failed_load():
+    cache = StripedCache(maxsize=8)
+    release = threading.Event()
+
+    def failing_load():
+        release.wait(5)
+        raise RuntimeError("down")
+
+    load = Mock(side_effect=failing_load)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(cache.get_or_load, "k", load) for _ in range(4)]
+        while not cache._loading:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        errors = [future.exception() for future in futures]
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert load.call_count == 1
+    assert len(cache) == 0
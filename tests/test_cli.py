@@ -0,0 +1,225 @@
+"""Tests for the bulk verification command line tool."""
+
+import datetime
+import io
+import json
+import pickle
+import subprocess
+import sys
+import time
+
+import pytest
+
+from fastapi_oidc import Verifier
+from fastapi_oidc import cli
+from fastapi_oidc.rules import Equals
+from fastapi_oidc.testing import FakeIdP
+
+SECRET = b"0123456789abcdef0123456789abcdef"
+
+
+@pytest.fixture
+def idp():
+    return FakeIdP()
+
+
+@pytest.fixture
+def jwks_file(tmp_path, idp):
+    path = tmp_path / "jwks.json"
+    path.write_text(json.dumps(idp.jwks()))
+    return path
+
+
+def run(argv, stdin=""):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    args = cli._parser().parse_args(argv)
+    original_stdin = sys.stdin
+    sys.stdin = io.StringIO(stdin)
+    try:
+        status = cli.run_verify(args, stdout, stderr)
+    finally:
+        sys.stdin = original_stdin
+    results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    return status, results, stderr.getvalue()
+
+
+def test_read_tokens_accepts_plain_and_json_lines():
+    lines = ["tok1\n", "\n", "Bearer tok2\n", '{"token": "tok3"}\n', "{oops\n", "{}"]
+
+    assert list(cli.read_tokens(lines, "token")) == [
+        (1, "tok1", None),
+        (3, "tok2", None),
+        (4, "tok3", None),
+        (5, None, "Invalid JSON"),
+        (6, None, "No token field"),
+    ]
+
+
+def test_verify_against_jwks_file(tmp_path, idp, jwks_file):
+    tokens = tmp_path / "tokens.txt"
+    tokens.write_text(
+        "\n".join([idp.mint(sub="a"), idp.mint(sub="b", aud="other"), "garbage", ""])
+    )
+
+    status, results, summary = run(
+        [
+            "verify",
+            str(tokens),
+            "--jwks",
+            str(jwks_file),
+            "--issuer",
+            idp.issuer,
+            "--audience",
+            idp.client_id,
+            "--workers",
+            "1",
+        ]
+    )
+
+    assert status == 1
+    assert [r["line"] for r in results] == [1, 2, 3]
+    assert results[0]["valid"] and results[0]["sub"] == "a"
+    assert results[0]["kid"] == idp.keys[0].kid
+    assert results[1] == {
+        "line": 2,
+        "kid": idp.keys[0].kid,
+        "valid": False,
+        "error": "Invalid audience",
+    }
+    assert results[2]["error"] == "Not enough segments"
+    assert "verified 3 tokens" in summary and "1 valid, 2 invalid" in summary
+
+
+def test_verify_jsonl_from_stdin_with_discovered_keys(idp):
+    stdin = "".join(
+        json.dumps({"token": idp.mint(sub=str(n))}) + "\n" for n in range(5)
+    )
+
+    with idp:
+        status, results, _ = run(
+            [
+                "verify",
+                "--server",
+                idp.issuer,
+                "--audience",
+                idp.client_id,
+                "--field",
+                "token",
+                "--workers",
+                "1",
+                "--chunk-size",
+                "2",
+            ],
+            stdin=stdin,
+        )
+
+    assert status == 0
+    assert [r["sub"] for r in results] == ["0", "1", "2", "3", "4"]
+
+
+def test_process_pool_keeps_input_order(idp):
+    verifier = Verifier.create(
+        issuer=idp.issuer, audience=idp.client_id, algorithms=["RS256"]
+    )
+    items = [(n, idp.mint(sub=str(n)), None) for n in range(1, 41)]
+
+    results = [
+        result
+        for chunk in cli.verify_stream(
+            items,
+            verifier,
+            idp.jwks(),
+            workers=2,
+            chunk_size=3,
+            max_chunks_in_flight=2,
+        )
+        for result in chunk
+    ]
+
+    assert [r["line"] for r in results] == list(range(1, 41))
+    assert all(r["valid"] for r in results)
+
+
+def test_verifiers_with_rules_can_be_pickled():
+    verifier = Verifier.create(
+        issuer="https://a", audience="b", claim_rules=[Equals("tid", "t")]
+    )
+
+    copy = pickle.loads(pickle.dumps(verifier))
+
+    assert copy == verifier
+    assert copy._check_rules is not None
+
+
+def test_verifiers_with_decryption_keys_can_be_pickled(idp):
+    verifier = Verifier.create(
+        issuer=idp.issuer, audience=idp.client_id, decryption_keys=[SECRET]
+    )
+    token = idp.encrypt(idp.mint(), SECRET, algorithm="dir")
+    verifier.parse(token)
+
+    copy = pickle.loads(pickle.dumps(verifier))
+
+    assert copy.parse(token).claims["sub"] == "test-subject"
+
+
+def test_expiry_is_checked_at_the_given_time(idp, jwks_file):
+    issued = int(time.time()) - 7200
+    token = idp.mint(iat=issued, nbf=issued, exp=issued + 3600)
+    argv = [
+        "verify",
+        "--jwks",
+        str(jwks_file),
+        "--issuer",
+        idp.issuer,
+        "--audience",
+        idp.client_id,
+        "--workers",
+        "1",
+    ]
+    at = datetime.datetime.fromtimestamp(issued + 60, datetime.timezone.utc)
+
+    assert run(argv, stdin=token)[1][0]["error"] == "Signature has expired."
+    for value in (str(issued + 60), at.strftime("%Y-%m-%dT%H:%M:%SZ")):
+        assert run([*argv, "--at", value], stdin=token)[1][0]["valid"]
+    assert not run([*argv, "--at", str(issued - 60)], stdin=token)[1][0]["valid"]
+    with pytest.raises(SystemExit):
+        cli._parser().parse_args([*argv, "--at", "yesterday"])
+
+
+def test_usage_errors(tmp_path, jwks_file):
+    status, _, error = run(["verify", "--jwks", str(jwks_file), "--audience", "a"])
+    assert status == 2 and "--issuer is required" in error
+
+    status, _, error = run(
+        ["verify", "--jwks", str(tmp_path / "missing.json"), "--audience", "a"]
+    )
+    assert status == 2 and "cannot load keys" in error
+
+    assert cli.main(["verify", "--jwks", "x", "--audience", "a", "--workers", "0"])
+
+
+def test_module_entry_point(tmp_path, idp, jwks_file):
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "fastapi_oidc",
+            "verify",
+            "--jwks",
+            str(jwks_file),
+            "--issuer",
+            idp.issuer,
+            "--audience",
+            idp.client_id,
+            "--workers",
+            "1",
+        ],
+        input=idp.mint() + "\n",
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+    assert completed.returncode == 0, completed.stderr
+    assert json.loads(completed.stdout)["valid"] is True
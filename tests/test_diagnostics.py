@@ -0,0 +1,201 @@
+"""Tests for the cache diagnostics router."""
+
+import gc
+from unittest import mock
+
+import pytest
+import requests
+from fastapi import Depends
+from fastapi import FastAPI
+from fastapi import Header
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from requests.adapters import HTTPAdapter
+
+from fastapi_oidc import discovery
+from fastapi_oidc import get_auth
+from fastapi_oidc.diagnostics import CacheDiagnostics
+from fastapi_oidc.diagnostics import get_diagnostics_router
+from fastapi_oidc.static import StaticKeys
+
+
+def require_admin(x_admin: str = Header(default="")):
+    if x_admin != "yes":
+        raise HTTPException(status_code=403)
+
+
+@pytest.fixture
+def diagnostics():
+    return CacheDiagnostics()
+
+
+@pytest.fixture
+def admin(diagnostics):
+    app = FastAPI()
+    app.include_router(
+        get_diagnostics_router(diagnostics, dependencies=[Depends(require_admin)])
+    )
+    client = TestClient(app)
+    client.headers["X-Admin"] = "yes"
+    return client
+
+
+def test_state_reports_documents_kids_and_hit_ratio(oidc_provider, diagnostics, admin):
+    authenticate_user = get_auth(**oidc_provider.auth_config(), diagnostics=diagnostics)
+    for _ in range(3):
+        authenticate_user(f"Bearer {oidc_provider.mint()}")
+
+    response = admin.get("/oidc-diagnostics")
+
+    assert response.headers["Cache-Control"] == "no-store"
+    (provider,) = response.json()["providers"]
+    assert provider["source"] == oidc_provider.issuer
+    assert provider["audience"] == oidc_provider.client_id
+    assert (provider["lookups"], provider["fetches"]) == (6, 2)
+    assert provider["hit_ratio"] == pytest.approx(4 / 6)
+    documents = {d["kind"]: d for d in provider["documents"]}
+    assert documents["discovery"]["url"] == oidc_provider.discovery_url
+    assert documents["jwks"]["kids"] == [oidc_provider.keys[0].kid]
+    assert 3500 < documents["jwks"]["expires_in"] <= 3600
+    assert not documents["jwks"]["circuit_open"]
+
+
+def test_endpoints_are_protected(diagnostics, admin):
+    del admin.headers["X-Admin"]
+
+    assert admin.get("/oidc-diagnostics").status_code == 403
+    assert admin.post("/oidc-diagnostics/refresh").status_code == 403
+    assert admin.post("/oidc-diagnostics/purge").status_code == 403
+
+
+def test_refresh_pushes_a_key_rotation_through(oidc_provider, diagnostics, admin):
+    authenticate_user = get_auth(**oidc_provider.auth_config(), diagnostics=diagnostics)
+    authenticate_user(f"Bearer {oidc_provider.mint()}")
+    new_token = oidc_provider.mint(key=oidc_provider.rotate())
+    with pytest.raises(HTTPException):
+        authenticate_user(f"Bearer {new_token}")
+
+    response = admin.post("/oidc-diagnostics/refresh")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "refreshed": [oidc_provider.discovery_url, oidc_provider.jwks_uri],
+        "errors": [],
+    }
+    assert authenticate_user(f"Bearer {new_token}")
+    assert oidc_provider.request_counts["/.well-known/jwks.json"] == 2
+
+
+def test_failed_refresh_keeps_cached_keys(oidc_provider, diagnostics, admin):
+    authenticate_user = get_auth(**oidc_provider.auth_config(), diagnostics=diagnostics)
+    authenticate_user(f"Bearer {oidc_provider.mint()}")
+
+    oidc_provider.uninstall()
+    try:
+        with mock.patch.object(
+            HTTPAdapter, "send", side_effect=requests.ConnectionError("down")
+        ):
+            response = admin.post("/oidc-diagnostics/refresh")
+    finally:
+        oidc_provider.install()
+
+    assert response.status_code == 503
+    assert response.json()["errors"][0]["source"] == oidc_provider.issuer
+    assert authenticate_user(f"Bearer {oidc_provider.mint()}")
+    (provider,) = admin.get("/oidc-diagnostics").json()["providers"]
+    discovery_state = provider["documents"][0]
+    assert discovery_state["circuit_open"]
+    assert "down" in discovery_state["last_error"]["error"]
+
+    # A manual refresh goes through the open circuit
+    assert admin.post("/oidc-diagnostics/refresh").status_code == 200
+
+
+def test_purge_selected_caches(oidc_provider, diagnostics, admin):
+    authenticate_user = get_auth(
+        **oidc_provider.auth_config(),
+        rejected_token_cache_size=10,
+        diagnostics=diagnostics,
+    )
+    authenticate_user(f"Bearer {oidc_provider.mint()}")
+    with pytest.raises(HTTPException):
+        authenticate_user("Bearer not-a-token")
+
+    response = admin.post(
+        "/oidc-diagnostics/purge", params={"cache": ["jwks", "rejected_tokens"]}
+    )
+
+    assert response.json() == {
+        "purged": [oidc_provider.jwks_uri],
+        "rejected_tokens": 1,
+    }
+    authenticate_user(f"Bearer {oidc_provider.mint()}")
+    assert oidc_provider.request_counts == {
+        "/.well-known/openid-configuration": 1,
+        "/.well-known/jwks.json": 2,
+    }
+    assert (
+        admin.post("/oidc-diagnostics/purge", params={"cache": "x"}).status_code == 422
+    )
+
+
+def test_controls_can_target_one_source(oidc_provider, diagnostics, admin):
+    authenticate_user = get_auth(  # noqa: F841
+        **oidc_provider.auth_config(), diagnostics=diagnostics
+    )
+    other = get_auth(
+        **oidc_provider.auth_config(),
+        static_keys=StaticKeys(oidc_provider.jwks()),
+        diagnostics=diagnostics,
+    )
+    other(f"Bearer {oidc_provider.mint()}")
+
+    response = admin.post("/oidc-diagnostics/refresh", params={"source": "static"})
+
+    assert response.json() == {"refreshed": [], "errors": []}
+    assert sum(oidc_provider.request_counts.values()) == 0
+    assert len(admin.get("/oidc-diagnostics").json()["providers"]) == 2
+
+
+def test_static_key_file_state_and_refresh(tmp_path, oidc_provider, diagnostics):
+    path = tmp_path / "keys.pem"
+    path.write_text(oidc_provider.keys[0].signer.public_key().to_pem().decode())
+    static = StaticKeys.from_file(str(path), algorithms=["RS256"])
+    authenticate_user = get_auth(  # noqa: F841
+        **oidc_provider.auth_config(base_authorization_server_uri=None),
+        static_keys=static,
+        diagnostics=diagnostics,
+    )
+
+    (provider,) = diagnostics.state()
+    assert provider["source"] == str(path)
+    assert provider["documents"][0]["kids"] == [None]
+    assert diagnostics.refresh() == {"refreshed": [str(path)], "errors": []}
+
+    path.write_text("garbage")
+    assert "neither" in diagnostics.refresh()["errors"][0]["error"]
+    assert "last_error" in diagnostics.state()[0]["documents"][0]
+
+
+def test_instances_are_unregistered_when_collected(oidc_provider, diagnostics):
+    authenticate_user = get_auth(**oidc_provider.auth_config(), diagnostics=diagnostics)
+    assert len(diagnostics) == 1
+
+    del authenticate_user
+    gc.collect()
+
+    assert len(diagnostics) == 0
+
+
+def test_purge_with_shared_cache(tmp_path, oidc_provider):
+    discover = discovery.configure(
+        cache_ttl=3600, shared_cache_path=str(tmp_path / "cache")
+    )
+    discover.public_keys(discover.auth_server(base_url=oidc_provider.issuer))
+
+    assert discover.purge(["discovery"]) == [oidc_provider.discovery_url]
+    discover.auth_server(base_url=oidc_provider.issuer)
+    assert oidc_provider.request_counts["/.well-known/openid-configuration"] == 2
+
+    assert discover.refresh() == [oidc_provider.discovery_url, oidc_provider.jwks_uri]
+    assert oidc_provider.request_counts["/.well-known/jwks.json"] == 2
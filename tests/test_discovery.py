@@ -0,0 +1,208 @@
+"""Tests for discovery caching, the circuit breaker and stale-if-error."""
+
+import io
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+import requests
+from fastapi import HTTPException
+
+from fastapi_oidc import discovery
+from fastapi_oidc import get_auth
+from fastapi_oidc.circuit import CircuitBreaker
+from fastapi_oidc.exceptions import DocumentTooLargeError
+from fastapi_oidc.exceptions import IdentityProviderUnavailableError
+from fastapi_oidc.testing import json_response
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class UnclosableBody(io.BytesIO):
+    """A response body whose read position survives the response closing."""
+
+    def close(self):
+        pass
+
+
+def test_circuit_breaker_opens_after_failure_and_backs_off():
+    clock = FakeClock()
+    breaker = CircuitBreaker(backoff=1.0, max_backoff=8.0, clock=clock)
+    failing = Mock(side_effect=requests.ConnectionError("down"))
+
+    with pytest.raises(requests.ConnectionError):
+        breaker.call(failing)
+    assert breaker.is_open
+
+    # While open the wrapped function is not called at all
+    with pytest.raises(IdentityProviderUnavailableError) as exc_info:
+        breaker.call(failing)
+    assert failing.call_count == 1
+    assert 0.5 <= exc_info.value.retry_after <= 1.0
+
+    # After the window a single probe is let through; failing again doubles it
+    clock.now += 1.0
+    with pytest.raises(requests.ConnectionError):
+        breaker.call(failing)
+    assert failing.call_count == 2
+    assert 1.0 <= breaker.open_until - clock.now <= 2.0
+
+
+def test_circuit_breaker_closes_after_successful_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(backoff=1.0, clock=clock)
+
+    with pytest.raises(requests.Timeout):
+        breaker.call(Mock(side_effect=requests.Timeout()))
+    clock.now += 1.0
+
+    assert breaker.call(lambda: "keys") == "keys"
+    assert not breaker.is_open
+    assert breaker.failures == 0
+
+
+def test_circuit_breaker_ignores_unrelated_errors():
+    breaker = CircuitBreaker()
+
+    with pytest.raises(KeyError):
+        breaker.call(Mock(side_effect=KeyError("bug")))
+    assert not breaker.is_open
+
+
+def test_discovery_fails_fast_after_failure():
+    with patch("requests.get") as mock_get:
+        mock_get.side_effect = requests.ConnectionError("down")
+        discover = discovery.configure(cache_ttl=100)
+
+        with pytest.raises(requests.ConnectionError):
+            discover.auth_server(base_url="https://example.com")
+        with pytest.raises(IdentityProviderUnavailableError):
+            discover.auth_server(base_url="https://example.com")
+
+    assert mock_get.call_count == 1
+
+
+def test_jwks_error_responses_are_not_cached_as_keys():
+    with patch("requests.get") as mock_get:
+        mock_get.return_value = json_response({"error": "internal"}, status_code=500)
+        discover = discovery.configure(cache_ttl=100)
+
+        with pytest.raises(requests.HTTPError):
+            discover.public_keys({"jwks_uri": "https://example.com/keys"})
+
+
+def test_stale_keys_are_served_within_stale_if_error_window(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(discovery.time, "monotonic", clock)
+    spec = {"jwks_uri": "https://example.com/keys"}
+
+    with patch("requests.get") as mock_get:
+        mock_get.return_value = json_response({"keys": ["good"]})
+        discover = discovery.configure(cache_ttl=0, stale_if_error=60)
+        assert discover.public_keys(spec) == {"keys": ["good"]}
+
+        mock_get.return_value = None
+        mock_get.side_effect = requests.ConnectionError("down")
+        clock.now += 30
+        assert discover.public_keys(spec) == {"keys": ["good"]}
+        # Fail-fast window: served stale without another request
+        assert discover.public_keys(spec) == {"keys": ["good"]}
+        assert mock_get.call_count == 2
+
+        clock.now += 31
+        with pytest.raises(requests.RequestException):
+            discover.public_keys(spec)
+
+
+def test_stale_if_error_disabled_by_default():
+    spec = {"jwks_uri": "https://example.com/keys"}
+
+    with patch("requests.get") as mock_get:
+        mock_get.return_value = json_response({"keys": ["good"]})
+        discover = discovery.configure(cache_ttl=0)
+        discover.public_keys(spec)
+
+        mock_get.side_effect = requests.ConnectionError("down")
+        with pytest.raises(requests.ConnectionError):
+            discover.public_keys(spec)
+
+
+def test_authenticate_user_returns_503_when_idp_unavailable(
+    no_audience_config, token_without_audience
+):
+    with patch("requests.get") as mock_get:
+        mock_get.side_effect = requests.ConnectionError("down")
+        authenticate_user = get_auth(**no_audience_config)
+
+        with pytest.raises(HTTPException) as first:
+            authenticate_user(auth_header=f"Bearer {token_without_audience}")
+        with pytest.raises(HTTPException) as second:
+            authenticate_user(auth_header=f"Bearer {token_without_audience}")
+
+    assert first.value.status_code == 503
+    assert second.value.status_code == 503
+    assert second.value.headers == {"Retry-After": "1"}
+    assert mock_get.call_count == 1
+
+
+def test_oversized_documents_are_rejected():
+    spec = {"jwks_uri": "https://example.com/keys"}
+    announced = json_response(b" " * (discovery.MAX_DOCUMENT_SIZE + 1))
+    announced.raw = Mock()
+    unannounced = json_response(b" " * (discovery.MAX_DOCUMENT_SIZE * 2))
+    unannounced.raw = UnclosableBody(unannounced.raw.getvalue())
+    del unannounced.headers["Content-Length"]
+
+    for response in (announced, unannounced):
+        with patch("requests.get", return_value=response) as mock_get:
+            discover = discovery.configure(cache_ttl=100)
+
+            with pytest.raises(DocumentTooLargeError, match="returned more than"):
+                discover.public_keys(spec)
+
+        assert mock_get.call_args.kwargs["stream"] is True
+    # Refused by Content-Length without reading, or once past the limit
+    assert not {"read", "stream"} & {call[0] for call in announced.raw.method_calls}
+    assert unannounced.raw.tell() <= discovery.MAX_DOCUMENT_SIZE + 64 * 1024
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        json_response(b"<html>Bad Gateway</html>"),
+        json_response(b" " * (discovery.MAX_DOCUMENT_SIZE + 1)),
+    ],
+    ids=["not-json", "oversized"],
+)
+def test_authenticate_user_returns_503_for_unusable_discovery_response(
+    response, no_audience_config, token_without_audience
+):
+    with patch("requests.get", return_value=response):
+        authenticate_user = get_auth(**no_audience_config)
+
+        with pytest.raises(HTTPException) as exc_info:
+            authenticate_user(auth_header=f"Bearer {token_without_audience}")
+
+    assert exc_info.value.status_code == 503
+
+
+def test_per_url_state_is_bounded(monkeypatch):
+    monkeypatch.setattr(discovery, "MAX_URLS", 2)
+    with patch("requests.get") as mock_get:
+        mock_get.side_effect = lambda *_, **__: json_response({"keys": []})
+        discover = discovery.configure(cache_ttl=0, stale_if_error=60)
+        for n in range(5):
+            discover.public_keys({"jwks_uri": f"https://example.com/keys/{n}"})
+
+        mock_get.return_value = None
+        mock_get.side_effect = requests.ConnectionError("down")
+        # Stale copies of the two newest URLs only
+        assert discover.public_keys({"jwks_uri": "https://example.com/keys/4"})
+        with pytest.raises(requests.ConnectionError):
+            discover.public_keys({"jwks_uri": "https://example.com/keys/0"})
@@ -0,0 +1,231 @@
+"""Tests for DPoP proof verification."""
+
+import time
+from unittest import mock
+
+import pytest
+from fastapi import Depends
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_oidc import IDToken
+from fastapi_oidc import get_auth
+from fastapi_oidc.dpop import DPoPProofError
+from fastapi_oidc.dpop import DPoPVerifier
+from fastapi_oidc.dpop import ReplayCache
+from fastapi_oidc.dpop import get_dpop_auth
+from fastapi_oidc.dpop import jwk_thumbprint
+from fastapi_oidc.testing import DPoPKey
+
+URL = "http://testserver/orders"
+
+
+@pytest.fixture(scope="module")
+def client_key():
+    return DPoPKey()
+
+
+@pytest.fixture
+def client(oidc_provider):
+    authenticate_dpop = get_dpop_auth(get_auth(**oidc_provider.auth_config()))
+    app = FastAPI()
+
+    @app.get("/orders")
+    def orders(token: IDToken = Depends(authenticate_dpop)):
+        return {"sub": token.sub}
+
+    return TestClient(app)
+
+
+def test_thumbprint_matches_rfc_7638_example():
+    # RFC 7638, section 3.1
+    key = {
+        "kty": "RSA",
+        "n": (
+            "0vx7agoebGcQSuuPiLJXZptN9nndrQmbXEps2aiAFbWhM78LhWx4cbbfAAtVT86zwu1RK7aP"
+            "FFxuhDR1L6tSoc_BJECPebWKRXjBZCiFV4n3oknjhMstn64tZ_2W-5JsGY4Hc5n9yBXArwl9"
+            "3lqt7_RN5w6Cf0h4QyQ5v-65YGjQR0_FDW2QvzqY368QQMicAtaSqzs8KJZgnYb9c7d0zgdA"
+            "ZHzu6qMQvRL5hajrn1n91CbOpbISD08qNLyrdkt-bFTWhAI4vMQFh6WeZu0fM4lFd2NcRwr3"
+            "XPksINHaQ-G_xBniIqbw0Ls1jF44-csFCur-kEgU8awapJzKnqDKgw"
+        ),
+        "e": "AQAB",
+        "alg": "RS256",
+        "kid": "2011-04-29",
+    }
+
+    assert jwk_thumbprint(key) == "NzbLsXh8uDCcd-6MNwXF4W_7noWXFZAfHkxZsRGC9Xs"
+    with pytest.raises(DPoPProofError):
+        jwk_thumbprint({"kty": "oct", "k": "c2VjcmV0"})
+
+
+def test_bound_token_with_valid_proof_is_accepted(oidc_provider, client, client_key):
+    token = oidc_provider.mint(cnf={"jkt": client_key.thumbprint})
+
+    for _ in range(2):
+        response = client.get(
+            "/orders?page=2",
+            headers={
+                "Authorization": f"DPoP {token}",
+                "DPoP": client_key.proof("GET", URL, token),
+            },
+        )
+        assert response.status_code == 200, response.text
+        assert response.json() == {"sub": "test-subject"}
+
+
+@pytest.mark.parametrize(
+    "scheme, proof_count, bound_to_client",
+    [
+        ("Bearer", 1, True),
+        ("DPoP", 0, True),
+        ("DPoP", 2, True),
+        ("DPoP", 1, False),
+    ],
+)
+def test_missing_proof_or_binding_is_rejected(
+    oidc_provider, client, client_key, scheme, proof_count, bound_to_client
+):
+    jkt = client_key.thumbprint if bound_to_client else DPoPKey(index=1001).thumbprint
+    token = oidc_provider.mint(cnf={"jkt": jkt})
+    headers = [("Authorization", f"{scheme} {token}")] + [
+        ("DPoP", client_key.proof("GET", URL, token)) for _ in range(proof_count)
+    ]
+
+    response = client.get("/orders", headers=headers)
+
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"].startswith("DPoP error=")
+
+
+def test_unbound_token_is_rejected(oidc_provider, client, client_key):
+    token = oidc_provider.mint()
+
+    response = client.get(
+        "/orders",
+        headers={
+            "Authorization": f"DPoP {token}",
+            "DPoP": client_key.proof("GET", URL, token),
+        },
+    )
+
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == 'DPoP error="invalid_token"'
+
+
+def test_replayed_proof_is_rejected(oidc_provider, client, client_key):
+    token = oidc_provider.mint(cnf={"jkt": client_key.thumbprint})
+    headers = {
+        "Authorization": f"DPoP {token}",
+        "DPoP": client_key.proof("GET", URL, token),
+    }
+
+    assert client.get("/orders", headers=headers).status_code == 200
+    response = client.get("/orders", headers=headers)
+
+    assert response.status_code == 401
+    assert "replayed" in response.json()["detail"]
+
+
+@pytest.mark.parametrize(
+    "method, url, access_token, claims, headers, message",
+    [
+        ("POST", URL, "tok", {}, {}, "htm"),
+        ("GET", "http://testserver/other", "tok", {}, {}, "htu"),
+        ("GET", URL, "other", {}, {}, "ath"),
+        ("GET", URL, "tok", {"iat": int(time.time()) - 600}, {}, "fresh"),
+        ("GET", URL, "tok", {"iat": int(time.time()) + 600}, {}, "fresh"),
+        ("GET", URL, "tok", {"jti": None}, {}, "jti"),
+        ("GET", URL, "tok", {"jti": "x" * 300}, {}, "jti"),
+        ("GET", URL, "tok", {}, {"typ": "JWT"}, "type"),
+        ("GET", URL, "tok", {}, {"jwk": {"kty": "EC", "d": "secret"}}, "public"),
+        ("GET", URL, "tok", {}, {"jwk": {"kty": "oct", "k": "c2VjcmV0"}}, "key"),
+    ],
+)
+def test_invalid_proofs(
+    client_key, method, url, access_token, claims, headers, message
+):
+    proof = client_key.proof(method, url, access_token, headers=headers, **claims)
+
+    with pytest.raises(DPoPProofError, match=message):
+        DPoPVerifier().verify(proof, method="GET", url=URL, access_token="tok")
+
+
+def test_proof_signed_by_another_key_is_rejected(client_key):
+    other = DPoPKey(index=1001)
+    proof = other.proof("GET", URL, headers={"jwk": client_key.public_jwk})
+
+    with pytest.raises(DPoPProofError, match="Signature verification failed"):
+        DPoPVerifier().verify(proof, method="GET", url=URL)
+
+
+def test_disallowed_algorithm_is_rejected(client_key):
+    with pytest.raises(DPoPProofError, match="not allowed"):
+        DPoPVerifier(algorithms=["RS256"]).verify(
+            client_key.proof("GET", URL), method="GET", url=URL
+        )
+
+
+def test_url_scheme_and_host_are_case_insensitive(client_key):
+    proof = client_key.proof("GET", "https://api.example.com/Orders")
+
+    thumbprint = DPoPVerifier().verify(
+        proof, method="GET", url="HTTPS://API.example.com/Orders#top"
+    )
+
+    assert thumbprint == client_key.thumbprint
+
+
+def test_proof_key_is_built_once(client_key):
+    verifier = DPoPVerifier()
+    with mock.patch(
+        "fastapi_oidc.dpop.jwk_thumbprint", wraps=jwk_thumbprint
+    ) as thumbprint:
+        for _ in range(3):
+            verifier.verify(client_key.proof("GET", URL), method="GET", url=URL)
+
+    assert thumbprint.call_count == 1
+
+
+def test_replay_cache_drops_expired_buckets():
+    now = [1000.0]
+    cache = ReplayCache(60, buckets=4, clock=lambda: now[0])
+
+    assert cache.add("a") is True
+    assert cache.add("a") is False
+    now[0] += 59
+    assert cache.add("a") is False
+    assert cache.add("b") is True
+    now[0] += 30
+    # "a" is now older than the window plus a bucket and forgotten
+    assert cache.add("a") is True
+    assert cache.add("b") is False
+    assert len(cache) == 2
+
+
+def test_replay_cache_fails_closed_when_full():
+    cache = ReplayCache(60, max_entries=2)
+    cache.add("a")
+    cache.add("b")
+
+    with pytest.raises(OverflowError):
+        cache.add("c")
+    assert cache.add("a") is False
+
+
+def test_replay_cache_tolerates_clock_stepping_back():
+    now = [1000.0]
+    cache = ReplayCache(60, buckets=4, clock=lambda: now[0])
+    cache.add("a")
+    now[0] -= 45
+    cache.add("b")
+
+    # "b" went into the newer bucket of "a", so both expire together
+    now[0] = 1060.0
+    assert cache.add("a") is False and cache.add("b") is False
+    now[0] = 1075.0
+    assert cache.add("a") is True and cache.add("b") is True
+
+
+def test_replay_cache_rejects_empty_window():
+    with pytest.raises(ValueError):
+        ReplayCache(0)
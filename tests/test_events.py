@@ -0,0 +1,163 @@
+"""Tests for asynchronous auth event logging."""
+
+import gc
+import json
+import logging
+import threading
+import weakref
+
+import pytest
+from fastapi import HTTPException
+
+from fastapi_oidc import events as events_module
+from fastapi_oidc import get_auth
+from fastapi_oidc.events import AuthEvent
+from fastapi_oidc.events import AuthEventEmitter
+
+
+def test_records_successes_and_failures(oidc_provider):
+    events = []
+    emitter = AuthEventEmitter(events.append, aggregation_window=0)
+    authenticate_user = get_auth(**oidc_provider.auth_config(), event_emitter=emitter)
+    kid = oidc_provider.keys[0].kid
+
+    authenticate_user(auth_header=f"Bearer {oidc_provider.mint(sub='alice')}")
+    with pytest.raises(HTTPException):
+        authenticate_user(auth_header=oidc_provider.mint(expires_in=-60))
+    emitter.close()
+
+    success, failure = events
+    assert (success.outcome, success.subject, success.kid) == ("success", "alice", kid)
+    assert success.issuer == oidc_provider.issuer
+    assert success.latency > 0
+    assert failure.outcome == "failure"
+    assert failure.subject is None
+    assert failure.issuer == oidc_provider.issuer
+    assert failure.reason == "Unauthorized: Signature has expired."
+
+
+def test_identical_failures_are_aggregated():
+    events = []
+    emitter = AuthEventEmitter(events.append, aggregation_window=60)
+
+    for _ in range(3):
+        emitter.record_failure("not-a-jwt", ValueError("bad token"), 0.001)
+    emitter.record_failure("not-a-jwt", ValueError("other reason"), 0.001)
+    emitter.close()
+
+    assert sorted((event.reason, event.count) for event in events) == [
+        ("bad token", 3),
+        ("other reason", 1),
+    ]
+    assert events[0].kid is None and events[0].issuer is None
+
+
+def test_aggregation_and_recorded_fields_are_bounded(monkeypatch):
+    monkeypatch.setattr(events_module, "MAX_AGGREGATED", 2)
+    events = []
+    emitter = AuthEventEmitter(events.append, aggregation_window=60)
+
+    for reason in ("a", "b", "c", "d", "a", "x" * 1000):
+        emitter.record_failure("not-a-jwt", ValueError(reason), 0.001)
+    emitter.close()
+
+    assert sorted((event.reason[:3], event.count) for event in events) == [
+        ("a", 2),
+        ("b", 1),
+        ("c", 1),
+        ("d", 1),
+        ("xxx", 1),
+    ]
+    assert max(len(event.reason) for event in events) == 200
+
+
+def test_full_queue_drops_without_blocking():
+    release = threading.Event()
+    written = []
+
+    def slow_sink(event):
+        release.wait(5)
+        written.append(event)
+
+    emitter = AuthEventEmitter(slow_sink, max_queue_size=1, aggregation_window=0)
+    for _ in range(5):
+        emitter.record_failure("token", ValueError("x"), 0.0)
+    assert emitter.dropped >= 3
+
+    release.set()
+    emitter.close()
+    assert len(written) + emitter.dropped == 5
+
+
+def test_sampling_and_validation():
+    events = []
+    emitter = AuthEventEmitter(events.append, success_sample_rate=0.0)
+    emitter.record_success("token", object(), 0.0)
+    emitter.close()
+    assert events == []
+
+    with pytest.raises(ValueError):
+        AuthEventEmitter(failure_sample_rate=2)
+
+
+def test_default_sink_logs_json(caplog):
+    emitter = AuthEventEmitter(aggregation_window=0)
+    with caplog.at_level(logging.INFO, logger="fastapi_oidc.audit"):
+        emitter.record_failure("token", ValueError("nope"), 0.5)
+        emitter.close()
+
+    record = json.loads(caplog.records[0].getMessage())
+    assert record["outcome"] == "failure"
+    assert record["reason"] == "nope"
+    assert record["count"] == 1
+
+
+def test_sink_errors_do_not_stop_the_writer(caplog):
+    events = []
+
+    def flaky_sink(event: AuthEvent):
+        if not events:
+            events.append(None)
+            raise RuntimeError("disk full")
+        events.append(event)
+
+    emitter = AuthEventEmitter(flaky_sink, aggregation_window=0)
+    emitter.record_failure("a", ValueError("1"), 0.0)
+    emitter.record_failure("b", ValueError("2"), 0.0)
+    emitter.close()
+
+    assert events[1].reason == "2"
+    assert "Auth event sink failed" in caplog.text
+
+
+def test_tokens_are_parsed_on_the_writer_thread(monkeypatch, oidc_provider):
+    threads = set()
+    get_unverified_header = events_module.jwt.get_unverified_header
+
+    def spy(token):
+        threads.add(threading.current_thread().name)
+        return get_unverified_header(token)
+
+    monkeypatch.setattr(events_module.jwt, "get_unverified_header", spy)
+    events = []
+    emitter = AuthEventEmitter(events.append, aggregation_window=0)
+
+    emitter.record_failure(oidc_provider.mint(), ValueError("x"), 0.0)
+    emitter.close()
+
+    assert threads == {"fastapi-oidc-events"}
+    assert events[0].kid == oidc_provider.keys[0].kid
+    assert events[0].issuer == oidc_provider.issuer
+
+
+def test_emitters_are_not_kept_alive_for_exit():
+    emitter = AuthEventEmitter()
+    unused = weakref.ref(AuthEventEmitter())
+    emitter.record_failure("token", ValueError("x"), 0.0)
+    emitter.close()
+    closed = weakref.ref(emitter)
+    del emitter
+    gc.collect()
+
+    assert unused() is None
+    assert closed() is None
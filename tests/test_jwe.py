@@ -0,0 +1,121 @@
+"""Tests for encrypted (nested JWE) ID tokens."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from jose import jwe
+from jose import jwk
+
+from fastapi_oidc import get_auth
+from fastapi_oidc.jwe import JWEDecrypter
+from fastapi_oidc.jwe import JWEDecryptionError
+from fastapi_oidc.testing import _pooled_private_key
+
+RP_KEY = _pooled_private_key("RS256", 10)
+OTHER_RP_KEY = _pooled_private_key("RS256", 11)
+SECRET = b"0123456789abcdef0123456789abcdef"
+
+
+def public_jwk(private_pem, kid=None):
+    public = jwk.construct(private_pem, "RSA-OAEP").public_key().to_dict()
+    return {**public, "kid": kid} if kid else public
+
+
+@pytest.mark.parametrize(
+    "encryption", ["A128GCM", "A256GCM", "A128CBC-HS256", "A256CBC-HS512"]
+)
+def test_get_auth_accepts_encrypted_tokens(oidc_provider, encryption):
+    authenticate_user = get_auth(
+        **oidc_provider.auth_config(), decryption_keys=[RP_KEY]
+    )
+    token = oidc_provider.encrypt(
+        oidc_provider.mint(sub="secret-agent"),
+        public_jwk(RP_KEY),
+        encryption=encryption,
+    )
+
+    assert authenticate_user(auth_header=f"Bearer {token}").sub == "secret-agent"
+    # Signed tokens are still accepted
+    assert authenticate_user(auth_header=oidc_provider.mint()).sub == "test-subject"
+
+
+@pytest.mark.parametrize("algorithm", ["A256KW", "dir"])
+def test_symmetric_key_management(oidc_provider, algorithm):
+    token = oidc_provider.encrypt(oidc_provider.mint(), SECRET, algorithm=algorithm)
+
+    assert JWEDecrypter([SECRET]).decrypt(token).count(".") == 2
+
+
+def test_encrypted_tokens_are_rejected_without_decryption_keys(oidc_provider):
+    authenticate_user = get_auth(**oidc_provider.auth_config())
+    token = oidc_provider.encrypt(oidc_provider.mint(), public_jwk(RP_KEY))
+
+    with pytest.raises(HTTPException) as exc_info:
+        authenticate_user(auth_header=token)
+    assert exc_info.value.status_code == 401
+
+
+def test_unwrapped_keys_are_cached_only_after_successful_decryption(oidc_provider):
+    decrypter = JWEDecrypter([RP_KEY])
+    token = oidc_provider.encrypt(oidc_provider.mint(), public_jwk(RP_KEY))
+    header, encrypted_key, iv, ciphertext, tag = token.split(".")
+    tampered = ".".join([header, encrypted_key, iv, ciphertext[:-4] + "AAAA", tag])
+
+    with patch.object(decrypter, "_unwrap", wraps=decrypter._unwrap) as unwrap:
+        with pytest.raises(JWEDecryptionError, match="Decryption failed."):
+            decrypter.decrypt(tampered)
+        plaintext = decrypter.decrypt(token)
+        assert decrypter.decrypt(token) == plaintext
+        with pytest.raises(JWEDecryptionError, match="Decryption failed."):
+            decrypter.decrypt(tampered)
+
+    assert unwrap.call_count == 2
+
+
+def test_keys_are_selected_by_kid(oidc_provider):
+    decrypter = JWEDecrypter(
+        [
+            {**jwk.construct(OTHER_RP_KEY, "RSA-OAEP").to_dict(), "kid": "old"},
+            {**jwk.construct(RP_KEY, "RSA-OAEP").to_dict(), "kid": "new"},
+        ]
+    )
+    token = oidc_provider.encrypt(oidc_provider.mint(), public_jwk(RP_KEY, "new"))
+
+    with patch.object(decrypter, "_unwrap", wraps=decrypter._unwrap) as unwrap:
+        decrypter.decrypt(token)
+
+    assert unwrap.call_args.args[0] == 1
+
+
+@pytest.mark.parametrize(
+    "kwargs, message",
+    [
+        ({"algorithm": "RSA1_5"}, "RSA1_5 not allowed"),
+        ({}, "Decryption failed."),
+    ],
+)
+def test_decryption_errors(oidc_provider, kwargs, message):
+    token = oidc_provider.encrypt(
+        oidc_provider.mint(), public_jwk(OTHER_RP_KEY), **kwargs
+    )
+
+    with pytest.raises(JWEDecryptionError, match=message):
+        JWEDecrypter([RP_KEY]).decrypt(token)
+
+
+def test_compressed_tokens_are_rejected(oidc_provider):
+    token = jwe.encrypt(
+        oidc_provider.mint(), SECRET, algorithm="dir", zip="DEF"
+    ).decode()
+
+    with pytest.raises(JWEDecryptionError, match="Compressed"):
+        JWEDecrypter([SECRET]).decrypt(token)
+
+
+def test_decrypt_async(oidc_provider):
+    token = oidc_provider.encrypt(oidc_provider.mint(), public_jwk(RP_KEY))
+    decrypter = JWEDecrypter([RP_KEY])
+
+    assert asyncio.run(decrypter.decrypt_async(token)) == decrypter.decrypt(token)
@@ -0,0 +1,192 @@
+"""Tests for the back-channel logout receiver and revocation index."""
+
+import time
+from unittest import mock
+
+import pytest
+import requests
+from fastapi import Depends
+from fastapi import FastAPI
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from requests.adapters import HTTPAdapter
+
+from fastapi_oidc import get_auth
+from fastapi_oidc.logout import RevocationIndex
+from fastapi_oidc.logout import get_logout_router
+from fastapi_oidc.registry import ProviderRegistry
+from fastapi_oidc.userinfo import get_userinfo
+
+
+@pytest.fixture
+def revocations():
+    return RevocationIndex(ttl=3600)
+
+
+@pytest.fixture
+def app(oidc_provider, revocations):
+    app = FastAPI()
+    app.include_router(
+        get_logout_router(revocation_index=revocations, **oidc_provider.auth_config())
+    )
+    return app
+
+
+def logout(client, token):
+    return client.post("/backchannel-logout", data={"logout_token": token})
+
+
+def test_logout_revokes_earlier_tokens_of_the_session(oidc_provider, app, revocations):
+    authenticate_user = get_auth(
+        **oidc_provider.auth_config(), revocation_index=revocations
+    )
+    now = int(time.time())
+    session_token = oidc_provider.mint(sid="s1", iat=now - 10)
+    other_session = oidc_provider.mint(sid="s2", iat=now - 10)
+
+    response = logout(TestClient(app), oidc_provider.mint_logout_token(sid="s1"))
+
+    assert response.status_code == 200, response.text
+    assert response.headers["Cache-Control"] == "no-store"
+    with pytest.raises(HTTPException) as err:
+        authenticate_user(f"Bearer {session_token}")
+    assert err.value.status_code == 401
+    assert "revoked" in err.value.detail
+    assert authenticate_user(f"Bearer {other_session}").sid == "s2"
+    # A new login to the same session id after the logout is accepted
+    assert authenticate_user(f"Bearer {oidc_provider.mint(sid='s1', iat=now + 5)}")
+
+
+def test_logout_by_subject_revokes_every_session(oidc_provider, app, revocations):
+    authenticate_user = get_auth(
+        **oidc_provider.auth_config(), revocation_index=revocations
+    )
+    earlier = int(time.time()) - 10
+    tokens = [oidc_provider.mint(sid=sid, iat=earlier) for sid in ("s1", "s2")]
+
+    assert logout(TestClient(app), oidc_provider.mint_logout_token()).status_code == 200
+
+    for token in tokens:
+        with pytest.raises(HTTPException):
+            authenticate_user(f"Bearer {token}")
+
+
+@pytest.mark.parametrize(
+    "claims, message",
+    [
+        ({"events": None}, "Invalid events claim"),
+        ({"events": {"other": {}}}, "Invalid events claim"),
+        ({"sub": None}, "sid or sub"),
+        ({"nonce": "n"}, "nonce"),
+        ({"jti": None}, "jti"),
+        ({"exp": None}, "Missing required claim: exp"),
+        ({"aud": "someone-else"}, "Invalid audience"),
+        ({"headers": {"typ": "at+jwt"}}, "type"),
+    ],
+)
+def test_invalid_logout_tokens_are_rejected(
+    oidc_provider, app, revocations, claims, message
+):
+    response = logout(TestClient(app), oidc_provider.mint_logout_token(**claims))
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "invalid_request"
+    assert message in response.json()["error_description"]
+    assert len(revocations) == 0
+
+
+def test_malformed_requests(oidc_provider, app):
+    client = TestClient(app)
+
+    assert client.post("/backchannel-logout", data={}).status_code == 400
+    assert logout(client, "not-a-token").status_code == 400
+    response = client.post("/backchannel-logout", content=b"x" * 20_000)
+    assert response.json()["error_description"] == "Request too large"
+
+
+def test_unreachable_provider_answers_503(app, oidc_provider):
+    token = oidc_provider.mint_logout_token()
+    oidc_provider.uninstall()
+    try:
+        with mock.patch.object(
+            HTTPAdapter, "send", side_effect=requests.ConnectionError
+        ):
+            response = logout(TestClient(app), token)
+    finally:
+        oidc_provider.install()
+
+    assert response.status_code == 503
+    assert response.json() == {"error": "temporarily_unavailable"}
+
+
+def test_logout_evicts_cached_userinfo(oidc_provider, app, revocations):
+    oidc_provider.userinfo["test-subject"] = {"name": "Before"}
+    authenticate_user = get_auth(**oidc_provider.auth_config())
+    userinfo = get_userinfo(
+        authenticate_user,
+        base_authorization_server_uri=oidc_provider.issuer,
+        revocation_index=revocations,
+    )
+    app.get("/profile")(lambda user=Depends(userinfo): {"name": user.name})
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {oidc_provider.mint(sid='s1')}"}
+
+    assert client.get("/profile", headers=headers).json() == {"name": "Before"}
+    oidc_provider.userinfo["test-subject"] = {"name": "After"}
+    assert client.get("/profile", headers=headers).json() == {"name": "Before"}
+
+    logout(client, oidc_provider.mint_logout_token(sid="s1", sub=None))
+
+    assert client.get("/profile", headers=headers).json() == {"name": "After"}
+
+
+def test_logout_router_shares_provider_with_get_auth(oidc_provider, revocations):
+    providers = ProviderRegistry()
+    authenticate_user = get_auth(
+        **oidc_provider.auth_config(), provider_registry=providers
+    )
+    router = get_logout_router(
+        revocation_index=revocations,
+        provider_registry=providers,
+        **oidc_provider.auth_config(),
+    )
+    app = FastAPI()
+    app.include_router(router)
+
+    authenticate_user(f"Bearer {oidc_provider.mint()}")
+    assert logout(TestClient(app), oidc_provider.mint_logout_token()).status_code == 200
+
+    assert len(providers) == 1
+    assert oidc_provider.request_counts["/.well-known/jwks.json"] == 1
+
+
+def test_revocation_index_expires_in_order():
+    now = [1000.0]
+    index = RevocationIndex(ttl=60, max_entries=2, clock=lambda: now[0])
+    claims = {"iss": "https://idp", "sub": "a", "sid": "s", "iat": 990}
+
+    index.revoke("https://idp", sub="a", revoked_at=995)
+    assert index.is_revoked(claims)
+    assert not index.is_revoked({**claims, "iat": 996})
+    assert not index.is_revoked({**claims, "iss": "https://other"})
+
+    now[0] += 30
+    index.revoke("https://idp", sid="s1", revoked_at=1020)
+    index.revoke("https://idp", sid="s2", revoked_at=1020)
+    # Over max_entries, the logout closest to expiry went first
+    assert len(index) == 2 and not index.is_revoked(claims)
+
+    now[0] += 61
+    index.revoke("https://idp", sid="s3")
+    assert len(index) == 1
+    with pytest.raises(ValueError):
+        index.revoke("https://idp")
+
+
+def test_repeated_logout_keeps_the_latest_time():
+    index = RevocationIndex()
+    index.revoke("https://idp", sid="s", revoked_at=100)
+    index.revoke("https://idp", sid="s", revoked_at=50)
+
+    assert index.is_revoked({"iss": "https://idp", "sid": "s", "iat": 90})
+    assert len(index) == 1
@@ -0,0 +1,95 @@
+"""Tests for the ASGI authentication middleware."""
+
+from fastapi import Depends
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_oidc import IDToken
+from fastapi_oidc import get_auth
+from fastapi_oidc.middleware import OIDCAuthMiddleware
+from fastapi_oidc.middleware import PathPrefixTrie
+from fastapi_oidc.middleware import get_id_token
+
+
+def test_path_prefix_trie_matches_whole_segments():
+    public = PathPrefixTrie(["/health", "/static/img/", "docs"])
+
+    assert public.matches("/health")
+    assert public.matches("/health/live")
+    assert public.matches("/static/img/logo.png")
+    assert public.matches("/docs")
+    assert not public.matches("/healthz")
+    assert not public.matches("/static")
+    assert not public.matches("/static/css/site.css")
+    assert not public.matches("/")
+
+
+def test_path_prefix_trie_root_matches_everything():
+    assert PathPrefixTrie(["/"]).matches("/anything/at/all")
+    assert not PathPrefixTrie([]).matches("/anything")
+
+
+def _make_app(config):
+    app = FastAPI()
+    app.add_middleware(
+        OIDCAuthMiddleware,
+        authenticate_user=get_auth(**config),
+        exclude_paths=["/public"],
+    )
+
+    @app.get("/public")
+    def public():
+        return {"message": "public"}
+
+    @app.get("/public/optional")
+    def optional(token: IDToken = Depends(get_id_token)):
+        return {"sub": token.sub}
+
+    @app.get("/protected")
+    def protected(token: IDToken = Depends(get_id_token)):
+        return {"sub": token.sub, "email": getattr(token, "email", None)}
+
+    return app
+
+
+def test_middleware_attaches_verified_token(
+    monkeypatch, mock_discovery, token_with_audience, config_w_aud, test_email
+):
+    monkeypatch.setattr("fastapi_oidc.auth.discovery.configure", mock_discovery)
+    client = TestClient(_make_app(config_w_aud))
+
+    response = client.get(
+        "/protected", headers={"Authorization": f"Bearer {token_with_audience}"}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"sub": "foo", "email": test_email}
+
+
+def test_middleware_rejects_missing_and_invalid_tokens(
+    monkeypatch, mock_discovery, config_w_aud
+):
+    monkeypatch.setattr("fastapi_oidc.auth.discovery.configure", mock_discovery)
+    client = TestClient(_make_app(config_w_aud))
+
+    response = client.get("/protected")
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+    response = client.get(
+        "/protected", headers={"Authorization": "Bearer invalid.jwt.token"}
+    )
+    assert response.status_code == 401
+    assert "Unauthorized" in response.json()["detail"]
+
+
+def test_middleware_skips_excluded_paths(monkeypatch, mock_discovery, config_w_aud):
+    monkeypatch.setattr("fastapi_oidc.auth.discovery.configure", mock_discovery)
+    client = TestClient(_make_app(config_w_aud))
+
+    response = client.get("/public")
+    assert response.status_code == 200
+
+    # Excluded routes that still ask for the token get a 401 from the dependency
+    response = client.get("/public/optional")
+    assert response.status_code == 401
@@ -0,0 +1,111 @@
+"""Tests for mirrored and hedged discovery/JWKS fetching."""
+
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from fastapi_oidc import discovery
+from fastapi_oidc.mirrors import InconsistentResponseError
+from fastapi_oidc.mirrors import MirrorSet
+from fastapi_oidc.mirrors import validate_discovery_document
+from fastapi_oidc.mirrors import validate_jwks
+from fastapi_oidc.testing import json_response
+
+JWKS = {"keys": [{"kty": "RSA", "kid": "1"}]}
+
+
+def make_fetch(responses, delays=None):
+    """Build a fetch function answering per URL after an optional delay."""
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        time.sleep((delays or {}).get(url, 0))
+        response = responses[url]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    fetch.calls = calls
+    return fetch
+
+
+def test_mirror_set_fails_over_in_order():
+    mirrors = MirrorSet(["https://a", "https://b", "https://c"])
+    fetch = make_fetch(
+        {
+            "https://a": requests.ConnectionError("down"),
+            "https://b": {"keys": []},
+            "https://c": JWKS,
+        }
+    )
+
+    assert mirrors.fetch(fetch, validate_jwks) == JWKS
+    assert fetch.calls == ["https://a", "https://b", "https://c"]
+
+
+def test_mirror_set_raises_last_error_when_all_fail():
+    mirrors = MirrorSet(["https://a", "https://b"])
+    fetch = make_fetch(
+        {"https://a": requests.Timeout(), "https://b": requests.ConnectionError()}
+    )
+
+    with pytest.raises(requests.ConnectionError):
+        mirrors.fetch(fetch)
+
+
+def test_mirror_set_hedges_slow_requests():
+    mirrors = MirrorSet(["https://slow", "https://fast"], hedge_delay=0.02)
+    fetch = make_fetch(
+        {"https://slow": {"from": "slow"}, "https://fast": {"from": "fast"}},
+        delays={"https://slow": 0.5},
+    )
+
+    started = time.monotonic()
+    assert mirrors.fetch(fetch) == {"from": "fast"}
+    assert time.monotonic() - started < 0.4
+
+
+def test_mirror_set_prefers_fastest_measured_mirror():
+    mirrors = MirrorSet(["https://a", "https://b"])
+    mirrors.latencies.update({"https://a": 0.5, "https://b": 0.05})
+
+    assert mirrors.ranked() == ["https://b", "https://a"]
+
+    mirrors._record("https://b", 1.05)
+    assert mirrors.latencies["https://b"] == pytest.approx(0.35)
+
+
+def test_validators_reject_inconsistent_documents():
+    validate = validate_discovery_document("https://issuer")
+    validate({"issuer": "https://issuer", "jwks_uri": "https://issuer/keys"})
+
+    with pytest.raises(InconsistentResponseError):
+        validate({"issuer": "https://other", "jwks_uri": "https://issuer/keys"})
+    with pytest.raises(InconsistentResponseError):
+        validate({"issuer": "https://issuer"})
+    with pytest.raises(InconsistentResponseError):
+        validate_jwks({"keys": [{"kid": "no-kty"}]})
+
+
+def test_discovery_uses_jwks_mirrors():
+    def get(url, **_):
+        if url == "https://primary/keys":
+            raise requests.ConnectionError("primary down")
+        return json_response(JWKS, url=url)
+
+    with patch("requests.get", side_effect=get) as mock_get:
+        discover = discovery.configure(cache_ttl=100, jwks_mirrors=["https://cdn/keys"])
+        keys = discover.public_keys({"jwks_uri": "https://primary/keys"})
+
+    assert keys == JWKS
+    assert [c.args[0] for c in mock_get.call_args_list] == [
+        "https://primary/keys",
+        "https://cdn/keys",
+    ]
+    assert set(discover.mirrors["https://primary/keys"].latencies) == {
+        "https://primary/keys",
+        "https://cdn/keys",
+    }
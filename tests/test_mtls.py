@@ -0,0 +1,195 @@
+"""Tests for certificate-bound token checks."""
+
+import base64
+import datetime
+import hashlib
+from unittest import mock
+from urllib.parse import quote
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from fastapi import Depends
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from fastapi_oidc import IDToken
+from fastapi_oidc import get_auth
+from fastapi_oidc import mtls
+from fastapi_oidc.mtls import CertificateBinding
+from fastapi_oidc.mtls import CertificateBindingError
+from fastapi_oidc.mtls import certificate_thumbprint
+from fastapi_oidc.mtls import get_mtls_auth
+
+
+def _certificate(name):
+    key = ec.generate_private_key(ec.SECP256R1())
+    subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+
+@pytest.fixture(scope="module")
+def certificate():
+    return _certificate("service-a")
+
+
+@pytest.fixture(scope="module")
+def pem(certificate):
+    return certificate.public_bytes(serialization.Encoding.PEM).decode("ascii")
+
+
+@pytest.fixture(scope="module")
+def thumbprint(certificate):
+    der = certificate.public_bytes(serialization.Encoding.DER)
+    digest = hashlib.sha256(der).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+@pytest.fixture
+def client(oidc_provider):
+    authenticate_client = get_mtls_auth(
+        get_auth(**oidc_provider.auth_config()),
+        binding=CertificateBinding(header="X-Client-Cert"),
+    )
+    app = FastAPI()
+
+    @app.get("/internal")
+    def internal(token: IDToken = Depends(authenticate_client)):
+        return {"sub": token.sub}
+
+    return TestClient(app)
+
+
+def _request(headers=(), tls=None):
+    scope = {
+        "type": "http",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "extensions": {"tls": tls} if tls is not None else {},
+    }
+    return Request(scope)
+
+
+def test_thumbprint_of_every_forwarded_encoding(certificate, pem, thumbprint):
+    der = certificate.public_bytes(serialization.Encoding.DER)
+    intermediate = _certificate("intermediate").public_bytes(serialization.Encoding.PEM)
+    encodings = [
+        pem,
+        quote(pem),
+        f":{base64.b64encode(der).decode()}:",
+        base64.b64encode(der).decode(),
+        pem + intermediate.decode(),
+    ]
+
+    assert {certificate_thumbprint(value) for value in encodings} == {thumbprint}
+
+
+@pytest.mark.parametrize(
+    "value", ["not a certificate", base64.b64encode(b"abc").decode()]
+)
+def test_invalid_certificate(value):
+    with pytest.raises(CertificateBindingError, match="Invalid client certificate"):
+        certificate_thumbprint(value)
+
+
+def test_bound_token_with_matching_certificate(oidc_provider, client, pem, thumbprint):
+    token = oidc_provider.mint(cnf={"x5t#S256": thumbprint})
+
+    response = client.get(
+        "/internal",
+        headers={"Authorization": f"Bearer {token}", "X-Client-Cert": quote(pem)},
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"sub": "test-subject"}
+
+
+@pytest.mark.parametrize(
+    "cnf, send_certificate, message",
+    [
+        ({"x5t#S256": "other"}, True, "not bound to the client certificate"),
+        (None, True, "not certificate bound"),
+        ({"jkt": "dpop"}, True, "not certificate bound"),
+        ("bound", False, "Client certificate required"),
+    ],
+)
+def test_binding_mismatch_is_rejected(
+    oidc_provider, client, pem, thumbprint, cnf, send_certificate, message
+):
+    token = oidc_provider.mint(cnf={"x5t#S256": thumbprint} if cnf == "bound" else cnf)
+    headers = {"Authorization": f"Bearer {token}"}
+    if send_certificate:
+        headers["X-Client-Cert"] = quote(pem)
+
+    response = client.get("/internal", headers=headers)
+
+    assert response.status_code == 401
+    assert message in response.json()["detail"]
+    assert response.headers["WWW-Authenticate"] == 'Bearer error="invalid_token"'
+
+
+def test_tls_extension_takes_precedence_over_header(pem, thumbprint):
+    other = _certificate("spoofed").public_bytes(serialization.Encoding.PEM).decode()
+    request = _request(
+        headers=[("X-Client-Cert", quote(other))], tls={"client_cert_chain": [pem]}
+    )
+    binding = CertificateBinding(header="X-Client-Cert")
+
+    assert binding.client_certificate(request) == pem
+    assert CertificateBinding(
+        header="X-Client-Cert", use_tls_extension=False
+    ).client_certificate(request) == quote(other)
+    assert (
+        CertificateBinding(header="X-Client-Cert").client_certificate(_request())
+        is None
+    )
+
+
+def test_header_is_only_read_when_named(pem):
+    request = _request(headers=[("X-Client-Cert", quote(pem))])
+
+    assert CertificateBinding().client_certificate(request) is None
+    assert CertificateBinding(header="X-Client-Cert").client_certificate(
+        request
+    ) == quote(pem)
+
+
+def test_thumbprints_are_cached(pem, thumbprint):
+    binding = CertificateBinding(header="X-SSL-Client-Cert")
+    token = IDToken.model_validate(
+        {
+            "iss": "https://idp",
+            "sub": "a",
+            "aud": "b",
+            "iat": 0,
+            "exp": 1,
+            "cnf": {"x5t#S256": thumbprint},
+        }
+    )
+    request = _request(headers=[("X-SSL-Client-Cert", quote(pem))])
+
+    with mock.patch.object(
+        mtls, "certificate_thumbprint", wraps=certificate_thumbprint
+    ) as computed:
+        for _ in range(3):
+            binding.check(token, request)
+
+    assert computed.call_count == 1
+
+
+def test_oversized_certificate_is_rejected():
+    with pytest.raises(CertificateBindingError, match="too large"):
+        CertificateBinding().thumbprint("A" * (mtls.MAX_CERTIFICATE_SIZE + 1))
@@ -0,0 +1,76 @@
+"""Tests for sharing providers between get_auth instances."""
+
+import gc
+from unittest.mock import patch
+
+from fastapi_oidc import get_auth
+from fastapi_oidc import token as token_module
+from fastapi_oidc.registry import ProviderRegistry
+
+
+def test_instances_share_discovery_and_keys(oidc_provider):
+    registry = ProviderRegistry()
+    config = oidc_provider.auth_config()
+    by_audience = get_auth(**config, provider_registry=registry)
+    by_other_audience = get_auth(**config, audience="other", provider_registry=registry)
+
+    with patch.object(
+        token_module.jwk, "construct", wraps=token_module.jwk.construct
+    ) as construct:
+        by_audience(oidc_provider.mint())
+        by_other_audience(oidc_provider.mint(aud="other"))
+
+    assert len(registry) == 1
+    assert construct.call_count == 1
+    assert oidc_provider.request_counts == {
+        "/.well-known/openid-configuration": 1,
+        "/.well-known/jwks.json": 1,
+    }
+
+
+def test_differently_configured_or_unregistered_instances_are_separate(
+    oidc_provider,
+):
+    registry = ProviderRegistry()
+    config = oidc_provider.auth_config()
+    shared = get_auth(**config, provider_registry=registry)
+    short_ttl = get_auth(
+        **{**config, "signature_cache_ttl": 60}, provider_registry=registry
+    )
+    private = get_auth(**config)
+
+    for authenticate_user in (shared, short_ttl, private):
+        authenticate_user(oidc_provider.mint())
+
+    assert len(registry) == 2
+    assert oidc_provider.request_counts["/.well-known/jwks.json"] == 3
+
+
+def test_providers_are_released_with_their_last_instance(oidc_provider):
+    registry = ProviderRegistry()
+    first = get_auth(**oidc_provider.auth_config(), provider_registry=registry)
+    second = get_auth(**oidc_provider.auth_config(), provider_registry=registry)
+    provider = registry.acquire(oidc_provider.issuer, **_options())
+    registry.release(provider)
+    assert provider.references == 2
+
+    del first
+    gc.collect()
+    assert len(registry) == 1 and provider.references == 1
+
+    del second
+    gc.collect()
+    assert len(registry) == 0
+
+
+def _options():
+    # The discovery settings get_auth passes for oidc_provider.auth_config()
+    return dict(
+        cache_ttl=3600,
+        stale_if_error=0,
+        discovery_mirrors=(),
+        jwks_mirrors=(),
+        hedge_delay=None,
+        shared_cache_path=None,
+        trust_anchors=(),
+    )
@@ -0,0 +1,106 @@
+"""Tests for declarative claim rules."""
+
+import time
+from dataclasses import dataclass
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from jose.exceptions import JWTClaimsError
+
+from fastapi_oidc import get_auth
+from fastapi_oidc.rules import ClaimRule
+from fastapi_oidc.rules import Contains
+from fastapi_oidc.rules import Equals
+from fastapi_oidc.rules import InRange
+from fastapi_oidc.rules import Matches
+from fastapi_oidc.rules import MaxAge
+from fastapi_oidc.rules import OneOf
+from fastapi_oidc.rules import compile_rules
+from fastapi_oidc.types import IDToken
+
+
+@pytest.mark.parametrize(
+    "rule, accepted, rejected",
+    [
+        (Equals("tid", "t1"), ["t1"], ["t2", None]),
+        (Equals("email_verified", True), [True], [1, "true", False]),
+        (OneOf("acr", ["mfa", "phr"]), ["mfa", "phr"], ["pwd", ["mfa"]]),
+        (Contains("groups", ["a", "b"]), [["a"], ["x", "b"]], [["x"], "a", [[1]]]),
+        (
+            Contains("groups", ["a", "b"], require_all=True),
+            [["a", "b", "c"]],
+            [["a"]],
+        ),
+        (Matches("email", r".+@example\.com"), ["u@example.com"], ["u@evil.com", 1]),
+        (InRange("level", 2, 5), [2, 3.5, 5], [1, 6, True, "3"]),
+        (InRange("level", maximum=0), [-10], [1]),
+    ],
+)
+def test_rules(rule, accepted, rejected):
+    validate = compile_rules([rule])
+
+    for value in accepted:
+        validate({rule.claim: value})
+    for value in rejected:
+        with pytest.raises(JWTClaimsError, match=f"Invalid {rule.claim} claim"):
+            validate({rule.claim: value})
+
+
+def test_max_age():
+    validate = compile_rules([MaxAge("auth_time", 600, leeway=5)])
+    now = time.time()
+
+    validate({"auth_time": now - 300})
+    validate({"auth_time": now + 2})
+    for stale in (now - 700, now + 60, "recently"):
+        with pytest.raises(JWTClaimsError, match="Invalid auth_time claim"):
+            validate({"auth_time": stale})
+    validate({"auth_time": now - 700}, now - 300)
+
+
+def test_missing_claims_fail_and_messages_do_not_reveal_values():
+    validate = compile_rules([Equals("tid", "secret-tenant")])
+
+    with pytest.raises(JWTClaimsError, match="Missing required claim: tid"):
+        validate({})
+    with pytest.raises(JWTClaimsError) as exc_info:
+        validate({"tid": "other"})
+    assert "secret-tenant" not in str(exc_info.value)
+
+
+def test_compile_rejects_non_rules():
+    with pytest.raises(TypeError):
+        compile_rules([("tid", "t1")])
+
+
+def test_rules_must_implement_compile():
+    @dataclass(frozen=True)
+    class Incomplete(ClaimRule):
+        pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        ClaimRule("tid")
+    with pytest.raises(TypeError, match="abstract"):
+        Incomplete("tid")
+
+
+def test_get_auth_rejects_tokens_failing_rules_before_building_the_model(
+    oidc_provider,
+):
+    authenticate_user = get_auth(
+        **oidc_provider.auth_config(),
+        claim_rules=[Equals("tid", "t1"), OneOf("acr", ["mfa"])],
+    )
+
+    good = oidc_provider.mint(tid="t1", acr="mfa")
+    assert authenticate_user(auth_header=f"Bearer {good}").sub == "test-subject"
+
+    with patch.object(IDToken, "model_validate") as model_validate:
+        with pytest.raises(HTTPException) as exc_info:
+            authenticate_user(
+                auth_header=f"Bearer {oidc_provider.mint(tid='t1', acr='pwd')}"
+            )
+    assert exc_info.value.status_code == 401
+    assert exc_info.value.detail == "Unauthorized: Invalid acr claim"
+    model_validate.assert_not_called()
@@ -0,0 +1,154 @@
+"""Tests for verified-session cookies."""
+
+import time
+from unittest import mock
+
+import pytest
+from fastapi import Depends
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_oidc import get_auth
+from fastapi_oidc.logout import RevocationIndex
+from fastapi_oidc.session import SessionCookie
+from fastapi_oidc.session import get_session_auth
+from fastapi_oidc.verifier import Verifier
+
+KEY = "k" * 32
+
+
+@pytest.fixture
+def sessions():
+    return SessionCookie({"current": KEY}, audience="test-api")
+
+
+def _client(oidc_provider, sessions, **options):
+    session_user = get_session_auth(
+        get_auth(**oidc_provider.auth_config()), sessions=sessions, **options
+    )
+    app = FastAPI()
+    app.get("/me")(lambda user=Depends(session_user): {"sub": user.sub})
+    return TestClient(app, base_url="https://testserver")
+
+
+def _get(client, token):
+    return client.get("/me", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_cookie_replaces_verification_for_the_same_token(oidc_provider, sessions):
+    client = _client(oidc_provider, sessions)
+    token = oidc_provider.mint()
+
+    first = _get(client, token)
+    cookie = first.headers["set-cookie"]
+    with mock.patch.object(Verifier, "verify", side_effect=AssertionError):
+        second = _get(client, token)
+
+    assert first.json() == second.json() == {"sub": "test-subject"}
+    assert "oidc_session=current." in cookie
+    assert all(flag in cookie for flag in ("HttpOnly", "Secure", "SameSite=lax"))
+    assert "set-cookie" not in second.headers
+
+
+def test_cookie_is_bound_to_its_token(oidc_provider, sessions):
+    client = _client(oidc_provider, sessions)
+    _get(client, oidc_provider.mint())
+
+    with mock.patch.object(Verifier, "verify", side_effect=AssertionError):
+        with pytest.raises(AssertionError):
+            _get(client, oidc_provider.mint(sub="someone-else"))
+    # Without the token the cookie alone is not enough
+    assert client.get("/me").status_code in (401, 403)
+
+
+def test_cookie_lifetime_is_capped_by_token_expiry(oidc_provider, sessions):
+    now = time.time()
+    claims = {"sub": "s", "exp": int(now) + 10}
+
+    value, max_age = sessions.issue(claims, "token")
+
+    assert max_age <= 10
+    assert sessions.load(value, "token") == claims
+    sessions.clock = lambda: now + 11
+    assert sessions.load(value, "token") is None
+    assert sessions.issue(claims, "token") is None
+
+
+def test_rotated_keys_keep_verifying(sessions):
+    value, _ = sessions.issue({"sub": "s"}, "token")
+    rotated = SessionCookie({"next": "n" * 32, "current": KEY}, audience="test-api")
+    retired = SessionCookie({"next": "n" * 32}, audience="test-api")
+
+    assert rotated.load(value, "token") == {"sub": "s"}
+    assert rotated.issue({"sub": "s"}, "token")[0].startswith("next.")
+    assert retired.load(value, "token") is None
+
+
+def test_cookie_is_bound_to_its_audience(sessions):
+    value, _ = sessions.issue({"sub": "s"}, "token")
+    other_api = SessionCookie({"current": KEY}, audience="other-api")
+
+    assert other_api.load(value, "token") is None
+
+
+@pytest.mark.parametrize(
+    "tamper",
+    [
+        lambda v: v[:-2] + ("AA" if not v.endswith("AA") else "BB"),
+        lambda v: v.replace("current.", "current.e30", 1),
+        lambda v: v.replace("current", "unknown", 1),
+        lambda v: "current.not-base64!.sig",
+        lambda v: "garbage",
+        lambda v: v + "é",
+    ],
+)
+def test_tampered_cookies_are_refused(sessions, tamper):
+    value, _ = sessions.issue({"sub": "s"}, "token")
+
+    assert sessions.load(tamper(value), "token") is None
+
+
+def test_invalid_cookie_falls_back_to_full_verification(oidc_provider, sessions):
+    client = _client(oidc_provider, sessions)
+    client.cookies.set("oidc_session", "current.bogus.bogus")
+
+    response = _get(client, oidc_provider.mint())
+
+    assert response.status_code == 200
+    assert "oidc_session=current." in response.headers["set-cookie"]
+
+
+def test_revoked_sessions_are_refused(oidc_provider, sessions):
+    revocations = RevocationIndex()
+    session_user = get_session_auth(
+        get_auth(**oidc_provider.auth_config(), revocation_index=revocations),
+        sessions=sessions,
+        revocation_index=revocations,
+    )
+    app = FastAPI()
+    app.get("/me")(lambda user=Depends(session_user): {"sub": user.sub})
+    client = TestClient(app, base_url="https://testserver")
+    token = oidc_provider.mint(sid="s1", iat=int(time.time()) - 10)
+    assert _get(client, token).status_code == 200
+
+    revocations.revoke(oidc_provider.issuer, sid="s1")
+
+    assert _get(client, token).status_code == 401
+
+
+def test_oversized_claims_get_no_cookie(oidc_provider, sessions):
+    client = _client(oidc_provider, sessions)
+
+    response = _get(client, oidc_provider.mint(groups=["g" * 100] * 50))
+
+    assert response.status_code == 200
+    assert "set-cookie" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "keys, message",
+    [({}, "At least one"), ({"k": "short"}, "shorter"), ({"a.b": KEY}, "dot")],
+)
+def test_invalid_keys(keys, message):
+    with pytest.raises(ValueError, match=message):
+        SessionCookie(keys, audience="test-api")
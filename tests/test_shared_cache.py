@@ -0,0 +1,153 @@
+"""Tests for the same-host shared document cache."""
+
+import multiprocessing
+import sys
+import time
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from fastapi_oidc import discovery
+from fastapi_oidc.shared_cache import SharedDocumentCache
+from fastapi_oidc.testing import json_response
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="shared cache requires POSIX"
+)
+
+JWKS = {"keys": [{"kty": "RSA", "kid": "1"}]}
+
+
+def test_entries_written_by_one_cache_are_read_by_another(tmp_path):
+    path = str(tmp_path / "cache")
+    writer = SharedDocumentCache(path)
+    reader = SharedDocumentCache(path)
+    fetch = Mock(return_value=JWKS)
+
+    assert writer.lookup("https://idp/keys", 60, fetch)[0] == JWKS
+    value, age = reader.lookup("https://idp/keys", 60, fetch)
+
+    assert value == JWKS
+    assert 0 <= age < 60
+    assert fetch.call_count == 1
+    assert reader.generation == writer.generation == 1
+
+
+def test_unchanged_generation_returns_the_same_object(tmp_path):
+    path = str(tmp_path / "cache")
+    SharedDocumentCache(path).lookup("https://idp/keys", 60, lambda: JWKS)
+    reader = SharedDocumentCache(path)
+
+    first, _ = reader.lookup("https://idp/keys", 60, Mock())
+    second, _ = reader.lookup("https://idp/keys", 60, Mock())
+    assert first is second
+
+    # Another process refreshing an unrelated entry keeps the object as well
+    SharedDocumentCache(path).lookup("https://idp/other", 60, lambda: {"x": 1})
+    third, _ = reader.lookup("https://idp/keys", 60, Mock())
+    assert third is first
+
+
+def test_expired_entries_are_refetched(tmp_path):
+    cache = SharedDocumentCache(str(tmp_path / "cache"))
+    fetch = Mock(side_effect=[{"v": 1}, {"v": 2}])
+
+    assert cache.lookup("k", 0, fetch)[0] == {"v": 1}
+    assert cache.lookup("k", 0, fetch)[0] == {"v": 2}
+    assert cache.generation == 2
+
+
+def test_oversized_payloads_are_not_shared(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SharedDocumentCache(path, max_bytes=10)
+
+    assert cache.lookup("k", 60, lambda: {"big": "x" * 100})[0] == {"big": "x" * 100}
+    assert cache.generation == 0
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "not-a-cache"
+    path.write_bytes(b"something else entirely")
+
+    with pytest.raises(ValueError):
+        SharedDocumentCache(str(path))
+
+
+def _worker(path, fetch_log, results):
+    def fetch():
+        with open(fetch_log, "a") as log:
+            log.write("fetch\n")
+        return JWKS
+
+    results.put(SharedDocumentCache(path).lookup("https://idp/keys", 60, fetch)[0])
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_worker_processes_share_a_single_fetch(tmp_path):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    fetch_log = tmp_path / "fetches"
+    fetch_log.touch()
+    workers = [
+        context.Process(
+            target=_worker, args=(str(tmp_path / "cache"), fetch_log, results)
+        )
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+
+    assert [results.get(timeout=1) for _ in workers] == [JWKS] * 4
+    assert fetch_log.read_text() == "fetch\n"
+
+
+def _inherited_worker(cache, fetch_log, results):
+    def fetch():
+        with open(fetch_log, "a") as log:
+            log.write("fetch\n")
+        time.sleep(0.2)
+        return JWKS
+
+    results.put(cache.lookup("https://idp/keys", 60, fetch)[0])
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_cache_created_before_fork_still_fetches_once(tmp_path):
+    # gunicorn --preload: the workers inherit the parent's open file
+    cache = SharedDocumentCache(str(tmp_path / "cache"))
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    fetch_log = tmp_path / "fetches"
+    fetch_log.touch()
+    workers = [
+        context.Process(target=_inherited_worker, args=(cache, fetch_log, results))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+
+    assert [results.get(timeout=1) for _ in workers] == [JWKS] * 4
+    assert fetch_log.read_text() == "fetch\n"
+    assert cache.lookup("https://idp/keys", 60, Mock())[0] == JWKS
+
+
+def test_discovery_uses_shared_cache(tmp_path):
+    path = str(tmp_path / "cache")
+    with patch("requests.get", return_value=json_response(JWKS)) as mock_get:
+        first = discovery.configure(cache_ttl=60, shared_cache_path=path)
+        second = discovery.configure(cache_ttl=60, shared_cache_path=path)
+        spec = {"jwks_uri": "https://idp/keys"}
+
+        assert first.public_keys(spec) == JWKS
+        assert second.public_keys(spec) == JWKS
+
+    assert mock_get.call_count == 1
@@ -0,0 +1,181 @@
+"""Tests for static keys and the direct jwks_uri configuration."""
+
+import json
+import os
+
+import pytest
+from fastapi import Depends
+from fastapi import FastAPI
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from fastapi_oidc import get_auth
+from fastapi_oidc.registry import ProviderRegistry
+from fastapi_oidc.static import StaticKeys
+
+
+def _config(idp, **options):
+    return {
+        "client_id": idp.client_id,
+        "issuer": idp.issuer,
+        "signature_cache_ttl": 3600,
+        **options,
+    }
+
+
+def _public_pem(signing_key):
+    return signing_key.signer.public_key().to_pem().decode("ascii")
+
+
+def test_static_jwks_makes_no_requests(oidc_provider):
+    authenticate_user = get_auth(
+        **_config(oidc_provider, static_keys=StaticKeys(oidc_provider.jwks()))
+    )
+
+    assert authenticate_user(f"Bearer {oidc_provider.mint()}").sub == "test-subject"
+    assert sum(oidc_provider.request_counts.values()) == 0
+
+
+def test_static_pem_keys_with_algorithms(oidc_provider):
+    static = StaticKeys([_public_pem(oidc_provider.keys[0])], algorithms=["RS256"])
+    authenticate_user = get_auth(**_config(oidc_provider, static_keys=static))
+
+    assert authenticate_user(f"Bearer {oidc_provider.mint()}")
+    with pytest.raises(HTTPException) as err:
+        authenticate_user(f"Bearer {oidc_provider.mint(key=oidc_provider.rotate())}")
+    assert err.value.status_code == 401
+
+
+@pytest.mark.parametrize(
+    "keys, message",
+    [
+        ("-----BEGIN PUBLIC KEY-----", "algorithms is required"),
+        ({"keys": [{"kty": "RSA"}]}, "algorithms is required"),
+        ({"keys": "none"}, "list of keys"),
+        ([], "At least one static key"),
+    ],
+)
+def test_static_keys_are_checked_upfront(keys, message):
+    with pytest.raises(ValueError, match=message):
+        StaticKeys(keys)
+
+
+def test_pem_file_with_several_keys(tmp_path, oidc_provider):
+    first = oidc_provider.keys[0]
+    second = oidc_provider.rotate(retire_previous=False)
+    path = tmp_path / "keys.pem"
+    path.write_text(_public_pem(first) + "\n" + _public_pem(second))
+    static = StaticKeys.from_file(str(path), algorithms=["RS256"])
+    authenticate_user = get_auth(**_config(oidc_provider, static_keys=static))
+
+    for key in (first, second):
+        assert authenticate_user(f"Bearer {oidc_provider.mint(key=key)}")
+
+
+def test_key_file_is_reloaded_when_it_changes(tmp_path, oidc_provider):
+    now = [0.0]
+    path = tmp_path / "jwks.json"
+    path.write_text(json.dumps(oidc_provider.jwks()))
+    static = StaticKeys.from_file(str(path), reload_interval=30, clock=lambda: now[0])
+    authenticate_user = get_auth(**_config(oidc_provider, static_keys=static))
+    old_token = oidc_provider.mint()
+    assert authenticate_user(f"Bearer {old_token}")
+
+    new_token = oidc_provider.mint(key=oidc_provider.rotate())
+    path.write_text(json.dumps(oidc_provider.jwks()))
+    os.utime(path, ns=(1, 1))
+    with pytest.raises(HTTPException):
+        # Not checked again before reload_interval passed
+        authenticate_user(f"Bearer {new_token}")
+
+    now[0] = 31
+    assert authenticate_user(f"Bearer {new_token}")
+    with pytest.raises(HTTPException):
+        authenticate_user(f"Bearer {old_token}")
+
+
+def test_unreadable_key_file_keeps_previous_keys(tmp_path, oidc_provider, caplog):
+    now = [0.0]
+    path = tmp_path / "jwks.json"
+    path.write_text(json.dumps(oidc_provider.jwks()))
+    static = StaticKeys.from_file(str(path), reload_interval=1, clock=lambda: now[0])
+    keys = static.public_keys()
+
+    path.write_text("{not json")
+    now[0] = 2
+    document = static.auth_server()
+
+    assert static.public_keys() is keys
+    assert document["id_token_signing_alg_values_supported"] == ["RS256"]
+    assert "Keeping previous keys" in caplog.text
+
+
+def test_static_keys_in_an_app(oidc_provider):
+    authenticate_user = get_auth(
+        **_config(oidc_provider, static_keys=StaticKeys(oidc_provider.jwks()))
+    )
+    app = FastAPI()
+    app.get("/me")(lambda user=Depends(authenticate_user): {"sub": user.sub})
+    client = TestClient(app)
+
+    response = client.get(
+        "/me", headers={"Authorization": f"Bearer {oidc_provider.mint()}"}
+    )
+
+    assert response.json() == {"sub": "test-subject"}
+    assert client.get("/me").status_code in (401, 403)
+
+
+def test_direct_jwks_uri_skips_discovery(oidc_provider):
+    authenticate_user = get_auth(
+        **_config(oidc_provider, jwks_uri=oidc_provider.jwks_uri, algorithms=["RS256"])
+    )
+
+    assert authenticate_user(f"Bearer {oidc_provider.mint()}")
+    assert authenticate_user(f"Bearer {oidc_provider.mint()}")
+    assert oidc_provider.request_counts == {"/.well-known/jwks.json": 1}
+
+
+def test_direct_jwks_uri_pins_algorithms(oidc_provider):
+    authenticate_user = get_auth(
+        **_config(oidc_provider, jwks_uri=oidc_provider.jwks_uri, algorithms=["ES256"])
+    )
+
+    with pytest.raises(HTTPException) as err:
+        authenticate_user(f"Bearer {oidc_provider.mint()}")
+    assert "alg" in err.value.detail
+
+
+def test_direct_jwks_uri_through_a_registry(oidc_provider):
+    providers = ProviderRegistry()
+    config = _config(
+        oidc_provider,
+        jwks_uri=oidc_provider.jwks_uri,
+        algorithms=["RS256"],
+        provider_registry=providers,
+    )
+    first, second = get_auth(**config), get_auth(**config)
+
+    assert first(f"Bearer {oidc_provider.mint()}")
+    assert second(f"Bearer {oidc_provider.mint()}")
+    assert len(providers) == 1
+    assert oidc_provider.request_counts == {"/.well-known/jwks.json": 1}
+
+
+@pytest.mark.parametrize(
+    "options, message",
+    [
+        ({}, "is required"),
+        ({"jwks_uri": "https://idp.example.test/jwks"}, "algorithms is required"),
+        (
+            {"static_keys": StaticKeys("-", algorithms=["RS256"])},
+            "provider_registry",
+        ),
+    ],
+)
+def test_invalid_key_source_configuration(oidc_provider, options, message):
+    with pytest.raises(ValueError, match=message):
+        get_auth(
+            **_config(oidc_provider, **options),
+            provider_registry=ProviderRegistry() if "static_keys" in options else None,
+        )
@@ -0,0 +1,101 @@
+"""Tests for the fake identity provider and its pytest plugin."""
+
+import pytest
+import requests
+from fastapi import HTTPException
+from jose import jwt
+from requests.adapters import HTTPAdapter
+
+from fastapi_oidc import get_auth
+from fastapi_oidc.testing import FakeIdP
+
+
+def test_oidc_fixtures_authenticate_end_to_end(
+    oidc_provider, oidc_auth_config, oidc_token
+):
+    authenticate_user = get_auth(**oidc_auth_config)
+
+    id_token = authenticate_user(auth_header=f"Bearer {oidc_token}")
+
+    assert id_token.sub == "test-subject"
+    assert id_token.email == "test-subject@example.test"
+    assert oidc_provider.request_counts == {
+        "/.well-known/openid-configuration": 1,
+        "/.well-known/jwks.json": 1,
+    }
+
+
+def test_fake_idp_serves_discovery_and_404s_unknown_paths(oidc_provider):
+    document = requests.get(oidc_provider.discovery_url, timeout=1).json()
+    assert document["jwks_uri"] == oidc_provider.jwks_uri
+    assert document["id_token_signing_alg_values_supported"] == ["RS256"]
+
+    response = requests.get(f"{oidc_provider.issuer}/nope", timeout=1)
+    assert response.status_code == 404
+
+
+def test_fake_idp_publishes_a_key_per_algorithm():
+    idp = FakeIdP(algorithms=["RS256", "ES256"])
+    jwks = idp.jwks()
+
+    assert [key["kty"] for key in jwks["keys"]] == ["RSA", "EC"]
+    for algorithm, public_jwk in zip(idp.algorithms, jwks["keys"]):
+        token = idp.mint(algorithm=algorithm)
+        assert jwt.get_unverified_header(token)["kid"] == public_jwk["kid"]
+        claims = jwt.decode(
+            token, public_jwk, algorithms=[algorithm], audience="test-client"
+        )
+        assert claims["iss"] == idp.issuer
+
+
+def test_fake_idp_es256_provider_with_get_auth():
+    with FakeIdP(issuer="https://ec.example.test", algorithms=["ES256"]) as idp:
+        authenticate_user = get_auth(**idp.auth_config())
+        id_token = authenticate_user(auth_header=idp.mint(sub="ec-user"))
+
+    assert id_token.sub == "ec-user"
+
+
+def test_fake_idp_rotation_retires_old_keys(oidc_provider):
+    old_key = oidc_provider.keys[0]
+    new_key = oidc_provider.rotate()
+
+    assert oidc_provider.keys == [new_key]
+    assert new_key.kid != old_key.kid
+
+    authenticate_user = get_auth(**oidc_provider.auth_config())
+    assert authenticate_user(auth_header=oidc_provider.mint()).sub == "test-subject"
+    with pytest.raises(HTTPException):
+        authenticate_user(auth_header=oidc_provider.mint(key=old_key))
+
+
+def test_fake_idp_mint_overrides_and_drops_claims(oidc_provider):
+    token = oidc_provider.mint(aud="other", nonce=None, custom="value", expires_in=-10)
+    claims = jwt.get_unverified_claims(token)
+
+    assert claims["aud"] == "other"
+    assert claims["custom"] == "value"
+    assert "nonce" not in claims
+    assert claims["exp"] < claims["iat"]
+
+
+def test_fake_idp_rejects_unsupported_algorithms():
+    with pytest.raises(ValueError):
+        FakeIdP(algorithms=["none"])
+    with pytest.raises(ValueError):
+        FakeIdP().rotate("ES256")
+
+
+def test_fake_idp_only_intercepts_its_own_issuer():
+    original_send = HTTPAdapter.send
+
+    with FakeIdP(issuer="https://one.example.test") as one:
+        with FakeIdP(issuer="https://two.example.test") as two:
+            requests.get(one.discovery_url, timeout=1)
+            requests.get(two.discovery_url, timeout=1)
+        assert HTTPAdapter.send is not original_send
+
+    assert HTTPAdapter.send is original_send
+
+    assert one.request_counts["/.well-known/openid-configuration"] == 1
+    assert two.request_counts["/.well-known/openid-configuration"] == 1
@@ -0,0 +1,157 @@
+"""Tests for single-pass token parsing and verification."""
+
+import time
+from unittest.mock import patch
+
+import pytest
+from jose import jwt
+from jose.exceptions import JWTClaimsError
+from jose.exceptions import JWTError
+
+from fastapi_oidc import get_auth
+from fastapi_oidc import token as token_module
+from fastapi_oidc.testing import FakeIdP
+from fastapi_oidc.token import KeyIndex
+from fastapi_oidc.token import ParsedToken
+from fastapi_oidc.token import validate_claims
+
+SECRET = "a-shared-secret"
+
+
+def test_parsed_token_decodes_header_and_claims_once():
+    compact = jwt.encode({"sub": "abc"}, SECRET, headers={"kid": "k1"})
+
+    parsed = ParsedToken(compact)
+
+    assert parsed.header == {"alg": "HS256", "kid": "k1", "typ": "JWT"}
+    assert parsed.claims == {"sub": "abc"}
+    assert parsed.claims is parsed.claims
+    assert parsed.signing_input == compact.rpartition(".")[0].encode()
+
+
+@pytest.mark.parametrize(
+    "compact, message",
+    [
+        ("token", "Not enough segments"),
+        ("a.b", "Not enough segments"),
+        ("bm90IGpzb24.e30.c2ln", "Invalid header string: Expecting value"),
+        ("WzFd.e30.c2ln", "Invalid header string: must be a json object"),
+        ("a.e30.c2ln", "Not enough segments"),
+        ("e30.a.c2ln", "Invalid payload padding"),
+        ("e30.e30.a", "Invalid crypto padding"),
+    ],
+)
+def test_parsed_token_errors_match_jose(compact, message):
+    with pytest.raises(JWTError) as ours:
+        ParsedToken(compact)
+    with pytest.raises(JWTError) as jose_error:
+        jwt.decode(compact, SECRET, algorithms=["HS256"])
+
+    assert str(ours.value).startswith(message)
+    assert str(ours.value) == str(jose_error.value)
+
+
+def test_non_object_payload_is_rejected_on_access():
+    parsed = ParsedToken("eyJhbGciOiJIUzI1NiJ9.WzFd.c2ln")
+
+    with pytest.raises(JWTError, match="must be a json object"):
+        parsed.claims
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"exp": 1},
+        {"exp": "soon"},
+        {"nbf": int(time.time()) + 600},
+        {"iat": "yesterday"},
+        {"aud": "someone-else"},
+        {"aud": ["client", 1]},
+        {"aud": "client", "iss": "https://evil.example"},
+        {"aud": "client", "iss": ["https://idp"]},
+        {"iss": "https://idp", "sub": 1},
+        {"iss": "https://idp", "jti": 1},
+    ],
+)
+def test_claim_errors_match_jose(claims):
+    compact = jwt.encode(claims, SECRET)
+    with pytest.raises(JWTError) as jose_error:
+        jwt.decode(
+            compact,
+            SECRET,
+            algorithms=["HS256"],
+            audience="client",
+            issuer="https://idp",
+            options={"verify_at_hash": False},
+        )
+    with pytest.raises(JWTError) as ours:
+        validate_claims(claims, audience="client", issuer="https://idp")
+
+    assert type(ours.value) is type(jose_error.value)
+    assert str(ours.value) == str(jose_error.value)
+
+
+@pytest.mark.parametrize("iss", [["https://idp"], {"a": 1}, 1, None])
+def test_non_string_issuers_are_invalid(iss):
+    with pytest.raises(JWTClaimsError, match="Invalid issuer"):
+        validate_claims(
+            {"iss": iss}, audience="client", issuer=frozenset(["https://idp"])
+        )
+
+
+def test_valid_claims_pass():
+    validate_claims(
+        {"aud": ["other", "client"], "iss": "https://b", "exp": time.time() + 60},
+        audience="client",
+        issuer=("https://a", "https://b"),
+    )
+
+
+def test_key_index_selects_by_kid_and_builds_keys_once():
+    idp = FakeIdP(algorithms=["RS256", "ES256"])
+    idp.rotate("RS256", retire_previous=False)
+    index = KeyIndex(idp.jwks())
+
+    with patch.object(
+        token_module.jwk, "construct", wraps=token_module.jwk.construct
+    ) as construct:
+        for _ in range(3):
+            index.verify(ParsedToken(idp.mint(algorithm="RS256")), ["RS256"])
+        index.verify(ParsedToken(idp.mint(algorithm="ES256")), ["ES256"])
+
+    assert construct.call_count == 2
+
+
+def test_key_index_without_kids_skips_keys_of_other_types():
+    idp = FakeIdP(algorithms=["RS256", "ES256"])
+    jwks = {"keys": [{**key, "kid": None} for key in idp.jwks()["keys"]]}
+
+    KeyIndex(jwks).verify(ParsedToken(idp.mint(algorithm="ES256")), ["ES256"])
+
+
+@pytest.mark.parametrize(
+    "algorithms, message",
+    [
+        (["ES256"], "The specified alg value is not allowed"),
+        (["RS256"], "Signature verification failed."),
+    ],
+)
+def test_key_index_rejects(algorithms, message):
+    idp = FakeIdP()
+    other = FakeIdP()
+    other.rotate()  # a different pooled key, same kid format
+    forged = other.mint(headers={"kid": idp.keys[0].kid})
+
+    with pytest.raises(JWTError, match=message):
+        KeyIndex(idp.jwks()).verify(ParsedToken(forged), algorithms)
+
+
+def test_get_auth_verifies_tokens_of_a_mixed_key_type_provider():
+    with FakeIdP(
+        issuer="https://mixed.example.test", algorithms=["RS256", "ES256"]
+    ) as idp:
+        authenticate_user = get_auth(**idp.auth_config())
+
+        for algorithm in idp.algorithms:
+            id_token = authenticate_user(idp.mint(algorithm=algorithm, sub=algorithm))
+            assert id_token.sub == algorithm
@@ -0,0 +1,118 @@
+"""Tests for per-phase tracing of authenticate_user."""
+
+from unittest.mock import Mock
+
+import pytest
+from fastapi import HTTPException
+
+from fastapi_oidc import auth
+from fastapi_oidc import get_auth
+from fastapi_oidc.tracing import PHASES
+from fastapi_oidc.tracing import AuthTrace
+from fastapi_oidc.tracing import AuthTracer
+from fastapi_oidc.tracing import CallbackTracer
+from fastapi_oidc.tracing import OpenTelemetryTracer
+
+
+def test_traces_every_phase_with_cache_hits_and_key_id(oidc_provider):
+    phases = []
+    on_finish = Mock()
+    tracer = CallbackTracer(
+        lambda phase, seconds, attributes: phases.append((phase, attributes)),
+        on_finish=on_finish,
+    )
+    authenticate_user = get_auth(**oidc_provider.auth_config(), tracer=tracer)
+    kid = oidc_provider.keys[0].kid
+
+    authenticate_user(auth_header=f"Bearer {oidc_provider.mint()}")
+    assert phases == [
+        ("extract", {}),
+        ("discovery", {"cache_hit": False}),
+        ("public_keys", {"cache_hit": False}),
+        ("decode", {"kid": kid, "alg": "RS256"}),
+        ("validate", {}),
+    ]
+    assert on_finish.call_args.args[1] is None
+
+    phases.clear()
+    authenticate_user(auth_header=f"Bearer {oidc_provider.mint()}")
+    assert phases[1:3] == [
+        ("discovery", {"cache_hit": True}),
+        ("public_keys", {"cache_hit": True}),
+    ]
+
+
+def test_failing_phase_is_reported(oidc_provider):
+    phases = []
+    on_finish = Mock()
+    tracer = CallbackTracer(
+        lambda phase, seconds, attributes: phases.append((phase, attributes)),
+        on_finish=on_finish,
+    )
+    authenticate_user = get_auth(**oidc_provider.auth_config(), tracer=tracer)
+
+    with pytest.raises(HTTPException):
+        authenticate_user(auth_header=oidc_provider.mint(expires_in=-60))
+
+    assert [phase for phase, _ in phases] == list(PHASES[:4])
+    assert phases[-1][1] == {
+        "error": "HTTPException: Unauthorized: Signature has expired."
+    }
+    assert isinstance(on_finish.call_args.args[1], HTTPException)
+
+
+def test_unsampled_calls_are_not_traced(
+    monkeypatch, mock_discovery, token_without_audience, no_audience_config
+):
+    monkeypatch.setattr(auth.discovery, "configure", mock_discovery)
+    on_phase = Mock()
+    authenticate_user = get_auth(
+        **no_audience_config, tracer=CallbackTracer(on_phase, sample_rate=0.0)
+    )
+
+    authenticate_user(auth_header=f"Bearer {token_without_audience}")
+
+    on_phase.assert_not_called()
+
+
+def test_mocked_discovery_omits_cache_attributes(
+    monkeypatch, mock_discovery, token_without_audience, no_audience_config
+):
+    monkeypatch.setattr(auth.discovery, "configure", mock_discovery)
+    phases = {}
+    tracer = CallbackTracer(lambda p, s, a: phases.setdefault(p, a))
+    authenticate_user = get_auth(**no_audience_config, tracer=tracer)
+
+    authenticate_user(auth_header=f"Bearer {token_without_audience}")
+
+    assert phases["discovery"] == {}
+
+
+def test_sample_rate_is_validated():
+    with pytest.raises(ValueError):
+        CallbackTracer(Mock(), sample_rate=1.5)
+
+
+@pytest.mark.parametrize("base", [AuthTrace, AuthTracer])
+def test_base_classes_require_their_hook(base):
+    incomplete = type("Incomplete", (base,), {})
+
+    with pytest.raises(TypeError, match="abstract"):
+        incomplete()
+
+
+def test_opentelemetry_tracer_creates_a_span_per_phase(oidc_provider):
+    otel_tracer = Mock()
+    authenticate_user = get_auth(
+        **oidc_provider.auth_config(), tracer=OpenTelemetryTracer(otel_tracer)
+    )
+
+    authenticate_user(auth_header=oidc_provider.mint())
+
+    names = [call.args[0] for call in otel_tracer.start_span.call_args_list]
+    assert names == ["fastapi_oidc.authenticate_user"] + [
+        f"fastapi_oidc.authenticate_user.{phase}" for phase in PHASES
+    ]
+    discovery_call = otel_tracer.start_span.call_args_list[2]
+    assert discovery_call.kwargs["attributes"] == {"fastapi_oidc.cache_hit": False}
+    assert otel_tracer.start_span.return_value.end.call_count == len(PHASES) + 1
@@ -0,0 +1,133 @@
+"""Tests for the cached userinfo dependencies."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import Depends
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_oidc import IDToken
+from fastapi_oidc import get_auth
+from fastapi_oidc.userinfo import MAX_USERINFO_SIZE
+from fastapi_oidc.userinfo import get_userinfo
+from fastapi_oidc.userinfo import get_userinfo_async
+
+USERINFO_PATH = "/userinfo"
+
+
+def _make_client(idp, factory=get_userinfo, **kwargs):
+    authenticate_user = get_auth(**idp.auth_config())
+    userinfo = factory(
+        authenticate_user, base_authorization_server_uri=idp.issuer, **kwargs
+    )
+    app = FastAPI()
+
+    @app.get("/profile")
+    def profile(user: IDToken = Depends(userinfo)):
+        return user.model_dump()
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("factory", [get_userinfo, get_userinfo_async])
+def test_userinfo_is_merged_and_cached_per_subject(oidc_provider, factory):
+    oidc_provider.userinfo["alice"] = {"name": "Alice", "email": "spoofed@example"}
+    client = _make_client(oidc_provider, factory)
+    token = oidc_provider.mint(sub="alice", email="alice@example.test")
+
+    for _ in range(3):
+        response = client.get("/profile", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        # ID token claims win over userinfo claims
+        assert response.json()["email"] == "alice@example.test"
+        assert response.json()["name"] == "Alice"
+
+    assert oidc_provider.request_counts[USERINFO_PATH] == 1
+
+
+def test_concurrent_requests_for_one_subject_share_a_call(oidc_provider):
+    client = _make_client(oidc_provider)
+    token = oidc_provider.mint(sub="bob")
+
+    def get(_):
+        return client.get(
+            "/profile", headers={"Authorization": f"Bearer {token}"}
+        ).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert set(pool.map(get, range(16))) == {200}
+    assert oidc_provider.request_counts[USERINFO_PATH] == 1
+
+
+def test_separate_access_token_header(oidc_provider):
+    client = _make_client(oidc_provider, access_token_header="X-Access-Token")
+    id_token = oidc_provider.mint(sub="carol")
+
+    missing = client.get("/profile", headers={"Authorization": f"Bearer {id_token}"})
+    assert missing.status_code == 401
+
+    rejected = client.get(
+        "/profile",
+        headers={"Authorization": f"Bearer {id_token}", "X-Access-Token": "bogus"},
+    )
+    assert rejected.status_code == 401
+    assert rejected.json()["detail"] == "Unauthorized: userinfo request rejected"
+
+    ok = client.get(
+        "/profile",
+        headers={
+            "Authorization": f"Bearer {id_token}",
+            "X-Access-Token": oidc_provider.mint(sub="carol", aud="api"),
+        },
+    )
+    assert ok.status_code == 200
+
+
+def test_userinfo_for_another_subject_is_rejected(oidc_provider):
+    client = _make_client(oidc_provider, access_token_header="X-Access-Token")
+
+    response = client.get(
+        "/profile",
+        headers={
+            "Authorization": f"Bearer {oidc_provider.mint(sub='dave')}",
+            "X-Access-Token": oidc_provider.mint(sub="mallory"),
+        },
+    )
+
+    assert response.status_code == 401
+    assert "does not match" in response.json()["detail"]
+
+
+def test_oversized_userinfo_is_refused(oidc_provider):
+    oidc_provider.userinfo["erin"] = {"padding": "x" * MAX_USERINFO_SIZE}
+    client = _make_client(oidc_provider)
+    token = oidc_provider.mint(sub="erin")
+
+    response = client.get("/profile", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 503
+
+
+def test_discovery_document_is_shared_with_get_auth(oidc_provider):
+    authenticate_user = get_auth(**oidc_provider.auth_config())
+    userinfo = get_userinfo(authenticate_user)
+    app = FastAPI()
+    app.get("/profile")(lambda user=Depends(userinfo): user.model_dump())
+    token = oidc_provider.mint(sub="frank")
+
+    response = TestClient(app).get(
+        "/profile", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+    assert oidc_provider.request_counts["/.well-known/openid-configuration"] == 1
+
+
+def test_other_dependencies_need_a_base_uri(oidc_provider):
+    def authenticate_user():
+        pass
+
+    with pytest.raises(ValueError, match="base_authorization_server_uri"):
+        get_userinfo(authenticate_user)
+    assert get_userinfo(authenticate_user, base_authorization_server_uri="https://a")
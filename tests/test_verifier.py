@@ -0,0 +1,127 @@
+"""Tests for the reusable Verifier."""
+
+import dataclasses
+import time
+from unittest.mock import patch
+
+import pytest
+from jose.exceptions import ExpiredSignatureError
+from jose.exceptions import JWTClaimsError
+from jose.exceptions import JWTError
+
+from fastapi_oidc import Verifier
+from fastapi_oidc import token as token_module
+from fastapi_oidc.rules import MaxAge
+from fastapi_oidc.testing import FakeIdP
+from fastapi_oidc.types import IDToken
+
+
+class WorkerToken(IDToken):
+    uid: str
+
+
+def test_create_normalizes_arguments():
+    verifier = Verifier.create(issuer="https://a", audience=["x", "y"])
+
+    assert verifier.issuers == frozenset({"https://a"})
+    assert verifier.audiences == frozenset({"x", "y"})
+    assert verifier.algorithms is None
+    assert verifier.decrypter is None
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        verifier.leeway = 10  # type: ignore[misc]
+
+
+def test_decode_outside_fastapi():
+    idp = FakeIdP()
+    verifier = Verifier.create(
+        issuer=idp.issuer,
+        audience=idp.client_id,
+        algorithms=["RS256"],
+        token_type=WorkerToken,
+    )
+
+    id_token = verifier.decode(idp.mint(sub="worker", uid="u1"), idp.jwks())
+
+    assert isinstance(id_token, WorkerToken)
+    assert id_token.sub == "worker"
+
+
+def test_any_configured_audience_is_accepted():
+    idp = FakeIdP()
+    verifier = Verifier.create(
+        issuer=idp.issuer, audience=["api", "other"], algorithms=["RS256"]
+    )
+
+    verifier.decode(idp.mint(aud=["other"]), idp.jwks())
+    with pytest.raises(JWTClaimsError, match="Invalid audience"):
+        verifier.decode(idp.mint(aud="third"), idp.jwks())
+
+
+def test_leeway_applies_to_expiry():
+    idp = FakeIdP()
+    expired = idp.mint(expires_in=-30)
+    strict = Verifier.create(
+        issuer=idp.issuer, audience=idp.client_id, algorithms=["RS256"]
+    )
+    lenient = dataclasses.replace(strict, leeway=60)
+
+    with pytest.raises(ExpiredSignatureError):
+        strict.decode(expired, idp.jwks())
+    assert lenient.decode(expired, idp.jwks()).exp < time.time()
+
+
+def test_verify_checks_time_based_rules_at_now():
+    idp = FakeIdP()
+    verifier = Verifier.create(
+        issuer=idp.issuer,
+        audience=idp.client_id,
+        algorithms=["RS256"],
+        claim_rules=[MaxAge("auth_time", 600)],
+    )
+    authenticated = time.time() - 3600
+    token = verifier.parse(
+        idp.mint(auth_time=authenticated, iat=authenticated, expires_in=7200)
+    )
+
+    with pytest.raises(JWTClaimsError, match="Invalid auth_time claim"):
+        verifier.verify(token, idp.jwks())
+    claims = verifier.verify(token, idp.jwks(), now=authenticated + 300)
+    assert claims["auth_time"] == authenticated
+
+
+def test_algorithms_come_from_the_discovery_document_unless_pinned():
+    idp = FakeIdP(algorithms=["RS256", "ES256"])
+    token = idp.mint(algorithm="ES256")
+    verifier = Verifier.create(issuer=idp.issuer, audience=idp.client_id)
+
+    with pytest.raises(JWTError, match="No signing algorithms"):
+        verifier.decode(token, idp.jwks())
+    assert verifier.decode(token, idp.jwks(), idp.discovery_document())
+
+    pinned = Verifier.create(
+        issuer=idp.issuer, audience=idp.client_id, algorithms=["RS256"]
+    )
+    with pytest.raises(JWTError, match="alg value is not allowed"):
+        pinned.decode(token, idp.jwks(), idp.discovery_document())
+
+
+def test_key_plan_is_rebuilt_only_when_the_jwks_changes():
+    idp = FakeIdP()
+    verifier = Verifier.create(
+        issuer=idp.issuer, audience=idp.client_id, algorithms=["RS256"]
+    )
+    jwks = idp.jwks()
+    idp_after_rotation = FakeIdP()
+    idp_after_rotation.rotate()
+    rotated = idp_after_rotation.jwks()
+
+    with patch.object(
+        token_module.jwk, "construct", wraps=token_module.jwk.construct
+    ) as construct:
+        for _ in range(3):
+            verifier.decode(idp.mint(), jwks)
+        assert construct.call_count == 1
+        assert verifier.key_index(jwks) is verifier.key_index(jwks)
+
+        verifier.decode(idp_after_rotation.mint(), rotated)
+        assert construct.call_count == 2
@@ -0,0 +1,203 @@
+"""Tests for x5c certificate chain validation of JWKS keys."""
+
+import base64
+import datetime
+import hashlib
+import time
+from unittest import mock
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from fastapi import HTTPException
+
+from fastapi_oidc import discovery
+from fastapi_oidc import get_auth
+from fastapi_oidc import x5c
+from fastapi_oidc.x5c import CertificateChainError
+from fastapi_oidc.x5c import TrustStore
+
+NOW = datetime.datetime.now(datetime.timezone.utc)
+
+
+def _name(common_name):
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+
+
+def _certificate(subject, public_key, issuer, *, ca=False, days=30, start=None):
+    """Issue a certificate; ``issuer`` is ``(certificate, key)``, or
+    ``(None, key)`` for a self-signed one."""
+    issuer_certificate, signing_key = issuer
+    start = start or NOW - datetime.timedelta(days=1)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(_name(subject))
+        .issuer_name(
+            issuer_certificate.subject if issuer_certificate else _name(subject)
+        )
+        .public_key(public_key)
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(start)
+        .not_valid_after(start + datetime.timedelta(days=days))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .sign(signing_key, hashes.SHA256())
+    )
+
+
+def _ca(subject, issuer=None, *, ca=True):
+    key = ec.generate_private_key(ec.SECP256R1())
+    certificate = _certificate(
+        subject, key.public_key(), issuer or (None, key), ca=ca, days=365
+    )
+    return certificate, key
+
+
+def _der_b64(certificate):
+    der = certificate.public_bytes(serialization.Encoding.DER)
+    return base64.b64encode(der).decode("ascii")
+
+
+def _pem(certificate):
+    return certificate.public_bytes(serialization.Encoding.PEM).decode("ascii")
+
+
+@pytest.fixture(scope="module")
+def root():
+    return _ca("Root CA")
+
+
+@pytest.fixture(scope="module")
+def intermediate(root):
+    return _ca("Intermediate CA", root)
+
+
+def _signing_public_key(signing_key):
+    return serialization.load_pem_private_key(
+        signing_key.private_pem.encode(), password=None
+    ).public_key()
+
+
+def _certify(signing_key, issuer, *chain, **options):
+    leaf = _certificate(
+        "idp signing", _signing_public_key(signing_key), issuer, **options
+    )
+    signing_key.public_jwk["x5c"] = [_der_b64(c) for c in (leaf, *chain)]
+    return leaf
+
+
+def _authenticate(idp, root):
+    return get_auth(**idp.auth_config(), x5c_trust_anchors=[_pem(root[0])])
+
+
+def test_key_with_chain_to_anchor_is_used(oidc_provider, root, intermediate):
+    leaf = _certify(oidc_provider.keys[0], intermediate, intermediate[0])
+    der = leaf.public_bytes(serialization.Encoding.DER)
+    oidc_provider.keys[0].public_jwk["x5t#S256"] = (
+        base64.urlsafe_b64encode(hashlib.sha256(der).digest()).rstrip(b"=").decode()
+    )
+    authenticate_user = _authenticate(oidc_provider, root)
+
+    assert authenticate_user(f"Bearer {oidc_provider.mint()}").sub == "test-subject"
+
+
+def test_chain_ending_at_an_anchor_is_accepted(root):
+    leaf_key = ec.generate_private_key(ec.SECP256R1())
+    leaf = _certificate("leaf", leaf_key.public_key(), root)
+    numbers = leaf_key.public_key().public_numbers()
+
+    def b64(value):
+        return base64.urlsafe_b64encode(value.to_bytes(32, "big")).rstrip(b"=").decode()
+
+    jwk = {
+        "kty": "EC",
+        "crv": "P-256",
+        "x": b64(numbers.x),
+        "y": b64(numbers.y),
+        "x5c": [_der_b64(leaf), _der_b64(root[0])],
+    }
+
+    _, not_after = TrustStore([_pem(root[0])]).validate(jwk, NOW)
+
+    assert not_after == leaf.not_valid_after_utc
+
+
+@pytest.mark.parametrize("case", ["no x5c", "other CA", "not a CA", "wrong key"])
+def test_untrusted_keys_are_dropped(oidc_provider, root, intermediate, case):
+    key = oidc_provider.keys[0]
+    if case == "other CA":
+        _certify(key, _ca("Other Root"))
+    elif case == "not a CA":
+        not_ca = _ca("Not a CA", root, ca=False)
+        _certify(key, not_ca, not_ca[0])
+    elif case == "wrong key":
+        other_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+        leaf = _certificate("other", other_key, root)
+        key.public_jwk["x5c"] = [_der_b64(leaf)]
+    authenticate_user = _authenticate(oidc_provider, root)
+
+    with pytest.raises(HTTPException) as err:
+        authenticate_user(f"Bearer {oidc_provider.mint()}")
+    assert err.value.status_code == 401
+
+
+@pytest.mark.parametrize(
+    "jwk, message",
+    [
+        ({"x5c": ["!"]}, "Invalid x5c certificate"),
+        ({"x5c": ["AA=="] * 9}, "too long"),
+        ({"x5c": "not a list"}, "no x5c chain"),
+    ],
+)
+def test_malformed_chains(root, jwk, message):
+    with pytest.raises(CertificateChainError, match=message):
+        TrustStore([_pem(root[0])]).validate({"kty": "RSA", **jwk}, NOW)
+
+
+def test_thumbprint_mismatch_is_rejected(oidc_provider, root):
+    _certify(oidc_provider.keys[0], root)
+    jwk = {**oidc_provider.keys[0].public_jwk, "x5t": "bogus"}
+
+    with pytest.raises(CertificateChainError, match="x5t does not match"):
+        TrustStore([_pem(root[0])]).validate(jwk, NOW)
+
+
+def test_chains_are_validated_once_per_jwks_until_a_certificate_expires(
+    oidc_provider, root
+):
+    leaf = _certify(oidc_provider.keys[0], root, days=2)
+    discover = discovery.configure(cache_ttl=3600, trust_anchors=[_pem(root[0])])
+    document = discover.auth_server(base_url=oidc_provider.issuer)
+
+    with mock.patch.object(
+        discovery, "trusted_keys", wraps=x5c.trusted_keys
+    ) as validated:
+        first = discover.public_keys(document)
+        assert discover.public_keys(document) is first
+        assert validated.call_count == 1
+        assert len(first["keys"]) == 1
+
+        expired = leaf.not_valid_after_utc.timestamp() + 1
+        with mock.patch("time.time", return_value=expired):
+            assert discover.public_keys(document)["keys"] == []
+        assert validated.call_count == 2
+
+
+def test_not_yet_valid_key_is_used_once_valid(oidc_provider, root):
+    start = NOW + datetime.timedelta(hours=1)
+    _certify(oidc_provider.keys[0], root, start=start)
+    jwks = oidc_provider.jwks()
+    store = TrustStore([_pem(root[0])])
+
+    keys, recheck_at = x5c.trusted_keys(jwks, store, time.time())
+    assert keys["keys"] == [] and recheck_at == start.replace(microsecond=0).timestamp()
+
+    keys, _ = x5c.trusted_keys(jwks, store, recheck_at + 1)
+    assert len(keys["keys"]) == 1
+
+
+def test_trust_store_requires_an_anchor():
+    with pytest.raises(ValueError):
+        TrustStore([])